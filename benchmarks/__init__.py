@@ -0,0 +1 @@
+"""Набор тестов производительности основных операций базы данных."""
@@ -0,0 +1,117 @@
+"""Запуск замеров и сравнение с базовым прогоном.
+
+    python -m benchmarks --sizes 1000,10000,100000 --output results.json
+    python -m benchmarks --baseline results.json --threshold 0.2
+
+Замеры выполняются во временном каталоге, рабочие файлы базы не
+затрагиваются. В режиме сравнения код возврата равен 1, если какой-либо
+сценарий стал медленнее базового больше чем на threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from .cases import CASES
+
+# Разница во времени меньше этой величины (в секундах) считается шумом
+NOISE_FLOOR = 0.001
+
+
+def run_benchmarks(sizes: List[int], names: List[str], repeat: int) -> Dict:
+    """Выполняет выбранные сценарии для всех размеров таблицы."""
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='primitive_db_bench_') as workdir:
+        os.chdir(workdir)
+        try:
+            for size in sizes:
+                for name in names:
+                    result = {'name': name, 'size': size, **CASES[name](size, repeat)}
+                    results.append(result)
+                    print(f'{name:<26} {size:>9} {result["seconds"]:>10.4f} с', file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'repeat': repeat,
+            'sizes': sizes,
+        },
+        'results': results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """Сравнивает прогон с базовым по парам (сценарий, размер).
+
+    Возвращает строки сравнения; regression=True, если время выросло
+    больше чем в (1 + threshold) раз и больше чем на NOISE_FLOOR.
+    """
+    base = {(item['name'], item['size']): item for item in baseline['results']}
+    rows = []
+    for item in current['results']:
+        reference = base.get((item['name'], item['size']))
+        if reference is None or not reference['seconds']:
+            continue
+        ratio = item['seconds'] / reference['seconds']
+        rows.append({
+            'name': item['name'],
+            'size': item['size'],
+            'baseline': reference['seconds'],
+            'current': item['seconds'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold and item['seconds'] - reference['seconds'] > NOISE_FLOOR,
+        })
+    return rows
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Замеры производительности.')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='размеры таблиц через запятую (например, 1000,1000000)')
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help='сценарии через запятую: ' + ', '.join(CASES))
+    parser.add_argument('--repeat', type=int, default=5, help='число повторов, берется лучшее время')
+    parser.add_argument('--output', help='файл для результатов в JSON')
+    parser.add_argument('--baseline', help='JSON предыдущего прогона для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='допустимое замедление относительно базового прогона (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    names = args.cases.split(',')
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f'неизвестные сценарии: {", ".join(unknown)}')
+
+    current = run_benchmarks(sizes, names, args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(current, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = 0
+    for row in compare(current, baseline, args.threshold):
+        mark = 'РЕГРЕССИЯ' if row['regression'] else 'ок'
+        print(f'{row["name"]:<26} {row["size"]:>9} {row["baseline"]:>10.4f} -> '
+              f'{row["current"]:>10.4f} с  x{row["ratio"]:.2f}  {mark}', file=sys.stderr)
+        regressions += row['regression']
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
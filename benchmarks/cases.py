@@ -0,0 +1,315 @@
+"""Сценарии замеров: синтетические таблицы и операции над ними.
+
+Каждый сценарий вызывает публичные функции core, utils и engine так же,
+как это делает игровой цикл. Данные генерируются детерминированно из
+seed, поэтому повторные прогоны сравнимы между собой.
+"""
+
+import contextlib
+import io
+import random
+import time
+from typing import Callable, Dict, List
+
+from src.primitive_db.cache import query_cache
+from src.primitive_db.core import aggregate, create_table, delete, insert, insert_rows, select, update
+from src.primitive_db.decorators import get_confirm_policy, set_confirm_policy
+from src.primitive_db.engine import format_select_output
+from src.primitive_db.indexes import TableIndexes
+from src.primitive_db.join import JoinInput, join
+from src.primitive_db.parser import AggregateItem
+from src.primitive_db.partitions import PartitionedTable
+from src.primitive_db.predicates import Compare
+from src.primitive_db.rowtable import RowTable
+from src.primitive_db.utils import checkpoint_table, load_table_data, save_table_data
+from src.primitive_db.wal import append_entries
+
+TABLE = 'bench'
+COLUMNS = ['name:str', 'age:int', 'active:bool']
+
+# Предел числа вызовов для операций, измеряемых поштучно
+SINGLE_OPS_LIMIT = 10_000
+# Предел числа строк, передаваемых в format_select_output
+FORMAT_ROWS_LIMIT = 10_000
+
+
+def make_rows(size: int, seed: int = 0) -> List[List]:
+    """Генерирует строки значений (без ID) для таблицы bench."""
+    rng = random.Random(seed)
+    return [[f'user{rng.randrange(size)}', rng.randrange(100), rng.random() < 0.5] for _ in range(size)]
+
+
+def make_table(size: int, seed: int = 0):
+    """Создает метаданные и заполненную таблицу bench из size строк."""
+    metadata, _ = create_table({}, TABLE, COLUMNS)
+    table_data, _, _ = insert_rows(metadata, TABLE, make_rows(size, seed), [])
+    return metadata, table_data
+
+
+def _quiet(func: Callable) -> Callable:
+    """Подавляет вывод сообщений, чтобы печать не искажала замер."""
+    def wrapper(*args, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _measure(setup: Callable[[], Dict], body: Callable[[Dict], int], repeat: int) -> Dict:
+    """Выполняет body repeat раз, каждый раз на свежем состоянии из setup.
+
+    body возвращает число обработанных единиц (строк или вызовов), из
+    которого считается пропускная способность; в отчет идет лучшее время.
+    """
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        state = setup()
+        query_cache.clear()
+        start = time.perf_counter()
+        rows = body(state)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        'seconds': best,
+        'mean': sum(timings) / len(timings),
+        'rows': rows,
+        'rows_per_sec': rows / best if best > 0 else None,
+    }
+
+
+def case_create_table(size: int, repeat: int) -> Dict:
+    count = min(size, SINGLE_OPS_LIMIT)
+
+    def body(state):
+        metadata = {}
+        for i in range(count):
+            metadata, _ = create_table(metadata, f't{i}', COLUMNS)
+        return count
+    return _measure(dict, _quiet(body), repeat)
+
+
+def case_insert_single(size: int, repeat: int) -> Dict:
+    count = min(size, SINGLE_OPS_LIMIT)
+    rows = [[str(value) for value in row] for row in make_rows(count)]
+
+    def setup():
+        metadata, _ = create_table({}, TABLE, COLUMNS)
+        return {'metadata': metadata, 'data': [], 'indexes': TableIndexes()}
+
+    def body(state):
+        data = state['data']
+        for row in rows:
+            data, _ = insert(state['metadata'], TABLE, row, data, state['indexes'])
+        return count
+    return _measure(setup, _quiet(body), repeat)
+
+
+def case_insert_bulk(size: int, repeat: int) -> Dict:
+    rows = make_rows(size)
+
+    def setup():
+        metadata, _ = create_table({}, TABLE, COLUMNS)
+        return {'metadata': metadata}
+
+    def body(state):
+        _, _, new_records = insert_rows(state['metadata'], TABLE, rows, [], TableIndexes())
+        return len(new_records)
+    return _measure(setup, body, repeat)
+
+
+def _table_state(size: int, indexed: bool = False) -> Callable[[], Dict]:
+    metadata, data = make_table(size)
+    indexes = TableIndexes(['name'] if indexed else []).build(data)
+
+    def setup():
+        return {'metadata': metadata, 'data': data, 'indexes': indexes}
+    return setup
+
+
+def case_select_full(size: int, repeat: int) -> Dict:
+    def body(state):
+        return len(list(select(state['data'])))
+    return _measure(_table_state(size), _quiet(body), repeat)
+
+
+def case_select_equality(size: int, repeat: int) -> Dict:
+    def body(state):
+        return len(select(state['data'], {'name': 'user1'}))
+    return _measure(_table_state(size), _quiet(body), repeat)
+
+
+def case_select_equality_indexed(size: int, repeat: int) -> Dict:
+    def body(state):
+        return len(select(state['data'], {'name': 'user1'}, state['indexes']))
+    return _measure(_table_state(size, indexed=True), _quiet(body), repeat)
+
+
+def case_select_zone_skip(size: int, repeat: int) -> Dict:
+    """Диапазон по неиндексированному столбцу, растущему вместе с ID (последний 1% строк).
+
+    Блоки ID, в которые диапазон не попадает, отсекаются по зональным картам.
+    """
+    _, data = make_table(size)
+    for record in data:
+        record['age'] = record['ID']
+    table = RowTable(data)
+    indexes = TableIndexes().build(table)
+    indexes.table_zones()
+    where = Compare('age', '>', size - size // 100)
+
+    def body(state):
+        return len(select(table, where, indexes))
+    return _measure(dict, _quiet(body), repeat)
+
+
+def case_select_cached(size: int, repeat: int) -> Dict:
+    count = 100
+
+    def body(state):
+        for _ in range(count):
+            select(state['data'], {'name': 'user1'}, None, TABLE)
+        return count
+    return _measure(_table_state(size), _quiet(body), repeat)
+
+
+def case_select_partitioned(size: int, repeat: int) -> Dict:
+    _, data = make_table(size)
+    table = PartitionedTable.create(TABLE, data, 'range', max(size // 8, 1))
+
+    def body(state):
+        return len(select(table, {'name': 'user1'}))
+    return _measure(dict, _quiet(body), repeat)
+
+
+def case_aggregate_group_by(size: int, repeat: int) -> Dict:
+    items = [AggregateItem(None, 'age'), AggregateItem('count', None), AggregateItem('avg', 'age')]
+
+    def body(state):
+        aggregate(state['data'], items, group_by=['age'])
+        return len(state['data'])
+    return _measure(_table_state(size), _quiet(body), repeat)
+
+
+def _join_state(size: int, column: str) -> Callable[[], Dict]:
+    """Две таблицы bench по size строк: соединение по name (hash) или по ID (merge)."""
+    _, left = make_table(size, seed=1)
+    _, right = make_table(size, seed=2)
+    names = ['ID'] + [col.split(':')[0] for col in COLUMNS]
+
+    def setup():
+        return {'left': JoinInput('a', RowTable(left), None, names, column),
+                'right': JoinInput('b', RowTable(right), None, names, column)}
+    return setup
+
+
+def case_join_hash(size: int, repeat: int) -> Dict:
+    def body(state):
+        for _ in join(state['left'], state['right']):
+            pass
+        return size
+    return _measure(_join_state(size, 'name'), _quiet(body), repeat)
+
+
+def case_join_merge(size: int, repeat: int) -> Dict:
+    def body(state):
+        for _ in join(state['left'], state['right']):
+            pass
+        return size
+    return _measure(_join_state(size, 'ID'), _quiet(body), repeat)
+
+
+def case_update(size: int, repeat: int) -> Dict:
+    def setup():
+        metadata, data = make_table(size)
+        return {'data': data}
+
+    def body(state):
+        _, updated_ids = update(state['data'], {'active': True}, {'age': 42})
+        return len(updated_ids)
+    return _measure(setup, body, repeat)
+
+
+def case_delete(size: int, repeat: int) -> Dict:
+    def setup():
+        metadata, data = make_table(size)
+        return {'data': RowTable(data)}
+
+    def body(state):
+        _, deleted_ids = delete(state['data'], {'age': 42})
+        return len(deleted_ids)
+
+    # delete спрашивает подтверждение; прежняя политика возвращается после замера.
+    previous = get_confirm_policy()
+    set_confirm_policy('yes')
+    try:
+        return _measure(setup, body, repeat)
+    finally:
+        set_confirm_policy(previous)
+
+
+def case_save(size: int, repeat: int) -> Dict:
+    _, data = make_table(size)
+
+    def body(state):
+        save_table_data(TABLE, data)
+        return len(data)
+    return _measure(dict, body, repeat)
+
+
+def case_checkpoint_dirty_pages(size: int, repeat: int) -> Dict:
+    """Контрольная точка после изменения 10 записей: переписываются только их страницы."""
+    _, data = make_table(size)
+    changed = [{'ID': record_id} for record_id in range(1, size + 1, max(size // 10, 1))][:10]
+
+    def setup():
+        table_data = RowTable(data)
+        save_table_data(TABLE, table_data)
+        for where in changed:
+            _, updated_ids = update(table_data, {'active': True}, where)
+            append_entries(TABLE, [{'op': 'update', 'set': {'active': True}, 'where': where, 'ids': updated_ids}])
+        return {'data': table_data}
+
+    def body(state):
+        checkpoint_table(TABLE, state['data'])
+        return len(changed)
+    return _measure(setup, body, repeat)
+
+
+def case_load(size: int, repeat: int) -> Dict:
+    _, data = make_table(size)
+    save_table_data(TABLE, data)
+
+    def body(state):
+        return len(load_table_data(TABLE))
+    return _measure(dict, body, repeat)
+
+
+def case_format_select_output(size: int, repeat: int) -> Dict:
+    metadata, data = make_table(min(size, FORMAT_ROWS_LIMIT))
+
+    def body(state):
+        format_select_output(data, metadata, TABLE)
+        return len(data)
+    return _measure(dict, body, repeat)
+
+
+CASES: Dict[str, Callable[[int, int], Dict]] = {
+    'create_table': case_create_table,
+    'insert_single': case_insert_single,
+    'insert_bulk': case_insert_bulk,
+    'select_full': case_select_full,
+    'select_equality': case_select_equality,
+    'select_equality_indexed': case_select_equality_indexed,
+    'select_cached': case_select_cached,
+    'select_zone_skip': case_select_zone_skip,
+    'select_partitioned': case_select_partitioned,
+    'aggregate_group_by': case_aggregate_group_by,
+    'join_hash': case_join_hash,
+    'join_merge': case_join_merge,
+    'update': case_update,
+    'delete': case_delete,
+    'save': case_save,
+    'checkpoint_dirty_pages': case_checkpoint_dirty_pages,
+    'load': case_load,
+    'format_select_output': case_format_select_output,
+}
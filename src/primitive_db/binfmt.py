@@ -0,0 +1,437 @@
+"""Двоичный формат таблицы с фиксированной шириной строк и доступом через mmap.
+
+Файл data/<имя_таблицы>.bin состоит из заголовка и строк одинаковой
+ширины, разложенных по схеме из db_meta.json: байт-признак живой строки,
+затем слоты столбцов — int (8 байт), bool (1 байт), str (смещение и длина
+в куче строк). Сами строки лежат в отдельном файле data/<имя_таблицы>.heap,
+куда новые значения только дописываются.
+
+Строки в файле упорядочены по ID (новые ID всегда больше старых), поэтому
+сам столбец ID служит индексом ID → смещение: позиция строки находится
+двоичным поиском и чтение или изменение одной записи затрагивает лишь
+несколько страниц. Открытие таблицы не читает данные вообще.
+"""
+
+import mmap
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .constants import BINARY_HEAP_SUFFIX, BINARY_SUFFIX, DATA_DIR
+from .metrics import registry
+from .predicates import Between, Compare, Where, compile_predicate, conjuncts
+
+_MAGIC = b'PDB1'
+_HEADER = struct.Struct('<4sIQQ')
+_SLOT_FORMATS = {'int': 'q', 'bool': '?', 'str': 'QI'}
+_LIVE = 1
+_DELETED = 0
+
+
+def get_paths(table_name: str) -> Tuple[str, str]:
+    """Возвращает пути к файлу строк и к куче строк таблицы."""
+    return f'{DATA_DIR}{table_name}{BINARY_SUFFIX}', f'{DATA_DIR}{table_name}{BINARY_HEAP_SUFFIX}'
+
+
+def _row_struct(schema: List[Tuple[str, str]]) -> struct.Struct:
+    return struct.Struct('<B' + ''.join(_SLOT_FORMATS[col_type] for _, col_type in schema))
+
+
+class BinaryTable:
+    """Таблица в двоичном файле, отображенном в память.
+
+    Поддерживает протокол списка записей (len, итерация, append), поэтому
+    ее можно передавать в функции core. Изменения записываются прямо в
+    отображенные страницы файла, журнал для таких таблиц не нужен.
+    """
+
+    def __init__(self, table_name: str, schema: List[Tuple[str, str]]):
+        self.table_name = table_name
+        self.schema = schema
+        self.row = _row_struct(schema)
+        self.path, self.heap_path = get_paths(table_name)
+        self._file = open(self.path, 'r+b')
+        self._heap_file = open(self.heap_path, 'a+b')
+        self._mm: Optional[mmap.mmap] = None
+        self._heap_mm: Optional[mmap.mmap] = None
+        self._heap_mapped = 0
+        self._heap_lock = threading.Lock()
+        # Номера страниц отображения, измененных с последнего flush
+        self._dirty: Set[int] = set()
+        self._map()
+        magic, row_size, self.total_rows, self.live_rows = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or row_size != self.row.size:
+            self.close()
+            raise ValueError(f'Файл {self.path} не соответствует схеме таблицы.')
+
+    @classmethod
+    def create(cls, table_name: str, schema: List[Tuple[str, str]], records: List[Dict]) -> 'BinaryTable':
+        """Создает двоичный файл таблицы из записей (упорядочивая их по ID)."""
+        path, heap_path = get_paths(table_name)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        row = _row_struct(schema)
+        records = sorted(records, key=lambda record: record['ID'])
+        heap = bytearray()
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, row.size, len(records), len(records)))
+            for record in records:
+                f.write(row.pack(_LIVE, *_encode(schema, record, heap)))
+        with open(heap_path, 'wb') as f:
+            f.write(heap)
+        return cls(table_name, schema)
+
+    def _map(self) -> None:
+        old = self._mm
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        if old is not None:
+            try:
+                old.close()
+            except BufferError:
+                # Старое отображение еще читает незавершенный перебор; его закроет сборщик мусора.
+                pass
+
+    def _heap(self) -> mmap.mmap:
+        # Отображение кучи обновляют и параллельные чтения сервера: оно пересоздается один раз.
+        with self._heap_lock:
+            heap_size = os.fstat(self._heap_file.fileno()).st_size
+            if self._heap_mm is None or heap_size > self._heap_mapped:
+                old = self._heap_mm
+                self._heap_mm = mmap.mmap(self._heap_file.fileno(), heap_size, access=mmap.ACCESS_READ) if heap_size else None
+                self._heap_mapped = heap_size
+                if old is not None:
+                    try:
+                        old.close()
+                    except BufferError:
+                        pass
+            return self._heap_mm
+
+    def close(self) -> None:
+        """Закрывает отображения и файлы таблицы."""
+        for mapped in (self._mm, self._heap_mm):
+            if mapped is not None:
+                try:
+                    mapped.close()
+                except BufferError:
+                    pass
+        self._mm = self._heap_mm = None
+        self._file.close()
+        self._heap_file.close()
+
+    def _write_header(self) -> None:
+        _HEADER.pack_into(self._mm, 0, _MAGIC, self.row.size, self.total_rows, self.live_rows)
+        self._dirty.add(0)
+
+    def _touch(self, offset: int) -> None:
+        """Отмечает измененными страницы отображения, которые занимает строка по смещению offset."""
+        self._dirty.update(range(offset // mmap.PAGESIZE, (offset + self.row.size - 1) // mmap.PAGESIZE + 1))
+
+    def _offset(self, position: int) -> int:
+        return _HEADER.size + position * self.row.size
+
+    def _id_at(self, position: int) -> int:
+        return struct.unpack_from('<q', self._mm, self._offset(position) + 1)[0]
+
+    def _bisect(self, record_id: int, right: bool = False) -> int:
+        """Возвращает первую строку с ID >= record_id (с right — с ID > record_id)."""
+        low, high = 0, self.total_rows
+        while low < high:
+            middle = (low + high) // 2
+            current = self._id_at(middle)
+            if current < record_id or (right and current == record_id):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find_position(self, record_id: int) -> Optional[int]:
+        """Находит номер строки по ID двоичным поиском по столбцу ID."""
+        low = self._bisect(record_id)
+        if low < self.total_rows and self._id_at(low) == record_id:
+            if self._mm[self._offset(low)] == _LIVE:
+                return low
+        return None
+
+    def _decode(self, values: tuple) -> Dict:
+        record = {}
+        heap = None
+        i = 1
+        for name, col_type in self.schema:
+            if col_type == 'str':
+                offset, length = values[i], values[i + 1]
+                if length:
+                    heap = heap or self._heap()
+                    record[name] = heap[offset:offset + length].decode('utf-8')
+                else:
+                    record[name] = ''
+                i += 2
+            else:
+                record[name] = values[i]
+                i += 1
+        return record
+
+    def get(self, record_id: int) -> Optional[Dict]:
+        """Читает одну запись по ID."""
+        position = self.find_position(record_id)
+        if position is None:
+            return None
+        return self._decode(self.row.unpack_from(self._mm, self._offset(position)))
+
+    def __len__(self) -> int:
+        return self.live_rows
+
+    @property
+    def tombstones(self) -> int:
+        """Число строк, помеченных удаленными, но еще занимающих место в файле."""
+        return self.total_rows - self.live_rows
+
+    def __iter__(self) -> Iterator[Dict]:
+        full = memoryview(self._mm)
+        view = full[_HEADER.size:self._offset(self.total_rows)]
+        try:
+            for values in self.row.iter_unpack(view):
+                if values[0] == _LIVE:
+                    yield self._decode(values)
+        finally:
+            view.release()
+            full.release()
+
+    def __getitem__(self, i: int) -> Dict:
+        if i != -1:
+            raise IndexError('Двоичная таблица поддерживает только обращение к последней записи.')
+        for position in range(self.total_rows - 1, -1, -1):
+            values = self.row.unpack_from(self._mm, self._offset(position))
+            if values[0] == _LIVE:
+                return self._decode(values)
+        raise IndexError('Таблица пуста.')
+
+    def id_range(self, where_clause: Where) -> Tuple[int, int]:
+        """Сужает диапазон строк по ограничениям на ID в цепочке AND.
+
+        Строки упорядочены по ID, поэтому границы находятся двоичным
+        поиском, и читаются только строки внутри диапазона.
+        """
+        start, end = 0, self.total_rows
+        for item in conjuncts(where_clause):
+            if isinstance(item, Between) and item.column == 'ID':
+                bounds = ((item.low, '>='), (item.high, '<='))
+            elif isinstance(item, Compare) and item.column == 'ID' and item.op != '!=':
+                bounds = ((item.value, '>='), (item.value, '<=')) if item.op == '=' else ((item.value, item.op),)
+            else:
+                continue
+            for value, op in bounds:
+                if isinstance(value, bool) or not isinstance(value, int):
+                    return 0, 0
+                if op in ('>', '>='):
+                    start = max(start, self._bisect(value, right=op == '>'))
+                else:
+                    end = min(end, self._bisect(value, right=op == '<='))
+        return start, max(start, end)
+
+    def select(self, where_clause: Optional[Where] = None) -> List[Dict]:
+        """Возвращает записи, удовлетворяющие условию."""
+        return list(self.iter_select(where_clause))
+
+    def iter_select(self, where_clause: Optional[Where] = None) -> Iterator[Dict]:
+        """Лениво возвращает записи по условию; условие по ID читает одну строку."""
+        if where_clause is None:
+            yield from self
+            return
+        if not isinstance(where_clause, dict):
+            for position in self._predicate_positions(where_clause):
+                yield self._decode(self.row.unpack_from(self._mm, self._offset(position)))
+            return
+        if 'ID' in where_clause:
+            registry.inc('rows_scanned', 1)
+            record = self.get(where_clause['ID']) if isinstance(where_clause['ID'], int) else None
+            if record is not None and _matches(record, where_clause):
+                yield record
+            return
+        predicate = self._raw_predicate(where_clause)
+        if predicate is None:
+            return
+        registry.inc('rows_scanned', self.total_rows)
+        full = memoryview(self._mm)
+        view = full[_HEADER.size:self._offset(self.total_rows)]
+        try:
+            for values in self.row.iter_unpack(view):
+                if values[0] == _LIVE and predicate(values):
+                    yield self._decode(values)
+        finally:
+            view.release()
+            full.release()
+
+    def _raw_predicate(self, where_clause: Dict[str, Any]):
+        """Строит проверку условия по сырым слотам строки без сборки записи.
+
+        Возвращает None, если условие заведомо не выполнимо (нет столбца).
+        """
+        slots = {}
+        i = 1
+        for name, col_type in self.schema:
+            slots[name] = (i, col_type)
+            i += 2 if col_type == 'str' else 1
+        
+        checks = []
+        for col, value in where_clause.items():
+            if col not in slots:
+                return None
+            slot, col_type = slots[col]
+            if col_type == 'str':
+                if not isinstance(value, str):
+                    return None
+                checks.append((slot, 'str', value.encode('utf-8')))
+            else:
+                checks.append((slot, col_type, value))
+        
+        def predicate(values: tuple) -> bool:
+            for slot, col_type, expected in checks:
+                if col_type == 'str':
+                    length = values[slot + 1]
+                    if length != len(expected):
+                        return False
+                    if length and self._heap()[values[slot]:values[slot] + length] != expected:
+                        return False
+                elif values[slot] != expected:
+                    return False
+            return True
+        
+        return predicate
+
+    def append(self, record: Dict) -> None:
+        """Дописывает запись в конец файла (ID должен быть больше существующих)."""
+        heap = bytearray()
+        heap_start = os.fstat(self._heap_file.fileno()).st_size
+        values = _encode(self.schema, record, heap, heap_start)
+        if heap:
+            self._heap_file.seek(0, os.SEEK_END)
+            self._heap_file.write(heap)
+            self._heap_file.flush()
+        self._file.seek(self._offset(self.total_rows))
+        self._file.write(self.row.pack(_LIVE, *values))
+        self._file.flush()
+        self._map()
+        self.total_rows += 1
+        self.live_rows += 1
+        self._write_header()
+
+    def _predicate_positions(self, where_clause: Where) -> Iterator[int]:
+        """Перебирает живые строки диапазона ID, удовлетворяющие составному условию."""
+        check = compile_predicate(where_clause)
+        start, end = self.id_range(where_clause)
+        registry.inc('rows_scanned', end - start)
+        for position in range(start, end):
+            values = self.row.unpack_from(self._mm, self._offset(position))
+            if values[0] == _LIVE and check(self._decode(values)):
+                yield position
+
+    def _positions(self, where_clause: Where) -> List[int]:
+        if not isinstance(where_clause, dict):
+            return list(self._predicate_positions(where_clause))
+        if 'ID' in where_clause:
+            position = self.find_position(where_clause['ID']) if isinstance(where_clause['ID'], int) else None
+            candidates = [] if position is None else [position]
+        else:
+            candidates = range(self.total_rows)
+        predicate = self._raw_predicate(where_clause)
+        if predicate is None:
+            return []
+        registry.inc('rows_scanned', len(candidates))
+        result = []
+        for position in candidates:
+            values = self.row.unpack_from(self._mm, self._offset(position))
+            if values[0] == _LIVE and predicate(values):
+                result.append(position)
+        return result
+
+    def update(self, set_clause: Dict[str, Any], where_clause: Where) -> List[int]:
+        """Изменяет подходящие записи прямо в отображенном файле и возвращает их ID."""
+        positions = self._positions(where_clause)
+        updated_ids = []
+        for position in positions:
+            offset = self._offset(position)
+            record = self._decode(self.row.unpack_from(self._mm, offset))
+            record.update((col, value) for col, value in set_clause.items() if col in record)
+            heap = bytearray()
+            heap_start = os.fstat(self._heap_file.fileno()).st_size
+            values = _encode(self.schema, record, heap, heap_start)
+            if heap:
+                self._heap_file.seek(0, os.SEEK_END)
+                self._heap_file.write(heap)
+                self._heap_file.flush()
+            self.row.pack_into(self._mm, offset, _LIVE, *values)
+            self._touch(offset)
+            updated_ids.append(record['ID'])
+        return updated_ids
+
+    def delete(self, where_clause: Where) -> List[int]:
+        """Помечает подходящие записи удаленными и возвращает их ID."""
+        positions = self._positions(where_clause)
+        for position in positions:
+            offset = self._offset(position)
+            self._mm[offset] = _DELETED
+            self._dirty.add(offset // mmap.PAGESIZE)
+        self.live_rows -= len(positions)
+        self._write_header()
+        return [self._id_at(position) for position in positions]
+
+    def flush(self) -> None:
+        """Сбрасывает на диск только измененные страницы отображения."""
+        size = len(self._mm)
+        for page in sorted(self._dirty):
+            start = page * mmap.PAGESIZE
+            if start < size:
+                self._mm.flush(start, min(mmap.PAGESIZE, size - start))
+        registry.inc('pages_written', len(self._dirty))
+        self._dirty.clear()
+
+    def compact(self) -> int:
+        """Переписывает файл строк без удаленных записей и возвращает их число.
+
+        Новый файл пишется рядом и атомарно подменяет старый, поэтому
+        читатели в других процессах дочитывают прежнюю версию. Куча строк
+        не переписывается: строки ссылаются на нее по смещениям, а две
+        подмены файлов нельзя сделать атомарной для читателей без блокировки.
+        """
+        reclaimed = self.tombstones
+        if not reclaimed:
+            return 0
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, self.row.size, self.live_rows, self.live_rows))
+            for position in range(self.total_rows):
+                offset = self._offset(position)
+                if self._mm[offset] == _LIVE:
+                    f.write(self._mm[offset:offset + self.row.size])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        old_file = self._file
+        self._file = open(self.path, 'r+b')
+        old_file.close()
+        self._map()
+        self._dirty.clear()
+        self.total_rows = self.live_rows
+        return reclaimed
+
+
+def _matches(record: Dict, where_clause: Dict[str, Any]) -> bool:
+    for col, value in where_clause.items():
+        if col not in record or record[col] != value:
+            return False
+    return True
+
+
+def _encode(schema: List[Tuple[str, str]], record: Dict, heap: bytearray, heap_start: int = 0) -> list:
+    values = []
+    for name, col_type in schema:
+        value = record.get(name)
+        if col_type == 'str':
+            data = str(value if value is not None else '').encode('utf-8')
+            values.extend((heap_start + len(heap), len(data)))
+            heap.extend(data)
+        elif col_type == 'bool':
+            values.append(bool(value))
+        else:
+            values.append(int(value or 0))
+    return values
@@ -0,0 +1,170 @@
+"""Буферный пул сессии: разобранные метаданные и таблицы в памяти."""
+
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from .cache import query_cache
+from .constants import DB_META_FILE, FLUSH_INTERVAL
+from .core import get_storage_backend, set_storage_backend
+from .decorators import measure_phase
+from .locking import WriterLock, lock_path
+from .storage import StorageBackend, file_signature, open_backend
+from .utils import load_metadata, save_metadata
+
+
+class BufferPool:
+    """Хранит метаданные и таблицы между командами одной сессии.
+
+    Файлы перечитываются только если их изменил другой процесс (сравниваются
+    inode, время изменения и размер). Изменения таблиц сразу попадают в
+    журнал, а грязные таблицы сворачиваются в базовый файл при flush: по
+    команде checkpoint, при выходе или раз в flush_interval секунд.
+
+    Пул владеет блокировкой писателя (lock) для каталога базы: ее берут
+    команды, изменяющие данные, и flush. Данные читаются и пишутся через
+    хранилище базы (backend, см. storage); backend_name задает хранилище
+    для новой базы. Метаданные и таблицы открываются под блокировкой
+    пула: сервер читает из пула в нескольких потоках.
+    """
+
+    def __init__(self, meta_file: str = DB_META_FILE, flush_interval: float = FLUSH_INTERVAL,
+                 backend_name: Optional[str] = None):
+        self.meta_file = meta_file
+        self.flush_interval = flush_interval
+        self.backend_name = backend_name
+        self._backend: Optional[StorageBackend] = None
+        self._metadata: Optional[dict] = None
+        self._meta_signature = None
+        self._tables: Dict[str, dict] = {}
+        self._dirty: Set[str] = set()
+        self._last_flush = time.monotonic()
+        self._open_lock = threading.RLock()
+        self.lock = WriterLock(lock_path(meta_file))
+
+    @measure_phase('load')
+    def get_metadata(self) -> dict:
+        """Возвращает метаданные, перечитывая файл только при внешнем изменении."""
+        signature = file_signature(self.meta_file)
+        metadata = self._metadata
+        if metadata is not None and signature == self._meta_signature:
+            return metadata
+        with self._open_lock:
+            if self._metadata is None or signature != self._meta_signature:
+                self._metadata = load_metadata(self.meta_file)
+                self._meta_signature = signature
+                if self._backend is None:
+                    # Хранилище выбирается по метаданным с диска, до их изменения командой.
+                    self._backend = open_backend(get_storage_backend(self._metadata, self.backend_name))
+            return self._metadata
+
+    def save_metadata(self, metadata: dict) -> None:
+        """Сохраняет метаданные (с записью о хранилище базы) и запоминает новую подпись файла."""
+        set_storage_backend(metadata, self.backend.name)
+        save_metadata(self.meta_file, metadata)
+        self._metadata = metadata
+        self._meta_signature = file_signature(self.meta_file)
+
+    def reload_metadata(self) -> None:
+        """Отбрасывает метаданные в памяти; следующий get_metadata прочитает файл."""
+        self._metadata = None
+
+    @property
+    def backend(self) -> StorageBackend:
+        """Хранилище базы; выбирается по метаданным при первом чтении."""
+        if self._backend is None:
+            self._metadata = None
+            self.get_metadata()
+        return self._backend
+
+    @measure_phase('load')
+    def get_table(self, metadata: dict, table_name: str) -> tuple:
+        """Возвращает данные и индексы таблицы из пула.
+
+        Таблица открывается хранилищем (StorageBackend.open). Для таблиц,
+        которые ищут записи сами (колоночный движок, двоичный и
+        секционированный форматы, SQLite), вместо индексов возвращается None.
+        """
+        signature = self.backend.signature(table_name)
+        entry = self._tables.get(table_name)
+        if entry is not None and entry['signature'] == signature:
+            return entry['data'], entry['indexes']
+        with self._open_lock:
+            # Пока ждали блокировку, таблицу мог открыть другой поток.
+            signature = self.backend.signature(table_name)
+            entry = self._tables.get(table_name)
+            if entry is None or entry['signature'] != signature:
+                if entry is not None:
+                    # Таблицу изменил другой процесс: результаты в кэше устарели.
+                    query_cache.invalidate(table_name)
+                    self._dirty.discard(table_name)
+                    self.backend.close(entry['data'])
+                table_data, table_indexes = self.backend.open(metadata, table_name)
+                entry = {'data': table_data, 'indexes': table_indexes, 'signature': signature}
+                self._tables[table_name] = entry
+            return entry['data'], entry['indexes']
+
+    def mark_dirty(self, table_name: str, table_data) -> None:
+        """Отмечает таблицу как измененную после записи в журнал."""
+        entry = self._tables.get(table_name)
+        if entry is None:
+            return
+        entry['data'] = table_data
+        entry['signature'] = self.backend.signature(table_name)
+        if self.backend.has_pending(table_name, table_data):
+            self._dirty.add(table_name)
+        else:
+            self._dirty.discard(table_name)
+
+    def refresh_signature(self, table_name: str) -> None:
+        """Запоминает подпись файлов таблицы после записи этим процессом."""
+        entry = self._tables.get(table_name)
+        if entry is not None:
+            entry['signature'] = self.backend.signature(table_name)
+
+    def evict(self, table_name: str) -> None:
+        """Удаляет таблицу из пула (например, после drop_table)."""
+        entry = self._tables.pop(table_name, None)
+        if entry is not None:
+            self.backend.close(entry['data'])
+        self._dirty.discard(table_name)
+
+    def flush(self) -> int:
+        """Сворачивает журналы грязных таблиц в базовые файлы.
+
+        Выполняется под блокировкой писателя. Таблицы, которые с момента
+        загрузки изменил другой процесс, не сохраняются: их состояние в
+        пуле устарело, и они будут перечитаны.
+        """
+        flushed = 0
+        with self.lock:
+            for table_name in sorted(self._dirty):
+                entry = self._tables.get(table_name)
+                if entry is None:
+                    continue
+                if entry['signature'] != self.backend.signature(table_name):
+                    self.evict(table_name)
+                    continue
+                self.backend.checkpoint(table_name, entry['data'])
+                entry['signature'] = self.backend.signature(table_name)
+                flushed += 1
+        self._dirty.clear()
+        self._last_flush = time.monotonic()
+        return flushed
+
+    def flush_due(self) -> bool:
+        """Проверяет, прошло ли с прошлого flush больше flush_interval секунд."""
+        return self.flush_interval > 0 and time.monotonic() - self._last_flush >= self.flush_interval
+
+    def maybe_flush(self) -> None:
+        """Выполняет flush, если с прошлого прошло больше flush_interval секунд."""
+        if self.flush_due():
+            self.flush()
+
+    def close(self) -> None:
+        """Закрывает таблицы и хранилище в конце сеанса."""
+        for table_name in list(self._tables):
+            self.evict(table_name)
+        if self._backend is not None:
+            self._backend.shutdown()
+            self._backend = None
@@ -0,0 +1,111 @@
+"""Кэш результатов select с вытеснением LRU и сбросом при записи."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .constants import QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_MAX_ROWS
+from .metrics import registry
+
+
+class QueryCache:
+    """Кэш результатов запросов.
+
+    Ключ состоит из имени таблицы, версии таблицы и условия запроса.
+    Версия увеличивается при каждой записи в таблицу, поэтому устаревшие
+    результаты никогда не возвращаются. Размер кэша ограничен числом
+    записей и суммарным числом строк в результатах. Кэш общий для потоков
+    сервера, поэтому его словари меняются под блокировкой; запрос
+    вычисляется вне ее.
+    """
+
+    def __init__(self, max_entries: int = QUERY_CACHE_MAX_ENTRIES, max_rows: int = QUERY_CACHE_MAX_ROWS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._entries: 'OrderedDict[Tuple, List[Dict]]' = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._rows = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, table_name: str) -> int:
+        """Возвращает текущую версию таблицы."""
+        return self._versions.get(table_name, 0)
+
+    def get_or_compute(self, table_name: str, predicate_key: Hashable,
+                       compute: Callable[[], List[Dict]]) -> List[Dict]:
+        """Возвращает результат из кэша или вычисляет и сохраняет его."""
+        key = (table_name, self.version(table_name), predicate_key)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(cached)
+            self.misses += 1
+
+        result = compute()
+        self._put(key, list(result))
+        return result
+
+    def lookup(self, table_name: str, predicate_key: Hashable) -> Optional[List[Dict]]:
+        """Возвращает результат из кэша без вычисления или None."""
+        key = (table_name, self.version(table_name), predicate_key)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached
+
+    def peek(self, table_name: str, predicate_key: Hashable) -> Optional[List[Dict]]:
+        """Возвращает результат из кэша, не меняя счетчики и порядок вытеснения (для explain)."""
+        return self._entries.get((table_name, self.version(table_name), predicate_key))
+
+    def invalidate(self, table_name: str) -> None:
+        """Сбрасывает все результаты по таблице после записи в нее."""
+        with self._lock:
+            self._versions[table_name] = self.version(table_name) + 1
+            stale = [key for key in self._entries if key[0] == table_name]
+            for key in stale:
+                self._rows -= len(self._entries.pop(key))
+
+    def clear(self) -> None:
+        """Полностью очищает кэш."""
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает счетчики кэша."""
+        return {
+            'entries': len(self._entries),
+            'rows': self._rows,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _put(self, key: Tuple, rows: List[Dict]) -> None:
+        if self.max_entries <= 0 or len(rows) > self.max_rows:
+            return
+        with self._lock:
+            if key[1] != self.version(key[0]):
+                # Таблицу изменили, пока запрос вычислялся: результат уже устарел.
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._rows -= len(previous)
+            self._entries[key] = rows
+            self._rows += len(rows)
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                _, evicted = self._entries.popitem(last=False)
+                self._rows -= len(evicted)
+                self.evictions += 1
+
+
+query_cache = QueryCache()
+registry.add_collector('query_cache', query_cache.stats)
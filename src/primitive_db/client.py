@@ -0,0 +1,117 @@
+"""Клиент сетевого режима и генератор нагрузки.
+
+Client — простой блокирующий клиент для интерактивной работы с сервером.
+run_load открывает несколько одновременных соединений asyncio и отправляет
+смесь чтений и записей, замеряя задержки в гистограмме metrics.Histogram.
+"""
+
+import asyncio
+import random
+import socket
+import time
+from typing import Dict, Optional
+
+from .constants import SERVER_HOST, SERVER_PORT
+from .metrics import Histogram
+from .server import read_frame
+
+
+class Client:
+    """Блокирующее соединение с сервером: одна команда — один ответ."""
+
+    def __init__(self, host: str = SERVER_HOST, port: int = SERVER_PORT):
+        self._sock = socket.create_connection((host, port))
+        self._file = self._sock.makefile('rwb')
+
+    def execute(self, command: str) -> Optional[str]:
+        """Отправляет команду и возвращает ее вывод (None, если сервер закрыл соединение)."""
+        self._file.write(command.replace('\n', ' ').encode('utf-8') + b'\n')
+        self._file.flush()
+        header = self._file.readline()
+        if not header:
+            return None
+        return self._file.read(int(header)).decode('utf-8')
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self) -> 'Client':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def run_client(host: str = SERVER_HOST, port: int = SERVER_PORT) -> None:
+    """Интерактивный цикл: команды вводятся так же, как в локальном режиме."""
+    try:
+        client = Client(host, port)
+    except OSError as e:
+        print(f'Ошибка: Не удалось подключиться к {host}:{port}: {e}')
+        return
+    with client:
+        print(f'Подключено к {host}:{port}.')
+        while True:
+            try:
+                command = input(f'{host}:{port}>>> ').strip()
+            except EOFError:
+                return
+            output = client.execute(command)
+            if output is None:
+                return
+            print(output, end='')
+
+
+async def _load_worker(host: str, port: int, table: str, requests: int, write_ratio: float,
+                       seed: int, latency: Histogram, counts: Dict[str, int]) -> None:
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            if rng.random() < write_ratio:
+                kind = 'write'
+                command = f'insert into {table} values ("user{rng.randrange(1000)}", {rng.randrange(100)})'
+            else:
+                kind = 'read'
+                command = f'select from {table} where age = {rng.randrange(100)} limit 10'
+            start = time.perf_counter()
+            writer.write(command.encode('utf-8') + b'\n')
+            await writer.drain()
+            if await read_frame(reader) is None:
+                return
+            latency.observe(time.perf_counter() - start)
+            counts[kind] += 1
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def _run_load(host: str, port: int, clients: int, requests: int, write_ratio: float,
+                    table: str) -> Dict:
+    with Client(host, port) as client:
+        client.execute(f'create_table {table} name:str age:int')
+    latency = Histogram()
+    counts = {'read': 0, 'write': 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _load_worker(host, port, table, requests, write_ratio, seed, latency, counts)
+        for seed in range(clients)
+    ))
+    elapsed = time.perf_counter() - start
+    return {
+        'clients': clients,
+        'seconds': elapsed,
+        'requests_per_sec': latency.count / elapsed if elapsed > 0 else None,
+        **counts,
+        'latency': latency.to_dict(),
+    }
+
+
+def run_load(host: str = SERVER_HOST, port: int = SERVER_PORT, clients: int = 8, requests: int = 1000,
+             write_ratio: float = 0.1, table: str = 'load') -> Dict:
+    """Нагружает сервер clients соединениями по requests команд и возвращает сводку.
+
+    Таблица table создается, если ее еще нет; доля записей задается write_ratio.
+    """
+    return asyncio.run(_run_load(host, port, clients, requests, write_ratio, table))
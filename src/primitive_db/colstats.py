@@ -0,0 +1,175 @@
+"""Статистика столбцов таблицы, поддерживаемая при каждом изменении.
+
+Для таблицы хранится число строк, а для каждого столбца — число непустых
+значений, сумма (для int), минимум, максимум и оценка числа различных
+значений (HyperLogLog). Insert, update и delete обновляют статистику за
+O(1), поэтому COUNT(*), SUM, AVG, MIN и MAX по всей таблице не требуют
+просмотра строк.
+
+Если удаляется или изменяется значение, совпадающее с текущим минимумом
+или максимумом, границы столбца помечаются устаревшими и пересчитываются
+одним проходом при следующем запросе. Оценка числа различных значений при
+удалении не уменьшается.
+"""
+
+import math
+from typing import Any, Dict, Iterable, Optional
+
+# Число регистров HyperLogLog: 2^10 (относительная ошибка около 3%)
+_HLL_BITS = 10
+_HLL_SIZE = 1 << _HLL_BITS
+_MASK64 = (1 << 64) - 1
+
+
+def _hash64(value: Any) -> int:
+    """Перемешивает hash() значения (splitmix64), чтобы биты были равномерны и для int."""
+    h = (hash(value) + 0x9E3779B97F4A7C15) & _MASK64
+    h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return h ^ (h >> 31)
+
+
+class DistinctSketch:
+    """Оценка числа различных значений (HyperLogLog)."""
+
+    def __init__(self):
+        self.registers = bytearray(_HLL_SIZE)
+
+    def add(self, value: Any) -> None:
+        h = _hash64(value)
+        index = h & (_HLL_SIZE - 1)
+        rank = 64 - _HLL_BITS - (h >> _HLL_BITS).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / _HLL_SIZE)
+        estimate = alpha * _HLL_SIZE * _HLL_SIZE / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * _HLL_SIZE and zeros:
+            estimate = _HLL_SIZE * math.log(_HLL_SIZE / zeros)
+        return round(estimate)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class ColumnStats:
+    """Статистика одного столбца."""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0
+        self.min: Any = None
+        self.max: Any = None
+        self.stale = False
+        self.distinct = DistinctSketch()
+
+    def add(self, value: Any) -> None:
+        if value is None:
+            return
+        self.count += 1
+        if _is_number(value):
+            self.sum += value
+        self.distinct.add(value)
+        if self.stale:
+            return
+        try:
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+        except TypeError:
+            self.stale = True
+
+    def remove(self, value: Any) -> None:
+        if value is None:
+            return
+        self.count -= 1
+        if _is_number(value):
+            self.sum -= value
+        if value == self.min or value == self.max:
+            self.stale = True
+
+    def refresh(self, values: Iterable[Any]) -> None:
+        """Пересчитывает минимум и максимум по всем значениям столбца."""
+        present = [value for value in values if value is not None]
+        try:
+            self.min = min(present, default=None)
+            self.max = max(present, default=None)
+        except TypeError:
+            self.min = self.max = None
+        self.stale = False
+
+
+class TableStats:
+    """Статистика таблицы.
+
+    Строится одним проходом при первом обращении (build); до этого
+    изменения таблицы ее не затрагивают.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.rows = 0
+        self.columns: Dict[str, ColumnStats] = {}
+
+    def build(self, records: Iterable[Dict]) -> 'TableStats':
+        """Вычисляет статистику по всем записям.
+
+        Готовой статистика отмечается после прохода, чтобы параллельное
+        чтение не увидело ее заполненной наполовину.
+        """
+        built = TableStats()
+        built.ready = True
+        for record in records:
+            built.on_insert(record)
+        self.rows, self.columns = built.rows, built.columns
+        self.ready = True
+        return self
+
+    def reset(self) -> None:
+        """Сбрасывает статистику; следующий запрос построит ее заново."""
+        self.ready = False
+        self.rows = 0
+        self.columns = {}
+
+    def on_insert(self, record: Dict) -> None:
+        if not self.ready:
+            return
+        self.rows += 1
+        for col, value in record.items():
+            column = self.columns.get(col)
+            if column is None:
+                column = self.columns[col] = ColumnStats()
+            column.add(value)
+
+    def on_update(self, record: Dict, old_values: Dict[str, Any]) -> None:
+        if not self.ready:
+            return
+        for col, old_value in old_values.items():
+            new_value = record.get(col)
+            if old_value == new_value:
+                continue
+            column = self.columns.get(col)
+            if column is None:
+                column = self.columns[col] = ColumnStats()
+            column.remove(old_value)
+            column.add(new_value)
+
+    def on_delete(self, record: Dict) -> None:
+        if not self.ready:
+            return
+        self.rows -= 1
+        for col, value in record.items():
+            column = self.columns.get(col)
+            if column is not None:
+                column.remove(value)
+
+    def column(self, col: str, records: Iterable[Dict]) -> Optional[ColumnStats]:
+        """Возвращает актуальную статистику столбца, при необходимости пересчитав границы."""
+        column = self.columns.get(col)
+        if column is not None and column.stale:
+            column.refresh(record.get(col) for record in records)
+        return column
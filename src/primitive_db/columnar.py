@@ -0,0 +1,451 @@
+"""Колоночное хранение таблицы в типизированных буферах.
+
+Каждый столбец хранится отдельно: int — массив int64, bool — упакованная
+битовая карта, str — словарное кодирование (список уникальных строк и
+массив кодов). Условия where вычисляются сразу для всего столбца в виде
+битовой маски (целое число, бит i соответствует строке i), поэтому
+фильтрация не создает словарь на каждую строку.
+
+Если установлен NumPy, сравнения выполняются через него поверх тех же
+буферов без копирования; без NumPy используются только средства stdlib:
+равенство ищется в сыром буфере (bytes.find), коды строк переводятся во
+флаги одной операцией bytes.translate, а сравнения <, >, <=, >= и != для
+столбцов int выполняются поэлементно (map по массиву).
+"""
+
+import sys
+from array import array
+from itertools import compress, repeat
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .metrics import registry
+from .predicates import OPERATORS, And, Between, Compare, Where, from_json
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+_ASCII_BITS = bytes.maketrans(b'\x00\x01', b'01')
+_FLAG_BITS = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def _flags_to_mask(flags: bytes) -> int:
+    """Упаковывает байты 0/1 (по одному на строку) в битовую маску."""
+    if not flags:
+        return 0
+    return int(flags.translate(_ASCII_BITS)[::-1], 2)
+
+
+def _mask_to_flags(mask: int, size: int) -> bytes:
+    """Распаковывает битовую маску в байты 0/1 по одному на строку."""
+    if size == 0:
+        return b''
+    return format(mask, f'0{size}b').encode('ascii')[::-1][:size].translate(_FLAG_BITS)
+
+
+def _mask_positions(mask: int) -> Iterator[int]:
+    """Возвращает номера строк, для которых бит маски установлен."""
+    bits = bin(mask)[:1:-1]
+    pos = bits.find('1')
+    while pos != -1:
+        yield pos
+        pos = bits.find('1', pos + 1)
+
+
+def _equal_flags(buffer: array, value: int) -> bytes:
+    """Сравнивает все элементы массива со значением.
+
+    Без NumPy значение ищется как последовательность байтов в сыром
+    буфере массива (поиск выполняется на C), а совпадения, не выровненные
+    по размеру элемента, отбрасываются.
+    """
+    if np is not None and len(buffer):
+        return (np.frombuffer(buffer, dtype=buffer.typecode) == value).tobytes()
+    flags = bytearray(len(buffer))
+    try:
+        needle = array(buffer.typecode, [value]).tobytes()
+    except OverflowError:
+        return bytes(flags)
+    raw = buffer.tobytes()
+    itemsize = buffer.itemsize
+    pos = raw.find(needle)
+    while pos != -1:
+        if pos % itemsize == 0:
+            flags[pos // itemsize] = 1
+            pos = raw.find(needle, pos + itemsize)
+        else:
+            pos = raw.find(needle, pos + 1)
+    return bytes(flags)
+
+
+def _compare_flags(buffer: array, op: str, value: Any) -> bytes:
+    """Сравнивает все элементы массива со значением оператором op.
+
+    Без NumPy сравнение выполняется поэлементно.
+    """
+    if np is not None and len(buffer):
+        return OPERATORS[op](np.frombuffer(buffer, dtype=buffer.typecode), value).tobytes()
+    return bytes(map(OPERATORS[op], buffer, repeat(value)))
+
+
+def _lookup_flags(codes: array, table: bytes) -> bytes:
+    """Переводит коды во флаги по таблице: флаг кода c равен table[c].
+
+    Без NumPy коды меньше 256 занимают только младший байт элемента,
+    поэтому таблица применяется ко всем младшим байтам одним вызовом
+    bytes.translate. Для словаря больше 256 строк перевод поэлементный.
+    """
+    if np is not None and len(codes):
+        return np.frombuffer(table, dtype=np.uint8)[np.frombuffer(codes, dtype=codes.typecode)].tobytes()
+    if len(table) <= 256:
+        low = 0 if sys.byteorder == 'little' else codes.itemsize - 1
+        low_bytes = bytes(memoryview(codes).cast('B')[low::codes.itemsize])
+        return low_bytes.translate(table.ljust(256, b'\x00'))
+    return bytes(map(table.__getitem__, codes))
+
+
+class IntColumn:
+    """Столбец int в массиве int64."""
+
+    def __init__(self, values=()):
+        self.data = array('q', values)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, i: int) -> int:
+        return self.data[i]
+
+    def set(self, i: int, value: int) -> None:
+        self.data[i] = value
+
+    def append(self, value: int) -> None:
+        self.data.append(value)
+
+    def extend(self, values) -> None:
+        self.data.extend(values)
+
+    def equal_mask(self, value: Any) -> int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            return 0
+        return _flags_to_mask(_equal_flags(self.data, value))
+
+    def compare_mask(self, op: str, value: Any) -> int:
+        if op == '=':
+            return self.equal_mask(value)
+        if isinstance(value, bool) or not isinstance(value, int):
+            return 0
+        return _flags_to_mask(_compare_flags(self.data, op, value))
+
+    def keep(self, flags: bytes) -> None:
+        self.data = array('q', compress(self.data, flags))
+
+    def nbytes(self) -> int:
+        return len(self.data) * self.data.itemsize
+
+
+class BoolColumn:
+    """Столбец bool в упакованной битовой карте (8 значений в байте)."""
+
+    def __init__(self, values=()):
+        flags = bytes(bool(value) for value in values)
+        self.size = len(flags)
+        self.bitmap = bytearray(_flags_to_mask(flags).to_bytes((self.size + 7) // 8, 'little'))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def get(self, i: int) -> bool:
+        return bool(self.bitmap[i >> 3] >> (i & 7) & 1)
+
+    def set(self, i: int, value: bool) -> None:
+        if value:
+            self.bitmap[i >> 3] |= 1 << (i & 7)
+        else:
+            self.bitmap[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+    def append(self, value: bool) -> None:
+        if self.size % 8 == 0:
+            self.bitmap.append(0)
+        self.size += 1
+        self.set(self.size - 1, value)
+
+    def extend(self, values) -> None:
+        flags = bytes(bool(value) for value in values)
+        # Новые биты сдвигаются за последний неполный байт карты и объединяются с ним.
+        shift = self.size & 7
+        bits = _flags_to_mask(flags) << shift
+        if shift:
+            bits |= self.bitmap.pop()
+        self.size += len(flags)
+        self.bitmap.extend(bits.to_bytes((self.size + 7) // 8 - len(self.bitmap), 'little'))
+
+    def equal_mask(self, value: Any) -> int:
+        if not isinstance(value, bool):
+            return 0
+        bits = int.from_bytes(self.bitmap, 'little')
+        return bits if value else ~bits & ((1 << self.size) - 1)
+
+    def compare_mask(self, op: str, value: Any) -> int:
+        if not isinstance(value, bool):
+            return 0
+        result = 0
+        for candidate in (False, True):
+            if OPERATORS[op](candidate, value):
+                result |= self.equal_mask(candidate)
+        return result
+
+    def keep(self, flags: bytes) -> None:
+        current = _mask_to_flags(int.from_bytes(self.bitmap, 'little'), self.size)
+        kept = bytes(compress(current, flags))
+        self.size = len(kept)
+        self.bitmap = bytearray(_flags_to_mask(kept).to_bytes((self.size + 7) // 8, 'little'))
+
+    def nbytes(self) -> int:
+        return len(self.bitmap)
+
+
+class StrColumn:
+    """Столбец str со словарным кодированием."""
+
+    def __init__(self, values=()):
+        self.dictionary: List[str] = []
+        self.lookup: Dict[str, int] = {}
+        self.codes = array('I')
+        for value in values:
+            self.append(value)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _encode(self, value: str) -> int:
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.dictionary)
+            self.dictionary.append(value)
+            self.lookup[value] = code
+        return code
+
+    def get(self, i: int) -> str:
+        return self.dictionary[self.codes[i]]
+
+    def set(self, i: int, value: str) -> None:
+        self.codes[i] = self._encode(value)
+
+    def append(self, value: str) -> None:
+        self.codes.append(self._encode(value))
+
+    def extend(self, values) -> None:
+        self.codes.extend(map(self._encode, values))
+
+    def equal_mask(self, value: Any) -> int:
+        code = self.lookup.get(value) if isinstance(value, str) else None
+        if code is None:
+            return 0
+        return _flags_to_mask(_equal_flags(self.codes, code))
+
+    def compare_mask(self, op: str, value: Any) -> int:
+        """Сравнивает один раз каждую строку словаря, затем переводит коды во флаги."""
+        if op == '=':
+            return self.equal_mask(value)
+        if not isinstance(value, str):
+            return 0
+        func = OPERATORS[op]
+        code_flags = bytes(func(entry, value) for entry in self.dictionary)
+        if not any(code_flags):
+            return 0
+        return _flags_to_mask(_lookup_flags(self.codes, code_flags))
+
+    def keep(self, flags: bytes) -> None:
+        self.codes = array('I', compress(self.codes, flags))
+
+    def nbytes(self) -> int:
+        return len(self.codes) * self.codes.itemsize + sum(len(s) for s in self.dictionary)
+
+
+_COLUMN_TYPES = {'int': IntColumn, 'bool': BoolColumn, 'str': StrColumn}
+
+
+class ColumnarTable:
+    """Таблица, хранящая данные по столбцам.
+
+    Поддерживает тот же протокол, что и список записей (len, итерация,
+    индексация, append), поэтому может передаваться в функции core.
+    """
+
+    def __init__(self, schema: List[Tuple[str, str]]):
+        self.schema = schema
+        self.columns = {name: _COLUMN_TYPES[col_type]() for name, col_type in schema}
+
+    @classmethod
+    def from_records(cls, schema: List[Tuple[str, str]], records: List[Dict]) -> 'ColumnarTable':
+        """Строит колоночную таблицу из списка записей."""
+        table = cls(schema)
+        table.extend(records)
+        return table
+
+    @classmethod
+    def from_batches(cls, schema: List[Tuple[str, str]], batches: Iterable[List[Dict]]) -> 'ColumnarTable':
+        """Строит колоночную таблицу по пачкам записей (например, по страницам).
+
+        Каждая пачка сразу переносится в столбцы, поэтому список записей
+        всей таблицы не создается.
+        """
+        table = cls(schema)
+        for records in batches:
+            table.extend(records)
+        return table
+
+    def __len__(self) -> int:
+        return len(self.columns['ID']) if 'ID' in self.columns else 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def __getitem__(self, i: int) -> Dict:
+        if i < 0:
+            i += len(self)
+        return self.record(i)
+
+    def record(self, i: int) -> Dict:
+        """Собирает запись-словарь для строки с номером i."""
+        return {name: column.get(i) for name, column in self.columns.items()}
+
+    def to_records(self) -> List[Dict]:
+        """Возвращает все строки в виде списка словарей."""
+        return list(self)
+
+    def append(self, record: Dict) -> None:
+        """Добавляет запись в конец таблицы."""
+        for name, column in self.columns.items():
+            column.append(record.get(name))
+
+    def extend(self, records: List[Dict]) -> None:
+        """Добавляет записи в конец таблицы, заполняя по одному столбцу за раз."""
+        for name, column in self.columns.items():
+            column.extend([record.get(name) for record in records])
+
+    def replay(self, entries: Iterator[Dict]) -> 'ColumnarTable':
+        """Применяет записи журнала изменений к столбцам (см. wal.replay).
+
+        Как и для списка записей, вставка записи с уже существующим ID
+        пропускается.
+        """
+        existing_ids = set(self._ids(range(len(self))))
+        for entry in entries:
+            op = entry.get('op')
+            if op in ('insert', 'insert_many'):
+                for record in entry['records'] if op == 'insert_many' else [entry['record']]:
+                    if record.get('ID') in existing_ids:
+                        continue
+                    self.append(record)
+                    existing_ids.add(record.get('ID'))
+            elif op == 'update':
+                self._update_mask(entry['set'], self._entry_mask(entry))
+            elif op == 'delete':
+                existing_ids.difference_update(self._delete_mask(self._entry_mask(entry)))
+        return self
+
+    def _entry_mask(self, entry: Dict) -> int:
+        # Строки записи журнала: по списку ID затронутых строк, если он записан.
+        if 'ids' not in entry:
+            return self._mask(from_json(entry['where']))
+        column = self.columns.get('ID')
+        if column is None:
+            return 0
+        ids = set(entry['ids'])
+        return _flags_to_mask(bytes(map(ids.__contains__, column.data)))
+
+    def mask(self, where_clause: Where) -> int:
+        """Вычисляет битовую маску строк, удовлетворяющих условию.
+
+        AND и OR составных условий переходят в побитовые & и | масок.
+        """
+        registry.inc('rows_scanned', len(self))
+        return self._mask(where_clause)
+
+    def _mask(self, where_clause: Where) -> int:
+        if not isinstance(where_clause, dict):
+            return self._predicate_mask(where_clause)
+        result = (1 << len(self)) - 1
+        for col, value in where_clause.items():
+            column = self.columns.get(col)
+            if column is None:
+                return 0
+            result &= column.equal_mask(value)
+            if not result:
+                return 0
+        return result
+
+    def _predicate_mask(self, predicate) -> int:
+        # Вложенные условия вычисляются через _mask, чтобы строки не считались повторно.
+        if isinstance(predicate, Compare):
+            column = self.columns.get(predicate.column)
+            return 0 if column is None else column.compare_mask(predicate.op, predicate.value)
+        if isinstance(predicate, Between):
+            column = self.columns.get(predicate.column)
+            if column is None:
+                return 0
+            return column.compare_mask('>=', predicate.low) & column.compare_mask('<=', predicate.high)
+        if isinstance(predicate, And):
+            result = (1 << len(self)) - 1
+            for item in predicate.items:
+                result &= self._mask(item)
+                if not result:
+                    return 0
+            return result
+        result = 0
+        for item in predicate.items:
+            result |= self._mask(item)
+        return result
+
+    def select(self, where_clause: Optional[Where] = None) -> List[Dict]:
+        """Возвращает записи, удовлетворяющие условию."""
+        if where_clause is None:
+            return self.to_records()
+        return [self.record(i) for i in _mask_positions(self.mask(where_clause))]
+
+    def iter_select(self, where_clause: Optional[Where] = None) -> Iterator[Dict]:
+        """Лениво возвращает записи, удовлетворяющие условию."""
+        if where_clause is None:
+            return iter(self)
+        return (self.record(i) for i in _mask_positions(self.mask(where_clause)))
+
+    def update(self, set_clause: Dict[str, Any], where_clause: Where) -> List[int]:
+        """Обновляет значения в строках по условию и возвращает их ID."""
+        return self._update_mask(set_clause, self.mask(where_clause))
+
+    def _update_mask(self, set_clause: Dict[str, Any], mask: int) -> List[int]:
+        positions = list(_mask_positions(mask))
+        targets = [(self.columns[col], value) for col, value in set_clause.items() if col in self.columns]
+        for i in positions:
+            for column, value in targets:
+                column.set(i, value)
+        return self._ids(positions)
+
+    def delete(self, where_clause: Where) -> List[int]:
+        """Удаляет строки по условию и возвращает их ID."""
+        return self._delete_mask(self.mask(where_clause))
+
+    def _delete_mask(self, mask: int) -> List[int]:
+        if not mask:
+            return []
+        size = len(self)
+        deleted_ids = self._ids(_mask_positions(mask))
+        keep_flags = _mask_to_flags(~mask & ((1 << size) - 1), size)
+        for column in self.columns.values():
+            column.keep(keep_flags)
+        return deleted_ids
+
+    def _ids(self, positions) -> List[int]:
+        column = self.columns.get('ID')
+        if column is None:
+            return []
+        return [column.get(i) for i in positions]
+
+    def nbytes(self) -> int:
+        """Оценивает объем памяти, занятый буферами столбцов."""
+        return sum(column.nbytes() for column in self.columns.values())
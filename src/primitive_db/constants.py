@@ -1,7 +1,91 @@
 """Константы проекта"""
 
 DB_META_FILE = 'db_meta.json'
+# Файл блокировки писателя (в каталоге файла метаданных)
+DB_LOCK_FILE = 'db.lock'
+# Сколько секунд писатель ждет блокировку, занятую другим процессом
+LOCK_TIMEOUT = 30
+# Сколько раз перечитывается таблица, если ее сменила контрольная точка другого процесса
+SNAPSHOT_RETRIES = 5
 DATA_DIR = 'data/'
 
 VALID_TYPES = {'int', 'str', 'bool'}
 
+
+WAL_SUFFIX = '.log'
+WAL_CHECKPOINT_BYTES = 1024 * 1024
+# Страницы базового файла построчной таблицы: data/<имя_таблицы>.page<k>.<версия>.json
+# по PAGE_ROWS идущих подряд ID; контрольная точка переписывает только измененные страницы
+PAGE_SUFFIX = '.page'
+PAGE_ROWS = 1024
+# Кодек сжатия блоков записей (страниц и сегментов): 'zlib', 'lzma' или 'none'
+BLOCK_CODEC = 'zlib'
+INDEX_SUFFIX = '.idx.json'
+
+QUERY_CACHE_MAX_ENTRIES = 128
+QUERY_CACHE_MAX_ROWS = 100_000
+
+SYSTEM_META_KEY = '__system__'
+
+# Интервал (в секундах) автоматического сохранения измененных таблиц, 0 — отключено
+FLUSH_INTERVAL = 30
+
+IMPORT_BATCH_SIZE = 10_000
+
+# Число строк в одной странице вывода select
+SELECT_PAGE_SIZE = 100
+OUTPUT_MODES = {'table', 'plain'}
+
+# Автоматическое сжатие (vacuum): доля удаленных записей среди хранимых
+# и минимальное число удаленных записей, при которых таблица сжимается
+VACUUM_TOMBSTONE_RATIO = 0.3
+VACUUM_MIN_TOMBSTONES = 1000
+
+# Агрегатные функции select: select count(*), sum(age) from users group by name
+AGGREGATE_FUNCTIONS = ('count', 'sum', 'min', 'max', 'avg')
+
+# Хранилище новой базы: json (файлы в DATA_DIR) или sqlite (один файл SQLITE_FILE).
+# Выбор записывается в метаданные при создании базы и дальше не меняется.
+STORAGE_BACKEND = 'json'
+SQLITE_FILE = 'db.sqlite3'
+
+BINARY_SUFFIX = '.bin'
+BINARY_HEAP_SUFFIX = '.heap'
+STORAGE_FORMATS = {'json', 'binary', 'partitioned', 'compressed', 'columnar'}
+# Форматы с одними и теми же файлами (страницы и журнал изменений): columnar отличается
+# от json только представлением таблицы в памяти
+PAGED_FORMATS = {'json', 'columnar'}
+
+# Сжатые сегменты: каталог data/<имя_таблицы>.seg.json и блоки по SEGMENT_BLOCK_ROWS ID
+SEGMENT_SUFFIX = '.seg'
+SEGMENT_BLOCK_ROWS = 4096
+# Число распакованных блоков, которые сжатая таблица держит в памяти
+SEGMENT_CACHE_BLOCKS = 64
+
+# Секции таблиц: data/<имя_таблицы>.part<k>.json и журналы секций data/<имя_таблицы>.part<k>.log
+PARTITION_SUFFIX = '.part'
+# Число ID в одной секции схемы range и число секций схемы hash по умолчанию
+PARTITION_RANGE_SIZE = 100_000
+PARTITION_HASH_COUNT = 8
+# Полный просмотр распределяется по процессам, если в незагруженных секциях без изменений не меньше строк
+PARALLEL_SCAN_MIN_ROWS = 100_000
+# Число рабочих процессов просмотра, 0 — по числу ядер
+SCAN_WORKERS = 0
+
+# Число разобранных планов команд, хранимых в кэше
+PLAN_CACHE_SIZE = 256
+
+# Число команд пакетного режима, изменения которых фиксируются одной записью на диск
+GROUP_COMMIT_SIZE = 1000
+
+# Файл, в который метрики выгружаются при завершении сеанса ('' — не выгружать);
+# *.json — в JSON, иначе в текстовом формате Prometheus
+METRICS_FILE = ''
+METRICS_FORMATS = ('json', 'prometheus')
+
+# Сетевой режим: адрес по умолчанию и наибольшее число изменений, фиксируемых вместе
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 5555
+SERVER_WRITE_BATCH = 1000
+# Число потоков, выполняющих чтения сервера параллельно
+SERVER_READ_WORKERS = 4
@@ -1,13 +1,103 @@
 """Основная логика работы с таблицами и данными."""
 
-from typing import List, Tuple, Dict, Optional, Any
+from itertools import islice
+from typing import List, Tuple, Dict, Optional, Any, Iterable, Iterator
 
 from .decorators import confirm_action, log_time, handle_db_errors
-from .constants import VALID_TYPES
+from .constants import VALID_TYPES, SYSTEM_META_KEY, PARTITION_HASH_COUNT, PARTITION_RANGE_SIZE, STORAGE_BACKEND
+from .indexes import INDEX_KINDS, TableIndexes
+from .metrics import registry
+from .predicates import Where, compile_predicate, predicate_key as make_predicate_key
+from .cache import query_cache
+from .columnar import ColumnarTable
+from .binfmt import BinaryTable
+from .partitions import PartitionedTable
+from .rowtable import RowTable
+from .segments import SegmentTable
+from .sqlite_store import SqliteTable
+
+# Таблицы, которые сами вычисляют условия where и изменяют свои данные
+_NATIVE_TABLES = (ColumnarTable, BinaryTable, PartitionedTable, SegmentTable, SqliteTable)
+
+
+def table_exists(metadata: dict, table_name: str) -> bool:
+    """Проверяет, описана ли таблица в метаданных."""
+    return table_name != SYSTEM_META_KEY and table_name in metadata
+
+
+def _get_sequences(metadata: dict) -> Dict[str, int]:
+    return metadata.setdefault(SYSTEM_META_KEY, {}).setdefault('sequences', {})
+
+
+def get_storage_backend(metadata: dict, default: Optional[str] = None) -> str:
+    """Возвращает хранилище базы из метаданных.
+
+    Для базы без записи о хранилище: json, если в ней уже есть таблицы
+    (база создана до появления хранилищ), иначе default или STORAGE_BACKEND.
+    """
+    backend = metadata.get(SYSTEM_META_KEY, {}).get('backend')
+    if backend is not None:
+        return backend
+    if any(table_exists(metadata, name) for name in metadata):
+        return 'json'
+    return default or STORAGE_BACKEND
+
+
+def set_storage_backend(metadata: dict, backend: str) -> None:
+    """Запоминает хранилище базы в метаданных."""
+    metadata.setdefault(SYSTEM_META_KEY, {})['backend'] = backend
+
+
+def get_table_format(metadata: dict, table_name: str) -> str:
+    """Возвращает формат хранения таблицы ('json', 'binary', 'columnar' и т. д.)."""
+    return metadata.get(SYSTEM_META_KEY, {}).get('formats', {}).get(table_name, 'json')
+
+
+def set_table_format(metadata: dict, table_name: str, storage_format: str) -> None:
+    """Запоминает формат хранения таблицы в метаданных."""
+    system = metadata.setdefault(SYSTEM_META_KEY, {})
+    formats = system.setdefault('formats', {})
+    if storage_format == 'json':
+        formats.pop(table_name, None)
+    else:
+        formats[table_name] = storage_format
+    if storage_format != 'partitioned':
+        system.get('partitions', {}).pop(table_name, None)
+
+
+def get_table_partitioning(metadata: dict, table_name: str) -> Tuple[str, int]:
+    """Возвращает схему секционирования таблицы и размер: (схема, size)."""
+    spec = metadata.get(SYSTEM_META_KEY, {}).get('partitions', {}).get(table_name, {})
+    scheme = spec.get('scheme', 'range')
+    default_size = PARTITION_HASH_COUNT if scheme == 'hash' else PARTITION_RANGE_SIZE
+    return scheme, spec.get('size', default_size)
+
+
+def set_table_partitioning(metadata: dict, table_name: str, scheme: str, size: int) -> None:
+    """Запоминает схему секционирования таблицы в метаданных."""
+    partitions = metadata.setdefault(SYSTEM_META_KEY, {}).setdefault('partitions', {})
+    partitions[table_name] = {'scheme': scheme, 'size': size}
+
+
+def reserve_ids(metadata: dict, table_name: str, count: int, table_data: List[Dict]) -> range:
+    """Резервирует блок из count новых ID в последовательности таблицы.
+
+    Последовательность хранится в метаданных и только растет, поэтому ID
+    удаленных записей повторно не выдаются. Для таблиц, созданных до
+    появления последовательностей, счетчик один раз вычисляется по данным.
+    """
+    sequences = _get_sequences(metadata)
+    last_id = sequences.get(table_name)
+    if last_id is None:
+        last_id = max((record.get('ID', 0) for record in table_data), default=0)
+    sequences[table_name] = last_id + count
+    return range(last_id + 1, last_id + count + 1)
 
 
 def create_table(metadata: dict, table_name: str, columns: List[str]) -> Tuple[dict, str]:
     """Создает новую таблицу в метаданных"""
+    if table_name == SYSTEM_META_KEY:
+        return metadata, f'Некорректное значение: {table_name}. Попробуйте снова.'
     if table_name in metadata:
         return metadata, f'Ошибка: Таблица "{table_name}" уже существует.'
     
@@ -37,6 +127,7 @@ def create_table(metadata: dict, table_name: str, columns: List[str]) -> Tuple[d
             parsed_columns.insert(0, id_col)
     
     metadata[table_name] = parsed_columns
+    _get_sequences(metadata)[table_name] = 0
     columns_str = ', '.join(parsed_columns)
     return metadata, f'Таблица "{table_name}" успешно создана со столбцами: {columns_str}'
 
@@ -44,19 +135,21 @@ def create_table(metadata: dict, table_name: str, columns: List[str]) -> Tuple[d
 @confirm_action("удаление таблицы")
 def drop_table(metadata: dict, table_name: str) -> Tuple[dict, str]:
     """Удаляет таблицу из метаданных."""
-    if table_name not in metadata:
+    if not table_exists(metadata, table_name):
         return metadata, f'Ошибка: Таблица "{table_name}" не существует.'
     
     del metadata[table_name]
+    _get_sequences(metadata).pop(table_name, None)
+    set_table_format(metadata, table_name, 'json')
     return metadata, f'Таблица "{table_name}" успешно удалена.'
 
 
 def list_tables(metadata: dict) -> str:
     """Возвращает список всех таблиц."""
-    if not metadata:
+    tables = [table for table in metadata if table != SYSTEM_META_KEY]
+    if not tables:
         return ''
     
-    tables = list(metadata.keys())
     return '\n'.join(f'- {table}' for table in tables)
 
 
@@ -66,7 +159,7 @@ def _parse_column_schema(column_str: str) -> Tuple[str, str]:
 
 
 def _get_table_schema(metadata: dict, table_name: str) -> List[Tuple[str, str]]:
-    if table_name not in metadata:
+    if not table_exists(metadata, table_name):
         return []
     return [_parse_column_schema(col) for col in metadata[table_name]]
 
@@ -95,9 +188,10 @@ def _convert_value(value: str, target_type: str) -> Any:
 
 
 @log_time
-def insert(metadata: dict, table_name: str, values: List[str], table_data: List[Dict]) -> Tuple[List[Dict], str]:
+def insert(metadata: dict, table_name: str, values: List[str], table_data: List[Dict],
+           table_indexes: Optional[TableIndexes] = None) -> Tuple[List[Dict], str]:
     """Вставляет новую запись в таблицу."""
-    if table_name not in metadata:
+    if not table_exists(metadata, table_name):
         return table_data, f'Ошибка: Таблица "{table_name}" не существует.'
     
     schema = _get_table_schema(metadata, table_name)
@@ -113,98 +207,429 @@ def insert(metadata: dict, table_name: str, values: List[str], table_data: List[
             return table_data, "Ошибка при преобразовании значения."
         converted_values.append(converted_value)
     
-    if table_data:
-        max_id = max(record.get('ID', 0) for record in table_data if 'ID' in record)
-        new_id = max_id + 1
-    else:
-        new_id = 1
+    new_id = reserve_ids(metadata, table_name, 1, table_data)[0]
     
     new_record = {'ID': new_id}
     for i, (col_name, _) in enumerate(data_columns):
         new_record[col_name] = converted_values[i]
     
     table_data.append(new_record)
+    if table_indexes is not None:
+        table_indexes.on_insert(new_record)
     return table_data, f'Запись с ID={new_id} успешно добавлена в таблицу "{table_name}".'
 
 
-_cache_result = None
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'"):
+        return value[1:-1]
+    return value
+
+
+def _column_to_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    value_lower = _unquote(str(value)).lower()
+    if value_lower in ('true', '1', 'yes'):
+        return True
+    if value_lower in ('false', '0', 'no'):
+        return False
+    raise ValueError(f'Некорректное значение: {value}. Ожидается bool.')
+
+
+def _column_to_int(value: Any) -> int:
+    if isinstance(value, bool):
+        raise ValueError(f'Некорректное значение: {value}. Ожидается int.')
+    if isinstance(value, int):
+        return value
+    return int(_unquote(str(value)))
+
+
+def _column_to_str(value: Any) -> str:
+    return _unquote(str(value))
+
+
+_COLUMN_CONVERTERS = {'int': _column_to_int, 'bool': _column_to_bool, 'str': _column_to_str}
+
+_BOOL_WORDS = {
+    True: True, False: False,
+    'true': True, 'True': True, '1': True, 'yes': True,
+    'false': False, 'False': False, '0': False, 'no': False,
+}
+
+
+def _convert_column(values: List[Any], col_type: str) -> List[Any]:
+    """Преобразует значения одного столбца пакета.
+
+    Сначала пробуется быстрый путь без вызова функции на каждое значение;
+    при любом нестандартном значении столбец обрабатывается построчно.
+    """
+    try:
+        if col_type == 'int' and not any(isinstance(value, bool) for value in values):
+            return list(map(int, values))
+        if col_type == 'bool':
+            return [_BOOL_WORDS[value] for value in values]
+    except (KeyError, TypeError, ValueError):
+        pass
+    converter = _COLUMN_CONVERTERS[col_type]
+    return [converter(value) for value in values]
+
+
+def insert_rows(metadata: dict, table_name: str, rows: List[List[Any]], table_data: List[Dict],
+                table_indexes: Optional[TableIndexes] = None) -> Tuple[List[Dict], str, List[Dict]]:
+    """Вставляет пакет записей в таблицу.
+
+    Значения преобразуются по столбцам (один конвертер на весь столбец
+    пакета), ID выдаются одним блоком из последовательности. Пакет
+    вставляется целиком или не вставляется вовсе. Возвращает данные,
+    сообщение и список добавленных записей.
+    """
+    if not table_exists(metadata, table_name):
+        return table_data, f'Ошибка: Таблица "{table_name}" не существует.', []
+    if not rows:
+        return table_data, 'Ошибка: Нет записей для вставки.', []
+    
+    data_columns = _get_table_schema(metadata, table_name)[1:]
+    for row in rows:
+        if len(row) != len(data_columns):
+            return table_data, (f'Ошибка: Неверное количество значений. '
+                                f'Ожидается {len(data_columns)}, получено {len(row)}.'), []
+    
+    converted_columns = []
+    for i, (col_name, col_type) in enumerate(data_columns):
+        try:
+            converted_columns.append(_convert_column([row[i] for row in rows], col_type))
+        except (TypeError, ValueError) as e:
+            return table_data, f'Ошибка валидации в столбце "{col_name}": {e}', []
+    
+    new_ids = reserve_ids(metadata, table_name, len(rows), table_data)
+    column_names = ['ID'] + [col_name for col_name, _ in data_columns]
+    new_records = [dict(zip(column_names, values)) for values in zip(new_ids, *converted_columns)]
+    
+    for record in new_records:
+        table_data.append(record)
+    if table_indexes is not None:
+        for record in new_records:
+            table_indexes.on_insert(record)
+    
+    message = (f'Записи с ID={new_ids[0]}..{new_ids[-1]} ({len(new_records)} шт.) '
+               f'успешно добавлены в таблицу "{table_name}".')
+    return table_data, message, new_records
 
-def _get_cacher():
-    global _cache_result
-    if _cache_result is None:
-        from .decorators import create_cacher
-        _cache_result = create_cacher()
-    return _cache_result
 
 @log_time
-def select(table_data: List[Dict], where_clause: Optional[Dict[str, Any]] = None) -> List[Dict]:
-    """Выбирает записи из таблицы с опциональным условием."""
-    if where_clause is None:
+def insert_many(metadata: dict, table_name: str, rows: List[List[Any]], table_data: List[Dict],
+                table_indexes: Optional[TableIndexes] = None) -> Tuple[List[Dict], str, List[Dict]]:
+    """Вставляет несколько записей одной командой."""
+    return insert_rows(metadata, table_name, rows, table_data, table_indexes)
+
+
+def find_records(table_data: List[Dict], where_clause: Where,
+                 table_indexes: Optional[TableIndexes] = None) -> List[Dict]:
+    """Находит записи по условию, используя индекс, если он есть."""
+    if isinstance(table_data, _NATIVE_TABLES):
+        return table_data.select(where_clause)
+    if table_indexes is not None:
+        result = table_indexes.lookup(where_clause)
+        if result is not None:
+            return result
+    rows = _zone_rows(table_data, where_clause, table_indexes)
+    registry.inc('rows_scanned', len(rows))
+    check = compile_predicate(where_clause)
+    return [record for record in rows if check(record)]
+
+
+def _zone_rows(table_data: List[Dict], where_clause: Where,
+               table_indexes: Optional[TableIndexes]) -> List[Dict]:
+    """Оставляет для просмотра только блоки ID, которые по зональным картам могут подходить.
+
+    Блоки отсекаются у построчной таблицы, упорядоченной по ID; иначе
+    или если отсечь нечего, возвращается вся таблица.
+    """
+    if table_indexes is None or not isinstance(table_data, RowTable) or not table_data.ordered:
         return table_data
+    zones = table_indexes.table_zones()
+    keys = zones.candidate_keys(where_clause)
+    skipped = len(zones.zones) - len(keys)
+    if not skipped:
+        return table_data
+    registry.inc('blocks_skipped', skipped)
+    size = zones.block_rows
+    rows = []
+    for key in keys:
+        rows.extend(table_data.id_range(key * size, (key + 1) * size))
+    return rows
+
+
+def _scan(table_data: List[Dict], check) -> Iterator[Dict]:
+    """Перебирает записи с проверкой условия, считая просмотренные строки."""
+    scanned = 0
+    try:
+        for record in table_data:
+            scanned += 1
+            if check(record):
+                yield record
+    finally:
+        registry.inc('rows_scanned', scanned)
+
+
+def iter_records(table_data: List[Dict], where_clause: Optional[Where] = None,
+                 table_indexes: Optional[TableIndexes] = None) -> Iterator[Dict]:
+    """Лениво перебирает записи, удовлетворяющие условию."""
+    if where_clause is None:
+        return _scan(table_data, bool)
+    if isinstance(table_data, _NATIVE_TABLES):
+        return table_data.iter_select(where_clause)
+    if table_indexes is not None:
+        result = table_indexes.lookup(where_clause)
+        if result is not None:
+            return iter(result)
+    return _scan(_zone_rows(table_data, where_clause, table_indexes), compile_predicate(where_clause))
+
+
+@log_time
+def select(table_data: List[Dict], where_clause: Optional[Where] = None,
+           table_indexes: Optional[TableIndexes] = None,
+           table_name: Optional[str] = None,
+           limit: Optional[int] = None, offset: int = 0) -> Iterable[Dict]:
+    """Выбирает записи из таблицы с опциональным условием.
+
+    Если передано имя таблицы, результат кэшируется в query_cache.
+    При заданных limit/offset возвращается ленивый итератор: записи
+    фильтруются по мере чтения, и перебор останавливается, как только
+    набрано limit строк (готовый результат из кэша тоже используется).
+    """
+    predicate_key = make_predicate_key(where_clause)
+    
+    if limit is not None or offset:
+        rows = None
+        if where_clause is not None and table_name is not None:
+            rows = query_cache.lookup(table_name, predicate_key)
+        if rows is None:
+            rows = iter_records(table_data, where_clause, table_indexes)
+        stop = None if limit is None else offset + limit
+        return islice(rows, offset, stop)
     
-    cache_key = tuple(sorted(where_clause.items()))
-    cacher = _get_cacher()
+    if where_clause is None:
+        registry.inc('rows_scanned', len(table_data))
+        return table_data
     
     def _select_impl():
-        result = []
-        for record in table_data:
-            match = True
-            for col, value in where_clause.items():
-                if col not in record or record[col] != value:
-                    match = False
-                    break
-            if match:
-                result.append(record)
-        return result
-    
-    return cacher(cache_key, _select_impl)
-
-
-def update(table_data: List[Dict], set_clause: Dict[str, Any], where_clause: Dict[str, Any]) -> Tuple[List[Dict], int]:
-    """Обновляет записи в таблице по условию."""
-    updated_count = 0
-    for record in table_data:
-        match = True
-        for col, value in where_clause.items():
-            if col not in record or record[col] != value:
-                match = False
-                break
-        
-        if match:
-            for col, new_value in set_clause.items():
-                record[col] = new_value
-            updated_count += 1
+        return find_records(table_data, where_clause, table_indexes)
     
-    return table_data, updated_count
+    if table_name is None:
+        return _select_impl()
+    return query_cache.get_or_compute(table_name, predicate_key, _select_impl)
 
 
-@confirm_action("удаление записи")
-def delete(table_data: List[Dict], where_clause: Dict[str, Any]) -> Tuple[List[Dict], int]:
-    """Удаляет записи из таблицы по условию."""
+def _aggregate_from_stats(table_data: List[Dict], items: List[Any],
+                          table_indexes: Optional[TableIndexes]) -> Optional[Dict]:
+    """Вычисляет агрегаты по всей таблице без просмотра строк, если это возможно.
+
+    count(*) берется из длины таблицы, остальные функции — из статистики
+    столбцов (TableIndexes.stats). Возвращает None, если статистики нет.
+    """
+    row = {}
+    for item in items:
+        if item.column is None:
+            row[item.label] = len(table_data)
+            continue
+        if table_indexes is None:
+            return None
+        stats = table_indexes.table_stats()
+        column = stats.column(item.column, table_indexes.primary.values())
+        count = column.count if column is not None else 0
+        if item.func == 'count':
+            row[item.label] = count
+        elif not count:
+            row[item.label] = None
+        elif item.func == 'sum':
+            row[item.label] = column.sum
+        elif item.func == 'avg':
+            row[item.label] = column.sum / count
+        else:
+            row[item.label] = column.min if item.func == 'min' else column.max
+    registry.inc('aggregates_from_stats')
+    return row
+
+
+def _initial_state(items: List[Any]) -> List[Any]:
+    return [0 if item.func == 'count' else [0, 0] if item.func == 'avg' else None for item in items]
+
+
+def _final_value(func: Optional[str], state: Any) -> Any:
+    if func == 'avg':
+        return state[0] / state[1] if state[1] else None
+    return state
+
+
+@log_time
+def aggregate(table_data: List[Dict], items: List[Any], where_clause: Optional[Where] = None,
+              group_by: Iterable[str] = (),
+              table_indexes: Optional[TableIndexes] = None) -> List[Dict]:
+    """Вычисляет count/sum/min/max/avg с группировкой за один потоковый проход.
+
+    Записи не накапливаются: для каждой группы хранится только состояние
+    функций. Без where и group by результат берется из статистики таблицы
+    (см. colstats), если она доступна. Группы возвращаются по возрастанию ключа.
+    """
+    group_by = list(group_by)
+    if where_clause is None and not group_by:
+        row = _aggregate_from_stats(table_data, items, table_indexes)
+        if row is not None:
+            return [row]
+    
+    steps = [(i, item.func, item.column) for i, item in enumerate(items) if item.func is not None]
+    groups: Dict[tuple, List[Any]] = {}
+    if not group_by:
+        groups[()] = _initial_state(items)
+    for record in iter_records(table_data, where_clause, table_indexes):
+        key = tuple(record.get(col) for col in group_by)
+        state = groups.get(key)
+        if state is None:
+            state = groups[key] = _initial_state(items)
+        for i, func, col in steps:
+            if col is None:
+                state[i] += 1
+                continue
+            value = record.get(col)
+            if value is None:
+                continue
+            if func == 'count':
+                state[i] += 1
+            elif func == 'avg':
+                state[i][0] += value
+                state[i][1] += 1
+            elif func == 'sum':
+                state[i] = value if state[i] is None else state[i] + value
+            elif state[i] is None or (value < state[i] if func == 'min' else value > state[i]):
+                state[i] = value
+    
+    keys = list(groups)
+    try:
+        keys.sort()
+    except TypeError:
+        pass
+    
     result = []
-    deleted_count = 0
+    for key in keys:
+        state = groups[key]
+        group_values = dict(zip(group_by, key))
+        result.append({
+            item.label: group_values.get(item.column) if item.func is None else _final_value(item.func, state[i])
+            for i, item in enumerate(items)
+        })
+    return result
+
+
+def update(table_data: List[Dict], set_clause: Dict[str, Any], where_clause: Where,
+           table_indexes: Optional[TableIndexes] = None) -> Tuple[List[Dict], List[int]]:
+    """Обновляет записи в таблице по условию.
+
+    Возвращает таблицу и ID измененных записей, найденных за один проход.
+    """
+    if isinstance(table_data, _NATIVE_TABLES):
+        return table_data, table_data.update(set_clause, where_clause)
     
-    for record in table_data:
-        match = True
-        for col, value in where_clause.items():
-            if col not in record or record[col] != value:
-                match = False
-                break
-        
-        if not match:
-            result.append(record)
-        else:
-            deleted_count += 1
+    updated_ids = []
+    for record in find_records(table_data, where_clause, table_indexes):
+        old_values = {col: record.get(col) for col in set_clause}
+        for col, new_value in set_clause.items():
+            record[col] = new_value
+        if table_indexes is not None:
+            table_indexes.on_update(record, old_values)
+        updated_ids.append(record.get('ID'))
+    
+    return table_data, updated_ids
+
+
+@confirm_action("удаление записи")
+def delete(table_data: List[Dict], where_clause: Where,
+           table_indexes: Optional[TableIndexes] = None) -> Tuple[List[Dict], List[int]]:
+    """Удаляет записи из таблицы по условию.
+
+    Возвращает таблицу и ID удаленных записей, найденных за один проход.
+    В RowTable записи только помечаются удаленными (см. rowtable), для
+    обычного списка возвращается новый список без удаленных записей.
+    """
+    if isinstance(table_data, _NATIVE_TABLES):
+        return table_data, table_data.delete(where_clause)
+    
+    matched = find_records(table_data, where_clause, table_indexes)
+    if not matched:
+        return table_data, []
+    
+    if isinstance(table_data, RowTable):
+        table_data.delete_records(matched)
+        result = table_data
+    else:
+        deleted_ids = {id(record) for record in matched}
+        result = [record for record in table_data if id(record) not in deleted_ids]
+    if table_indexes is not None:
+        for record in matched:
+            table_indexes.on_delete(record)
     
-    return result, deleted_count
+    return result, [record.get('ID') for record in matched]
+
+
+def create_index(metadata: dict, table_name: str, column: str, table_data: List[Dict],
+                 table_indexes: TableIndexes, kind: str = 'hash') -> str:
+    """Создает индекс по столбцу таблицы: хэш-индекс или упорядоченный (sorted)."""
+    if not table_exists(metadata, table_name):
+        return f'Ошибка: Таблица "{table_name}" не существует.'
+    
+    column_types = dict(_get_table_schema(metadata, table_name))
+    if column not in column_types:
+        return f'Ошибка: Столбец "{column}" не найден в таблице "{table_name}".'
+    
+    if kind not in INDEX_KINDS:
+        return f'Ошибка: Неизвестный вид индекса "{kind}". Допустимо: {", ".join(INDEX_KINDS)}.'
+    
+    if kind == 'sorted' and column_types[column] not in ('int', 'str'):
+        return 'Ошибка: Упорядоченный индекс поддерживается только для столбцов int и str.'
+    
+    if isinstance(table_data, _NATIVE_TABLES) and not isinstance(table_data, SqliteTable):
+        # Такие таблицы ищут записи сами (маски столбцов, поиск по ID, отсечение секций и
+        # блоков), и индекс не был бы ни использован, ни обновлен.
+        storage_format = get_table_format(metadata, table_name)
+        return f'Ошибка: Таблица "{table_name}" в формате {storage_format} не поддерживает индексы.'
+    
+    if isinstance(table_data, SqliteTable):
+        # Индекс SQLite упорядочен и отвечает и на равенства, и на диапазоны.
+        table_data.create_index(column)
+        return f'Индекс по столбцу "{column}" таблицы "{table_name}" успешно создан.'
+    
+    if table_indexes.has_column(column, kind):
+        return f'Индекс по столбцу "{column}" таблицы "{table_name}" уже существует.'
+    
+    table_indexes.add_column(column, table_data, kind)
+    return f'Индекс по столбцу "{column}" таблицы "{table_name}" успешно создан.'
+
+
+def get_table_schema(metadata: dict, table_name: str) -> List[Tuple[str, str]]:
+    """Возвращает схему таблицы в виде списка пар (столбец, тип)."""
+    return _get_table_schema(metadata, table_name)
+
 
+def get_table_info(metadata: dict, table_name: str, table_data: List[Dict],
+                   table_indexes: Optional[TableIndexes] = None) -> str:
+    """Возвращает информацию о таблице.
 
-def get_table_info(metadata: dict, table_name: str, table_data: List[Dict]) -> str:
-    """Возвращает информацию о таблице."""
-    if table_name not in metadata:
+    Если переданы индексы, добавляется статистика столбцов: минимум,
+    максимум и оценка числа различных значений.
+    """
+    if not table_exists(metadata, table_name):
         return f'Ошибка: Таблица "{table_name}" не существует.'
     
     columns_str = ', '.join(metadata[table_name])
     count = len(table_data)
-    return f'Таблица: {table_name}\nСтолбцы: {columns_str}\nКоличество записей: {count}'
+    lines = [f'Таблица: {table_name}', f'Столбцы: {columns_str}', f'Количество записей: {count}']
+    if table_indexes is not None:
+        stats = table_indexes.table_stats()
+        for col, _ in _get_table_schema(metadata, table_name):
+            column = stats.column(col, table_indexes.primary.values())
+            if column is None or not column.count:
+                continue
+            lines.append(f'  {col}: min={column.min}, max={column.max}, '
+                         f'различных ≈ {min(column.distinct.estimate(), column.count)}')
+    return '\n'.join(lines)
 
@@ -2,7 +2,9 @@
 
 import time
 from functools import wraps
-from typing import Callable, Any
+from typing import Callable
+
+from .metrics import registry
 
 
 def handle_db_errors(func: Callable) -> Callable:
@@ -34,12 +36,38 @@ def handle_db_errors(func: Callable) -> Callable:
     return wrapper
 
 
+CONFIRM_POLICIES = ('ask', 'yes', 'no')
+
+# Политика подтверждения: 'ask' — спросить через input(), 'yes'/'no' — ответить без вопроса
+_confirm_policy = 'ask'
+
+
+def get_confirm_policy() -> str:
+    """Возвращает текущую политику подтверждения."""
+    return _confirm_policy
+
+
+def set_confirm_policy(policy: str) -> None:
+    """Задает политику подтверждения опасных операций."""
+    global _confirm_policy
+    if policy not in CONFIRM_POLICIES:
+        raise ValueError(f'Неизвестная политика подтверждения: {policy}')
+    _confirm_policy = policy
+
+
 def confirm_action(action_name: str):
-    """Декоратор для запроса подтверждения опасных операций."""
+    """Декоратор для запроса подтверждения опасных операций.
+
+    В неинтерактивном режиме вопрос не задается: ответ определяется
+    политикой, заданной через set_confirm_policy.
+    """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs):
-            response = input(f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: ').strip().lower()
+            if _confirm_policy == 'ask':
+                response = input(f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: ').strip().lower()
+            else:
+                response = 'y' if _confirm_policy == 'yes' else 'n'
             if response != 'y':
                 return args[0] if args else None, 'Операция отменена.'
             return func(*args, **kwargs)
@@ -48,27 +76,26 @@ def confirm_action(action_name: str):
 
 
 def log_time(func: Callable) -> Callable:
-    """Декоратор для логирования времени выполнения функции."""
+    """Декоратор, учитывающий время выполнения функции в гистограмме function_seconds.
+
+    Время не печатается: оно доступно через stats и выгрузку метрик.
+    """
     @wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.monotonic()
         result = func(*args, **kwargs)
         elapsed = time.monotonic() - start_time
-        print(f'Функция {func.__name__} выполнилась за {elapsed:.3f} секунд.')
+        registry.observe('function_seconds', elapsed, function=func.__name__)
         return result
     return wrapper
 
 
-def create_cacher():
-    """Создает функцию кэширования с замыканием."""
-    cache = {}
-    
-    def cache_result(key: Any, value_func: Callable) -> Any:
-        if key in cache:
-            return cache[key]
-        result = value_func()
-        cache[key] = result
-        return result
-    
-    return cache_result
-
+def measure_phase(phase: str):
+    """Декоратор, относящий время функции к фазе команды (см. metrics.PHASES)."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with registry.phase(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
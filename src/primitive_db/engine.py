@@ -1,15 +1,45 @@
 """Запуск, игровой цикл и парсинг команд."""
 
-import shlex
+import contextlib
+import copy
+import io
+import re
+import sys
+import threading
+import time
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional
+
 from prettytable import PrettyTable
 
 from .core import (
-    create_table, drop_table, list_tables,
-    insert, select, update, delete, get_table_info
+    create_table, drop_table, list_tables, create_index, table_exists,
+    insert, insert_many, insert_rows, select, aggregate, update, delete, get_table_info,
+    get_table_format, set_table_format, get_table_schema, get_table_partitioning, set_table_partitioning
+)
+from .utils import iter_import_batches
+from .parser import (
+    ParseError, UnknownCommand, parse_statement, split_statements,
+    Aggregate, Begin, Commit, Rollback, Checkpoint, ConvertTable, CreateIndex, CreateTable, Delete, DropTable, Exit, Help,
+    Explain, Import, Info, Insert, Join, ListTables, Output, Select, Stats, Update, Vacuum, executed_statement
+)
+from .explain import analyze_lines, plan_lines
+from .join import JoinInput, join
+from .metrics import PHASES, registry
+from .predicates import to_json
+from .schema import get_schema
+from .binfmt import BinaryTable
+from .partitions import PARTITION_SCHEMES, shutdown_executor
+from .buffer_pool import BufferPool
+from .rowtable import RowTable
+from .sqlite_store import SqliteTable
+from . import vacuum
+from .locking import LockTimeout
+from .transaction import Transaction
+from .constants import (
+    SELECT_PAGE_SIZE, OUTPUT_MODES, GROUP_COMMIT_SIZE, METRICS_FILE, METRICS_FORMATS,
+    PAGED_FORMATS, PARTITION_HASH_COUNT, PARTITION_RANGE_SIZE
 )
-from .utils import load_metadata, save_metadata, load_table_data, save_table_data
-from .parser import parse_where_clause, parse_set_clause
-from .constants import DB_META_FILE
 
 
 def print_help():
@@ -19,19 +49,95 @@ def print_help():
     print("<command> create_table <имя_таблицы> <столбец1:тип> <столбец2:тип> .. - создать таблицу")
     print("<command> list_tables - показать список всех таблиц")
     print("<command> drop_table <имя_таблицы> - удалить таблицу")
+    print("<command> create_index <имя_таблицы> <столбец> [hash|sorted] - создать индекс по столбцу")
+    print("<command> convert_table <имя_таблицы> json|binary|compressed|columnar - сменить формат хранения таблицы")
+    print("<command> convert_table <имя_таблицы> partitioned [range|hash] [N] - разделить таблицу на секции по ID")
     print("<command> insert into <имя_таблицы> values (<значение1>, <значение2>, ...) - создать запись.")
+    print("<command> insert into <имя_таблицы> values (...), (...), ... - создать несколько записей.")
+    print("<command> import <имя_таблицы> from <файл.csv|файл.jsonl> - загрузить записи из файла.")
     print("<command> select from <имя_таблицы> where <столбец> = <значение> - прочитать записи по условию.")
+    print("<command> select from <имя_таблицы> where <условие> and|or <условие> ... - условия с =, !=, <, <=, >, >=, between.")
     print("<command> select from <имя_таблицы> - прочитать все записи.")
+    print("<command> select from <имя_таблицы> [where ...] limit <N> offset <M> - прочитать часть записей.")
+    print("<command> select from <таблица1> join <таблица2> on <таблица1.столбец> = <таблица2.столбец> [where ...] [limit <N>] - соединить таблицы.")
+    print("<command> select count(*)|count|sum|min|max|avg(<столбец>), ... from <имя_таблицы> [where ...] [group by <столбец>, ...] - агрегаты.")
+    print("<command> output table|plain - формат вывода select (таблица или TSV)")
     print("<command> update <имя_таблицы> set <столбец1> = <новое_значение1> where <столбец_условия> = <значение_условия> - обновить запись.")
     print("<command> delete from <имя_таблицы> where <столбец> = <значение> - удалить запись.")
-    print("<command> info <имя_таблицы> - вывести информацию о таблице.")
+    print("<command> explain [analyze] select|insert|update|delete ... - план команды; с analyze - выполнить и показать строки и время фаз.")
+    print("<command> info <имя_таблицы> - вывести информацию о таблице и статистику столбцов.")
+    print("<command> checkpoint - сохранить измененные таблицы на диск")
+    print("<command> vacuum <имя_таблицы> - освободить место удаленных записей")
+    print("<command> begin | commit | rollback - начать, зафиксировать или отменить транзакцию")
+    print("<command> stats [reset | dump <файл> [json|prometheus]] - метрики выполнения команд")
     print("<command> exit - выход из программы")
     print("<command> help - справочная информация\n")
 
 
+def import_table(pool: BufferPool, metadata: dict, table_name: str, filepath: str) -> str:
+    """Потоково загружает записи из CSV/JSONL файла пакетами.
+
+    Каждый пакет преобразуется по столбцам, получает блок ID и
+    сохраняется одной записью в журнал.
+    """
+    table_data, table_indexes = pool.get_table(metadata, table_name)
+    columns = [col_def.split(':', 1)[0].strip() for col_def in metadata[table_name]][1:]
+    imported = 0
+    try:
+        for batch in iter_import_batches(filepath, columns):
+            table_data, message, new_records = insert_rows(
+                metadata, table_name, batch, table_data, table_indexes
+            )
+            if not new_records:
+                message = f'{message} Импорт остановлен после {imported} записей.'
+                break
+            pool.save_metadata(metadata)
+            pool.backend.commit(table_name, [{'op': 'insert_many', 'records': new_records}], table_data)
+            pool.mark_dirty(table_name, table_data)
+            imported += len(new_records)
+        else:
+            message = f'Импортировано записей: {imported} в таблицу "{table_name}".'
+    except FileNotFoundError:
+        message = f'Ошибка: Файл "{filepath}" не найден.'
+    except ValueError as e:
+        message = f'Ошибка импорта: {e}. Импортировано записей: {imported}.'
+    return message
+
+
+def convert_table(pool: BufferPool, metadata: dict, table_name: str, storage_format: str,
+                  partitioning: Optional[tuple] = None) -> str:
+    """Переводит таблицу в другой формат хранения на диске.
+
+    Сначала данные записываются в новом формате, затем формат фиксируется
+    в метаданных и только после этого удаляются файлы старого формата.
+    Для формата partitioned partitioning задает схему и размер секций;
+    секционированную таблицу можно переразбить с другой схемой. Форматы
+    json и columnar хранят таблицу в одних и тех же файлах, и при переходе
+    между ними файлы не удаляются.
+    """
+    current_format = get_table_format(metadata, table_name)
+    if current_format == storage_format and (
+            storage_format != 'partitioned' or partitioning in (None, get_table_partitioning(metadata, table_name))):
+        return f'Таблица "{table_name}" уже хранится в формате {storage_format}.'
+    
+    table_data, _ = pool.get_table(metadata, table_name)
+    records = list(table_data)
+    if storage_format == 'partitioned':
+        partitioning = partitioning or get_table_partitioning(metadata, table_name)
+    pool.backend.create(table_name, get_table_schema(metadata, table_name), records, storage_format, partitioning)
+    set_table_format(metadata, table_name, storage_format)
+    if storage_format == 'partitioned':
+        set_table_partitioning(metadata, table_name, *partitioning)
+    pool.save_metadata(metadata)
+    pool.evict(table_name)
+    if current_format != storage_format and not {current_format, storage_format} <= PAGED_FORMATS:
+        pool.backend.remove(table_name, current_format)
+    return f'Таблица "{table_name}" переведена в формат {storage_format}.'
+
+
 def format_select_output(table_data: list, metadata: dict, table_name: str) -> str:
     """Форматирует результат select в виде таблицы."""
-    if not table_data or table_name not in metadata:
+    if not table_data or not table_exists(metadata, table_name):
         return ""
     
     columns = []
@@ -55,204 +161,653 @@ def format_select_output(table_data: list, metadata: dict, table_name: str) -> s
     return str(table)
 
 
-def run():
-    """Главная функция с основным циклом программы."""
-    print("***Операции с данными***")
-    print_help()
-    
+def _format_value(value) -> str:
+    if isinstance(value, bool):
+        return 'True' if value else 'False'
+    return str(value)
+
+
+def render_select(rows: Iterable[dict], columns: List[str], mode: str = 'table',
+                  write: Optional[Callable[[str], object]] = None,
+                  page_size: int = SELECT_PAGE_SIZE) -> int:
+    """Выводит результат select постранично по мере получения строк.
+
+    В режиме 'table' каждая страница печатается отдельной PrettyTable,
+    в режиме 'plain' строки выводятся как TSV с заголовком. Возвращает
+    число выведенных строк. По умолчанию вывод идет в текущий sys.stdout.
+    """
+    write = write or sys.stdout.write
+    rows = iter(rows)
+    total = 0
     while True:
-        metadata = load_metadata(DB_META_FILE)
-        user_input = input(">>>Введите команду: ").strip()
-        
-        if not user_input:
-            continue
-        
+        page = list(islice(rows, page_size))
+        if not page:
+            return total
+        if mode == 'plain':
+            lines = []
+            if total == 0:
+                lines.append('\t'.join(columns))
+            for record in page:
+                lines.append('\t'.join(_format_value(record.get(col, '')) for col in columns))
+            write('\n'.join(lines) + '\n')
+        else:
+            table = PrettyTable()
+            table.field_names = columns
+            for record in page:
+                table.add_row([_format_value(record.get(col, '')) for col in columns])
+            write(str(table) + '\n')
+        total += len(page)
+
+
+class _ThreadOutput:
+    """Стандартный вывод, который каждый поток может направить в свой буфер.
+
+    Потоки без буфера пишут в исходный поток вывода.
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def target(self):
+        return getattr(self.local, 'buffer', None) or self.default
+
+    def write(self, text: str) -> int:
+        return self.target().write(text)
+
+    def flush(self) -> None:
+        self.target().flush()
+
+    def __getattr__(self, name: str):
+        return getattr(self.target(), name)
+
+
+@contextlib.contextmanager
+def capture_output(buffer: Optional[io.StringIO] = None) -> Iterator[io.StringIO]:
+    """Собирает в буфер все, что печатает текущий поток; вывод других потоков не затрагивается.
+
+    В отличие от contextlib.redirect_stdout, подходит для потоков сервера,
+    которые выполняют команды одновременно.
+    """
+    if not isinstance(sys.stdout, _ThreadOutput):
+        sys.stdout = _ThreadOutput(sys.stdout)
+    local = sys.stdout.local
+    previous = getattr(local, 'buffer', None)
+    local.buffer = buffer if buffer is not None else io.StringIO()
+    try:
+        yield local.buffer
+    finally:
+        local.buffer = previous
+
+
+def _charge_execute(rows: Iterable[dict]) -> Iterator[dict]:
+    """Относит время получения строк ленивого результата к фазе execute, а не render."""
+    rows = iter(rows)
+    clock = time.perf_counter
+    while True:
+        start = clock()
+        record = next(rows, None)
+        registry.charge('execute', clock() - start)
+        if record is None:
+            return
+        yield record
+
+
+def _format_ms(seconds: float) -> str:
+    return f'{seconds * 1000:.3f}'
+
+
+def format_stats(snapshot: dict) -> str:
+    """Форматирует снимок метрик: фазы и команды, счетчики, кэши."""
+    table = PrettyTable()
+    table.field_names = ['метрика', 'число', 'всего, мс', 'p50, мс', 'p95, мс', 'p99, мс']
+    histograms = sorted(
+        snapshot['histograms'],
+        key=lambda item: (item['name'] != 'phase_seconds', PHASES.index(item['labels']['phase'])
+                          if item['name'] == 'phase_seconds' and item['labels'].get('phase') in PHASES
+                          else len(PHASES), item['name'], sorted(item['labels'].items()))
+    )
+    for item in histograms:
+        label = ','.join(f'{key}={value}' for key, value in item['labels'].items())
+        table.add_row([f'{item["name"]}{{{label}}}' if label else item['name'], item['count'],
+                       _format_ms(item['sum']), _format_ms(item['p50']),
+                       _format_ms(item['p95']), _format_ms(item['p99'])])
+    lines = [str(table)]
+    for counter in snapshot['counters']:
+        label = ','.join(f'{key}={value}' for key, value in counter['labels'].items())
+        name = f'{counter["name"]}{{{label}}}' if label else counter['name']
+        lines.append(f'{name}: {counter["value"]:g}')
+    for source, values in snapshot['gauges'].items():
+        lines.append(f'{source}: ' + ', '.join(f'{key}={value}' for key, value in values.items()))
+    return '\n'.join(lines)
+
+
+# Граница слов в имени класса оператора: CreateTable -> create_table
+_STATEMENT_KIND = re.compile(r'(?<!^)(?=[A-Z])')
+
+# Команды, допустимые внутри транзакции, и команды, изменяющие данные
+# (explain analyze проверяется по анализируемой команде, см. executed_statement)
+_TRANSACTIONAL = (Begin, Commit, Rollback, Insert, Update, Delete, Select, Join, Aggregate, Info, Output, Help, Stats,
+                  Explain)
+_WRITES = (Insert, Update, Delete)
+# Команды, не изменяющие базу: выполняются без блокировки писателя
+_READ_ONLY = (Select, Join, Aggregate, Info, ListTables, Help, Output, Stats, Explain)
+# Команды, вывод которых explain analyze отбрасывает (строки результата)
+_QUERIES = (Select, Join, Aggregate)
+
+
+class Session:
+    """Сеанс работы с базой: пул буферов, формат вывода и исполнение команд.
+
+    Команда разбирается в оператор AST (см. parser), после чего
+    вызывается обработчик для типа оператора.
+    """
+
+    def __init__(self, pool: Optional[BufferPool] = None, group_commit: int = 0,
+                 backend: Optional[str] = None, auto_flush: bool = True):
+        self.pool = pool or BufferPool(backend_name=backend)
+        # Сохраняет ли сеанс таблицы по таймеру; сеансы чтения сервера оставляют это писателю.
+        self.auto_flush = auto_flush
+        self.output_mode = 'table'
+        self.group_commit = group_commit
+        self.transaction: Optional[Transaction] = None
+        self._locked = False
+        self._handlers = {
+            Begin: self._begin,
+            Commit: self._commit,
+            Rollback: self._rollback,
+            Help: self._help,
+            Checkpoint: self._checkpoint,
+            CreateTable: self._create_table,
+            ListTables: self._list_tables,
+            DropTable: self._drop_table,
+            CreateIndex: self._create_index,
+            ConvertTable: self._convert_table,
+            Insert: self._insert,
+            Import: self._import,
+            Select: self._select,
+            Join: self._join,
+            Aggregate: self._aggregate,
+            Output: self._output,
+            Update: self._update,
+            Delete: self._delete,
+            Info: self._info,
+            Vacuum: self._vacuum,
+            Stats: self._stats,
+            Explain: self._explain,
+        }
+
+    def execute(self, user_input: str) -> bool:
+        """Выполняет одну команду. Возвращает False, если сеанс завершен."""
+        if self.auto_flush and self.transaction is None and self.pool.flush_due():
+            try:
+                self.pool.flush()
+            except LockTimeout as e:
+                print(f'Ошибка: {e}')
+        with registry.statement() as timing:
+            statement = self._execute(user_input)
+            if statement is not None:
+                timing.kind = _STATEMENT_KIND.sub('_', type(statement).__name__).lower()
+        if isinstance(statement, Exit):
+            self.close()
+            return False
+        return True
+
+    def _parse(self, user_input: str, metadata: dict):
+        """Разбирает команду; при ошибке печатает сообщение и возвращает None."""
         try:
-            args = shlex.split(user_input)
-        except ValueError:
+            with registry.phase('parse'):
+                return parse_statement(user_input, metadata)
+        except UnknownCommand as e:
+            registry.inc('parse_errors')
+            print(f"Функции {e.command} нет. Попробуйте снова.")
+        except ParseError:
+            registry.inc('parse_errors')
             print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-            continue
+        return None
+
+    def _execute(self, user_input: str):
+        """Разбирает и выполняет команду, возвращает ее оператор (None при ошибке разбора).
+
+        Команды, изменяющие базу, выполняются под блокировкой писателя;
+        в транзакции и неявной группе она держится до фиксации. Взяв
+        блокировку, команда заново читает метаданные и при их изменении
+        другим процессом разбирается повторно.
+        """
+        metadata = self.pool.get_metadata()
+        statement = self._parse(user_input, metadata)
+        if statement is None or isinstance(statement, Exit):
+            return statement
         
-        if not args:
-            continue
+        if not isinstance(executed_statement(statement), _READ_ONLY) and not self._locked:
+            try:
+                self.pool.lock.acquire()
+            except LockTimeout as e:
+                print(f'Ошибка: {e}')
+                return statement
+            self._locked = True
+            latest = self.pool.get_metadata()
+            if latest is not metadata:
+                metadata = latest
+                statement = self._parse(user_input, metadata)
+                if statement is None:
+                    self._release_lock()
+                    return None
+        try:
+            self._run_statement(statement, metadata, user_input)
+        finally:
+            self._release_lock()
+        return statement
+
+    def _run_statement(self, statement, metadata: dict, user_input: str) -> None:
+        transaction = self.transaction
+        executed = executed_statement(statement)
+        if transaction is not None and not isinstance(executed, _TRANSACTIONAL):
+            if transaction.explicit:
+                print(f'Команда недоступна внутри транзакции: {user_input}')
+                return
+            # Неявная группа пакетного режима фиксируется перед остальными командами.
+            self._finish_group()
+        elif transaction is None and self.group_commit > 0 and isinstance(executed, _WRITES):
+            self.transaction = Transaction(explicit=False)
         
-        command = args[0].lower()
-        if command == 'exit':
-            break
-        elif command == 'help':
-            print_help()
-        elif command == 'create_table':
-            if len(args) < 3:
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-            
-            table_name = args[1]
-            columns = args[2:]
-            metadata, message = create_table(metadata, table_name, columns)
-            print(message)
-            
-            if 'успешно создана' in message:
-                save_metadata(DB_META_FILE, metadata)
-        elif command == 'list_tables':
-            tables_list = list_tables(metadata)
-            if tables_list:
-                print(tables_list)
+        with registry.phase('execute'):
+            self._handlers[type(statement)](statement, metadata)
+        
+        transaction = self.transaction
+        if transaction is not None and not transaction.explicit:
+            transaction.statements += 1
+            if transaction.statements >= self.group_commit:
+                self._finish_group()
+
+    def _release_lock(self) -> None:
+        """Освобождает блокировку писателя, если не осталось незафиксированных изменений."""
+        if self._locked and self.transaction is None:
+            self.pool.lock.release()
+            self._locked = False
+
+    def close(self) -> None:
+        """Завершает сеанс: фиксирует группу, отменяет незавершенную транзакцию и сохраняет таблицы."""
+        if self.transaction is not None:
+            if self.transaction.explicit:
+                self.transaction.rollback(self.pool)
+                print('Незавершенная транзакция отменена.')
             else:
-                print("Таблицы отсутствуют.")
-        elif command == 'drop_table':
-            if len(args) < 2:
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-            
-            table_name = args[1]
-            metadata, message = drop_table(metadata, table_name)
-            print(message)
-            
-            if 'успешно удалена' in message:
-                save_metadata(DB_META_FILE, metadata)
-                import os
-                from .constants import DATA_DIR
-                data_file = f'{DATA_DIR}{table_name}.json'
-                if os.path.exists(data_file):
-                    os.remove(data_file)
-        elif command == 'insert' and len(args) >= 2 and args[1].lower() == 'into':
-            if len(args) < 4 or args[3].lower() != 'values':
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-            
-            table_name = args[2]
-            values_str = ' '.join(args[4:])
-            if values_str.startswith('(') and values_str.endswith(')'):
-                values_str = values_str[1:-1]
-            
-            try:
-                values = shlex.split(values_str.replace(',', ' '))
-            except ValueError:
-                values = [v.strip().strip('"').strip("'") for v in values_str.split(',')]
-            
-            table_data = load_table_data(table_name)
-            table_data, message = insert(metadata, table_name, values, table_data)
+                self.transaction.commit(self.pool)
+            self.transaction = None
+        self._release_lock()
+        try:
+            self.pool.flush()
+        except LockTimeout as e:
+            print(f'Ошибка: {e}')
+        shutdown_executor()
+        vacuum.wait()
+        self.pool.close()
+        if METRICS_FILE:
+            registry.dump(METRICS_FILE)
+
+    def _finish_group(self) -> None:
+        self.transaction.commit(self.pool)
+        self.transaction = None
+
+    def commit_group(self) -> None:
+        """Фиксирует открытую неявную группу изменений (явная транзакция не затрагивается)."""
+        if self.transaction is not None and not self.transaction.explicit:
+            self._finish_group()
+        self._release_lock()
+
+    def _save_metadata(self, metadata: dict) -> None:
+        if self.transaction is not None:
+            self.transaction.save_metadata(metadata)
+        else:
+            self.pool.save_metadata(metadata)
+
+    def _log(self, table_name: str, entry: dict, table_data) -> None:
+        """Пишет изменение в журнал или откладывает его до фиксации транзакции."""
+        if self.transaction is not None and not isinstance(table_data, BinaryTable):
+            self.transaction.log(table_name, entry, table_data)
+        else:
+            self.pool.backend.commit(table_name, [entry], table_data)
+        self.pool.mark_dirty(table_name, table_data)
+
+    def _writable(self, metadata: dict, table_name: str) -> bool:
+        """Проверяет, можно ли изменять таблицу в текущей транзакции."""
+        if (self.transaction is not None and self.transaction.explicit
+                and get_table_format(metadata, table_name) == 'binary'):
+            print(f'Ошибка: Таблица "{table_name}" в формате binary не поддерживает транзакции.')
+            return False
+        return True
+
+    def _begin(self, statement: Begin, metadata: dict) -> None:
+        if self.transaction is not None:
+            if self.transaction.explicit:
+                print('Ошибка: Транзакция уже начата.')
+                return
+            self._finish_group()
+        self.transaction = Transaction()
+        print('Транзакция начата.')
+
+    def _commit(self, statement: Commit, metadata: dict) -> None:
+        if self.transaction is None or not self.transaction.explicit:
+            print('Ошибка: Нет активной транзакции.')
+            return
+        written = self.transaction.commit(self.pool)
+        self.transaction = None
+        print(f'Транзакция зафиксирована. Изменений: {written}.')
+
+    def _rollback(self, statement: Rollback, metadata: dict) -> None:
+        if self.transaction is None or not self.transaction.explicit:
+            print('Ошибка: Нет активной транзакции.')
+            return
+        self.transaction.rollback(self.pool)
+        self.transaction = None
+        print('Транзакция отменена.')
+
+    def _help(self, statement: Help, metadata: dict) -> None:
+        print_help()
+
+    def _checkpoint(self, statement: Checkpoint, metadata: dict) -> None:
+        flushed = self.pool.flush()
+        print(f'Сохранено таблиц: {flushed}.')
+
+    def _create_table(self, statement: CreateTable, metadata: dict) -> None:
+        metadata, message = create_table(metadata, statement.table, statement.columns)
+        print(message)
+        
+        if 'успешно создана' in message:
+            self.pool.save_metadata(metadata)
+
+    def _list_tables(self, statement: ListTables, metadata: dict) -> None:
+        tables_list = list_tables(metadata)
+        if tables_list:
+            print(tables_list)
+        else:
+            print("Таблицы отсутствуют.")
+
+    def _drop_table(self, statement: DropTable, metadata: dict) -> None:
+        table_name = statement.table
+        metadata, message = drop_table(metadata, table_name)
+        print(message)
+        
+        if 'успешно удалена' in message:
+            self.pool.save_metadata(metadata)
+            self.pool.evict(table_name)
+            self.pool.backend.drop(table_name)
+
+    def _create_index(self, statement: CreateIndex, metadata: dict) -> None:
+        table_name = statement.table
+        table_data, table_indexes = self.pool.get_table(metadata, table_name)
+        message = create_index(metadata, table_name, statement.column, table_data, table_indexes,
+                               statement.kind)
+        print(message)
+        
+        if 'успешно создан' in message and table_indexes is not None:
+            self.pool.backend.save_indexes(table_name, table_indexes)
+            self.pool.refresh_signature(table_name)
+
+    def _convert_table(self, statement: ConvertTable, metadata: dict) -> None:
+        if not self.pool.backend.formats:
+            print(f'Ошибка: Хранилище {self.pool.backend.name} не поддерживает смену формата таблиц.')
+            return
+        if statement.storage_format not in self.pool.backend.formats:
+            print(f"Некорректное значение: {statement.storage_format}. Попробуйте снова.")
+            return
+        if not table_exists(metadata, statement.table):
+            print(f'Ошибка: Таблица "{statement.table}" не существует.')
+            return
+        partitioning = None
+        if statement.scheme is not None:
+            if statement.storage_format != 'partitioned' or statement.scheme not in PARTITION_SCHEMES:
+                print(f"Некорректное значение: {statement.scheme}. Попробуйте снова.")
+                return
+            default_size = PARTITION_HASH_COUNT if statement.scheme == 'hash' else PARTITION_RANGE_SIZE
+            size = default_size if statement.size is None else statement.size
+            if size <= 0:
+                print(f"Некорректное значение: {size}. Попробуйте снова.")
+                return
+            partitioning = (statement.scheme, size)
+        print(convert_table(self.pool, metadata, statement.table, statement.storage_format, partitioning))
+
+    def _insert(self, statement: Insert, metadata: dict) -> None:
+        table_name = statement.table
+        if not self._writable(metadata, table_name):
+            return
+        table_data, table_indexes = self.pool.get_table(metadata, table_name)
+        if len(statement.rows) > 1:
+            table_data, message, new_records = insert_many(
+                metadata, table_name, statement.rows, table_data, table_indexes
+            )
             print(message)
             
-            if 'успешно добавлена' in message:
-                save_table_data(table_name, table_data)
-        elif command == 'select' and len(args) >= 2 and args[1].lower() == 'from':
-            # select from <table> [where <condition>]
-            if len(args) < 3:
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-            
-            table_name = args[2]
-            
-            where_clause = None
-            if len(args) > 3 and args[3].lower() == 'where':
-                where_str = ' '.join(args[4:])
-                where_clause = parse_where_clause(where_str, metadata, table_name)
-                if where_clause is None:
-                    print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                    continue
-            
-            table_data = load_table_data(table_name)
-            result = select(table_data, where_clause)
-            output = format_select_output(result, metadata, table_name)
-            if output:
-                print(output)
-            else:
-                print("Записи не найдены.")
-        elif command == 'update':
-            # update <table> set <col1> = <val1> where <col2> = <val2>
-            if len(args) < 2:
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-            
-            table_name = args[1]
-            
-            set_idx = -1
-            where_idx = -1
-            for i, arg in enumerate(args):
-                if arg.lower() == 'set':
-                    set_idx = i
-                elif arg.lower() == 'where':
-                    where_idx = i
-            
-            if set_idx == -1 or where_idx == -1:
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-            
-            set_str = ' '.join(args[set_idx + 1:where_idx])
-            where_str = ' '.join(args[where_idx + 1:])
-            
-            set_clause = parse_set_clause(set_str, metadata, table_name)
-            where_clause = parse_where_clause(where_str, metadata, table_name)
-            
-            if set_clause is None or where_clause is None:
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-            
-            table_data = load_table_data(table_name)
-            table_data, updated_count = update(table_data, set_clause, where_clause)
-            
-            if updated_count > 0:
-                updated_ids = []
-                for record in table_data:
-                    match = True
-                    for col, value in where_clause.items():
-                        if record.get(col) != value:
-                            match = False
-                            break
-                    if match and 'ID' in record:
-                        updated_ids.append(record['ID'])
-                
-                if updated_ids:
-                    print(f'Запись с ID={updated_ids[0]} в таблице "{table_name}" успешно обновлена.')
-                else:
-                    print(f'Записи в таблице "{table_name}" успешно обновлены.')
-                save_table_data(table_name, table_data)
+            if new_records:
+                self._save_metadata(metadata)
+                self._log(table_name, {'op': 'insert_many', 'records': new_records}, table_data)
+            return
+        
+        values = [str(value) for value in statement.rows[0]]
+        table_data, message = insert(metadata, table_name, values, table_data, table_indexes)
+        print(message)
+        
+        if 'успешно добавлена' in message:
+            self._save_metadata(metadata)
+            self._log(table_name, {'op': 'insert', 'record': table_data[-1]}, table_data)
+
+    def _import(self, statement: Import, metadata: dict) -> None:
+        if not table_exists(metadata, statement.table):
+            print(f'Ошибка: Таблица "{statement.table}" не существует.')
+            return
+        print(import_table(self.pool, metadata, statement.table, statement.path))
+
+    def _select(self, statement: Select, metadata: dict) -> None:
+        table_name = statement.table
+        table_data, table_indexes = self.pool.get_table(metadata, table_name)
+        result = select(table_data, statement.where, table_indexes, table_name,
+                        statement.limit, statement.offset)
+        if not isinstance(result, list):
+            result = _charge_execute(result)
+        schema = get_schema(metadata, table_name)
+        with registry.phase('render'):
+            returned = render_select(result, schema.names, self.output_mode) if schema is not None else 0
+        registry.inc('rows_returned', returned)
+        if not returned:
+            print("Записи не найдены.")
+
+    def _join(self, statement: Join, metadata: dict) -> None:
+        sides = []
+        for table_name, column in ((statement.left, statement.left_column), (statement.right, statement.right_column)):
+            table_data, table_indexes = self.pool.get_table(metadata, table_name)
+            names = get_schema(metadata, table_name).names
+            sides.append(JoinInput(table_name, table_data, table_indexes, names, column))
+        left, right = sides
+        result = _charge_execute(join(left, right, statement.where, statement.limit, statement.offset))
+        with registry.phase('render'):
+            returned = render_select(result, left.qualified + right.qualified, self.output_mode)
+        registry.inc('rows_returned', returned)
+        if not returned:
+            print("Записи не найдены.")
+
+    def _aggregate(self, statement: Aggregate, metadata: dict) -> None:
+        table_data, table_indexes = self.pool.get_table(metadata, statement.table)
+        result = aggregate(table_data, statement.items, statement.where, statement.group_by, table_indexes)
+        with registry.phase('render'):
+            returned = render_select(result, [item.label for item in statement.items], self.output_mode)
+        registry.inc('rows_returned', returned)
+        if not returned:
+            print("Записи не найдены.")
+
+    def _output(self, statement: Output, metadata: dict) -> None:
+        if statement.mode not in OUTPUT_MODES:
+            print(f"Некорректное значение: {statement.mode}. Попробуйте снова.")
+            return
+        self.output_mode = statement.mode
+        print(f'Формат вывода: {self.output_mode}.')
+
+    def _update(self, statement: Update, metadata: dict) -> None:
+        table_name = statement.table
+        if not self._writable(metadata, table_name):
+            return
+        table_data, table_indexes = self.pool.get_table(metadata, table_name)
+        table_data, updated_ids = update(table_data, statement.set, statement.where, table_indexes)
+        
+        if updated_ids:
+            if updated_ids[0] is not None:
+                print(f'Запись с ID={updated_ids[0]} в таблице "{table_name}" успешно обновлена.')
             else:
-                print('Записи не найдены.')
-        elif command == 'delete' and len(args) >= 2 and args[1].lower() == 'from':
-            # delete from <table> where <condition>
-            if len(args) < 4 or args[3].lower() != 'where':
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-            
-            table_name = args[2]
-            where_str = ' '.join(args[4:])
-            
-            where_clause = parse_where_clause(where_str, metadata, table_name)
-            if where_clause is None:
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-            
-            table_data = load_table_data(table_name)
-            deleted_ids = []
-            for record in table_data:
-                match = True
-                for col, value in where_clause.items():
-                    if record.get(col) != value:
-                        match = False
-                        break
-                if match and 'ID' in record:
-                    deleted_ids.append(record['ID'])
-            
-            table_data, deleted_count = delete(table_data, where_clause)
-            
-            if deleted_count > 0:
-                if deleted_ids:
-                    print(f'Запись с ID={deleted_ids[0]} успешно удалена из таблицы "{table_name}".')
-                else:
-                    print(f'Записи успешно удалены из таблицы "{table_name}".')
-                save_table_data(table_name, table_data)
+                print(f'Записи в таблице "{table_name}" успешно обновлены.')
+            self._log(
+                table_name,
+                {'op': 'update', 'set': statement.set, 'where': to_json(statement.where), 'ids': updated_ids},
+                table_data
+            )
+        else:
+            print('Записи не найдены.')
+
+    def _delete(self, statement: Delete, metadata: dict) -> None:
+        table_name = statement.table
+        if not self._writable(metadata, table_name):
+            return
+        table_data, table_indexes = self.pool.get_table(metadata, table_name)
+        
+        table_data, deleted_ids = delete(table_data, statement.where, table_indexes)
+        if isinstance(deleted_ids, str):
+            # Удаление не подтверждено: вместо списка ID пришло сообщение.
+            print(deleted_ids)
+            return
+        
+        if deleted_ids:
+            if deleted_ids[0] is not None:
+                print(f'Запись с ID={deleted_ids[0]} успешно удалена из таблицы "{table_name}".')
             else:
-                print('Записи не найдены.')
-        elif command == 'info':
-            if len(args) < 2:
-                print(f"Некорректное значение: {user_input}. Попробуйте снова.")
-                continue
-            
-            table_name = args[1]
-            table_data = load_table_data(table_name)
-            message = get_table_info(metadata, table_name, table_data)
-            print(message)
+                print(f'Записи успешно удалены из таблицы "{table_name}".')
+            self._log(table_name, {'op': 'delete', 'where': to_json(statement.where), 'ids': deleted_ids},
+                      table_data)
+            if vacuum.needs_vacuum(table_data):
+                self._auto_vacuum(table_name, table_data)
+        else:
+            print('Записи не найдены.')
+
+    def _auto_vacuum(self, table_name: str, table_data) -> None:
+        """Сжимает таблицу, в которой накопилось много удаленных записей.
+
+        Построчная таблица сжимается в фоновом потоке и сохраняется на диск
+        при ближайшей контрольной точке; двоичная переписывает файл строк сразу.
+        """
+        if isinstance(table_data, RowTable):
+            vacuum.compact_in_background(table_data)
         else:
-            print(f"Функции {command} нет. Попробуйте снова.")
+            vacuum.vacuum(table_data)
+            self.pool.refresh_signature(table_name)
+
+    def _vacuum(self, statement: Vacuum, metadata: dict) -> None:
+        table_name = statement.table
+        if not table_exists(metadata, table_name):
+            print(f'Ошибка: Таблица "{table_name}" не существует.')
+            return
+        table_data, _ = self.pool.get_table(metadata, table_name)
+        reclaimed = vacuum.vacuum(table_data)
+        if isinstance(table_data, RowTable):
+            # Контрольная точка переписывает файл таблицы без удаленных записей.
+            self.pool.backend.checkpoint(table_name, table_data)
+            self.pool.mark_dirty(table_name, table_data)
+        else:
+            self.pool.refresh_signature(table_name)
+        print(f'Таблица "{table_name}" сжата, освобождено записей: {reclaimed}.')
+
+    def _stats(self, statement: Stats, metadata: dict) -> None:
+        if statement.action == 'reset':
+            registry.reset()
+            print('Метрики сброшены.')
+            return
+        if statement.action == 'dump':
+            if statement.fmt is not None and statement.fmt not in METRICS_FORMATS:
+                print(f"Некорректное значение: {statement.fmt}. Попробуйте снова.")
+                return
+            try:
+                fmt = registry.dump(statement.path, statement.fmt)
+            except OSError as e:
+                print(f'Ошибка: Не удалось записать метрики: {e}')
+                return
+            print(f'Метрики записаны в "{statement.path}" ({fmt}).')
+            return
+        print(format_stats(registry.snapshot()))
+
+    def _explain(self, statement: Explain, metadata: dict) -> None:
+        target = statement.statement
+        lines = plan_lines(target, metadata, lambda table_name: self.pool.get_table(metadata, table_name))
+        print('\n'.join(lines))
+        if not statement.analyze:
+            return
+        before = dict(registry.counters)
+        # Строки результата выводятся в никуда: время вывода учитывается, а экран не засоряется.
+        output = capture_output() if isinstance(target, _QUERIES) else contextlib.nullcontext()
+        with output, registry.phase('execute'):
+            self._handlers[type(target)](target, metadata)
+        print('\n'.join(analyze_lines(before, registry.counters, registry.pending())))
+
+    def _info(self, statement: Info, metadata: dict) -> None:
+        table_data, table_indexes = self.pool.get_table(metadata, statement.table)
+        print(get_table_info(metadata, statement.table, table_data, table_indexes))
+
+
+def check_script(statements: List[str], metadata: dict, group_commit: int) -> Optional[str]:
+    """Проверяет сценарий до выполнения; возвращает сообщение об ошибке или None.
+
+    Двоичная таблица изменяется прямо в файле, поэтому ее изменения нельзя
+    ни отложить до фиксации, ни отменить. Сценарий, который изменяет такую
+    таблицу внутри begin ... commit или в неявной группе (group_commit > 0),
+    не выполняется совсем, чтобы не оставить пакет примененным наполовину.
+    Таблицы, которые создает или переводит в другой формат сам сценарий,
+    учитываются по ходу проверки.
+    """
+    metadata = copy.deepcopy(metadata)
+    explicit = False
+    for number, text in enumerate(statements, 1):
+        try:
+            statement = executed_statement(parse_statement(text, metadata))
+        except (ParseError, UnknownCommand):
+            continue
+        if isinstance(statement, Begin):
+            explicit = True
+        elif isinstance(statement, (Commit, Rollback)):
+            explicit = False
+        elif isinstance(statement, CreateTable):
+            metadata, _ = create_table(metadata, statement.table, statement.columns)
+        elif isinstance(statement, DropTable):
+            metadata.pop(statement.table, None)
+        elif isinstance(statement, ConvertTable) and table_exists(metadata, statement.table):
+            set_table_format(metadata, statement.table, statement.storage_format)
+        elif (isinstance(statement, _WRITES) and (explicit or group_commit > 0)
+              and get_table_format(metadata, statement.table) == 'binary'):
+            return (f'Ошибка: Таблица "{statement.table}" в формате binary не поддерживает транзакции '
+                    f'и групповую фиксацию (команда {number}: {text}). Сценарий не выполнен.')
+    return None
+
+
+def run_script(lines: Iterable[str], session: Optional[Session] = None) -> None:
+    """Выполняет команды сценария без интерактивного ввода.
+
+    Перед выполнением сценарий проверяется целиком (см. check_script).
+    """
+    session = session or Session(group_commit=GROUP_COMMIT_SIZE)
+    statements = list(split_statements(lines))
+    error = check_script(statements, session.pool.get_metadata(), session.group_commit)
+    if error is not None:
+        print(error)
+        session.close()
+        return
+    for statement in statements:
+        if not session.execute(statement):
+            return
+    session.close()
+
+
+def run(backend: Optional[str] = None):
+    """Главная функция с основным циклом программы."""
+    print("***Операции с данными***")
+    print_help()
+    session = Session(backend=backend)
+    
+    while True:
+        user_input = input(">>>Введите команду: ").strip()
+        if not session.execute(user_input):
+            break
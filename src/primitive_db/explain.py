@@ -0,0 +1,150 @@
+"""План выполнения команд для explain и explain analyze.
+
+Для каждой таблицы команды план показывает путь доступа, который выберут
+функции core для условия where, и оценку числа строк, которые придется
+просмотреть: полный просмотр, готовый результат в кэше запросов, индекс,
+отсечение блоков и секций или план SQLite. Оценка берется из индексов,
+зональных карт, каталогов блоков и длины таблицы, сам запрос не выполняется.
+
+explain analyze дополнительно выполняет команду (см. engine.Session) и
+добавляет к плану фактические счетчики и время фаз из metrics.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .binfmt import BinaryTable
+from .cache import query_cache
+from .columnar import ColumnarTable
+from .indexes import TableIndexes
+from .join import JoinInput, choose_strategy, split_where
+from .metrics import PHASES
+from .parser import Aggregate, Insert, Join, Select, Update
+from .partitions import PartitionedTable
+from .predicates import Where, predicate_key
+from .rowtable import RowTable
+from .schema import get_schema
+from .segments import SegmentTable
+from .sqlite_store import SqliteTable
+
+# Счетчики, которые explain analyze показывает как приращение за время команды
+ANALYZE_COUNTERS = {
+    'rows_scanned': 'просмотрено строк',
+    'rows_returned': 'возвращено строк',
+    'blocks_skipped': 'пропущено блоков',
+    'blocks_decompressed': 'распаковано блоков',
+    'bytes_read': 'прочитано байт',
+    'bytes_written': 'записано байт',
+}
+
+
+def access_path(table_data, where: Optional[Where], table_indexes: Optional[TableIndexes] = None,
+                table_name: Optional[str] = None) -> Tuple[str, int]:
+    """Описывает путь доступа к записям по условию: (описание, оценка числа строк к просмотру).
+
+    table_name передается, если результат может быть взят из кэша запросов.
+    """
+    if where is None:
+        return 'полный просмотр', len(table_data)
+    if table_name is not None:
+        cached = query_cache.peek(table_name, predicate_key(where))
+        if cached is not None:
+            return 'кэш запросов', len(cached)
+    if isinstance(table_data, SqliteTable):
+        return f'SQLite: {table_data.query_plan(where)}', len(table_data)
+    if isinstance(table_data, SegmentTable):
+        record_id = where.get('ID') if isinstance(where, dict) else None
+        if isinstance(record_id, int) and not isinstance(record_id, bool):
+            return 'двоичный поиск по ID в одном блоке', 1
+        keys = table_data.candidate_keys(where)
+        return (f'сжатые блоки по ID и зонам: {len(keys)} из {len(table_data.blocks)}',
+                sum(table_data.block_len(key) for key in keys))
+    if isinstance(table_data, PartitionedTable):
+        keys = table_data.candidate_keys(where)
+        return (f'секции: {len(keys)} из {len(table_data.keys)}',
+                sum(table_data.partition_len(key) for key in keys))
+    if isinstance(table_data, BinaryTable):
+        if isinstance(where, dict):
+            if 'ID' in where:
+                return 'двоичный поиск по ID', 1
+            return 'полный просмотр файла', len(table_data)
+        start, end = table_data.id_range(where)
+        return 'диапазон ID в файле', end - start
+    if isinstance(table_data, ColumnarTable):
+        return 'колоночный просмотр', len(table_data)
+    if table_indexes is not None:
+        path = table_indexes.access_path(where)
+        if path is not None:
+            return path
+        if isinstance(table_data, RowTable) and table_data.ordered:
+            zones = table_indexes.table_zones()
+            keys = zones.candidate_keys(where)
+            if len(keys) < len(zones.zones):
+                size = zones.block_rows
+                rows = sum(len(table_data.id_range(key * size, (key + 1) * size)) for key in keys)
+                return f'блоки по зональным картам: {len(keys)} из {len(zones.zones)}', rows
+    return 'полный просмотр', len(table_data)
+
+
+def _line(table_name: str, path: Tuple[str, int]) -> str:
+    return f'  {table_name}: {path[0]}, оценка строк: {path[1]}'
+
+
+def plan_lines(statement, metadata: dict, open_table: Callable[[str], tuple]) -> List[str]:
+    """Возвращает строки плана команды; open_table(имя) возвращает данные и индексы таблицы."""
+    if isinstance(statement, Insert):
+        return ['Вставка', f'  {statement.table}: строк {len(statement.rows)}, без поиска записей']
+    if isinstance(statement, Join):
+        sides = []
+        for table_name, column in ((statement.left, statement.left_column),
+                                   (statement.right, statement.right_column)):
+            table_data, table_indexes = open_table(table_name)
+            names = get_schema(metadata, table_name).names
+            sides.append(JoinInput(table_name, table_data, table_indexes, names, column))
+        left, right = sides
+        residual = split_where(statement.where, left, right)
+        strategy = choose_strategy(left, right)
+        lines = [f'Соединение: {"слиянием" if strategy == "merge" else "хэшированием"} '
+                 f'по {left.table_name}.{left.column} = {right.table_name}.{right.column}']
+        paths = []
+        for side in sides:
+            index = side.sorted_index() if strategy == 'merge' and side.column != 'ID' else None
+            if index is not None:
+                path = f'упорядоченный индекс {side.column} по ключу соединения', len(index)
+            else:
+                path = access_path(side.table_data, side.where, side.table_indexes, side.table_name)
+            paths.append(path)
+            lines.append(_line(side.table_name, path))
+        if strategy == 'hash':
+            build = left if paths[0][1] <= paths[1][1] else right
+            lines.append(f'  хэш-таблица строится по {build.table_name} (меньшая сторона по оценке)')
+        if residual is not None:
+            lines.append('  условие проверяется на соединенных строках')
+        return lines
+    table_data, table_indexes = open_table(statement.table)
+    if isinstance(statement, Aggregate):
+        lines = ['Агрегация' + (' с группировкой по ' + ', '.join(statement.group_by) if statement.group_by else '')]
+        if statement.where is None and not statement.group_by and (
+                table_indexes is not None or all(item.column is None for item in statement.items)):
+            lines.append(f'  {statement.table}: статистика таблицы без просмотра строк, оценка строк: 0')
+            return lines
+        lines.append(_line(statement.table, access_path(table_data, statement.where, table_indexes)))
+        return lines
+    if isinstance(statement, Select):
+        return ['Выборка', _line(statement.table, access_path(table_data, statement.where, table_indexes,
+                                                              statement.table))]
+    title = 'Изменение' if isinstance(statement, Update) else 'Удаление'
+    return [title, _line(statement.table, access_path(table_data, statement.where, table_indexes))]
+
+
+def analyze_lines(before: Dict[tuple, float], after: Dict[tuple, float], phases: Dict[str, float]) -> List[str]:
+    """Возвращает строки отчета explain analyze: приращения счетчиков и время фаз в мс.
+
+    before и after — счетчики registry до и после выполнения команды.
+    """
+    lines = ['Выполнение']
+    for name, title in ANALYZE_COUNTERS.items():
+        delta = after.get((name, ()), 0) - before.get((name, ()), 0)
+        if delta:
+            lines.append(f'  {title}: {delta:g}')
+    lines.append('  время, мс: ' + ', '.join(f'{phase}={phases.get(phase, 0.0) * 1000:.3f}' for phase in PHASES))
+    return lines
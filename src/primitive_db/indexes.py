@@ -0,0 +1,335 @@
+"""Индексы таблицы: хэш-индексы по равенству и упорядоченные индексы по диапазонам."""
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .colstats import TableStats
+from .metrics import registry
+from .predicates import And, Between, Compare, Or, Where, compile_predicate
+from .zonemap import ZoneMaps
+
+# Суффикс столбца в файле индексов для упорядоченного индекса
+SORTED_SUFFIX = ':sorted'
+INDEX_KINDS = ('hash', 'sorted')
+
+
+class SortedIndex:
+    """Упорядоченный индекс: пары (значение, ID), отсортированные по значению.
+
+    Ключи и ID хранятся в двух параллельных списках, поэтому диапазон
+    значений находится двоичным поиском за O(log n), а его записи
+    перебираются за O(k). Значения None в индекс не попадают.
+    """
+
+    def __init__(self):
+        self.keys: List[Any] = []
+        self.ids: List[int] = []
+
+    def build(self, pairs: Iterable[Tuple[Any, int]]) -> 'SortedIndex':
+        """Заполняет индекс парами (значение, ID) одной сортировкой."""
+        ordered = sorted(pair for pair in pairs if pair[0] is not None)
+        self.keys = [value for value, _ in ordered]
+        self.ids = [record_id for _, record_id in ordered]
+        return self
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def insert(self, value: Any, record_id: int) -> None:
+        if value is None:
+            return
+        position = bisect_right(self.keys, value)
+        # Пары с равным значением упорядочены по ID.
+        while position > 0 and self.keys[position - 1] == value and self.ids[position - 1] > record_id:
+            position -= 1
+        self.keys.insert(position, value)
+        self.ids.insert(position, record_id)
+
+    def remove(self, value: Any, record_id: int) -> None:
+        if value is None:
+            return
+        position = bisect_left(self.keys, value)
+        end = bisect_right(self.keys, value)
+        for i in range(position, end):
+            if self.ids[i] == record_id:
+                del self.keys[i]
+                del self.ids[i]
+                return
+
+    def bounds(self, low: Any = None, high: Any = None,
+               include_low: bool = True, include_high: bool = True) -> Tuple[int, int]:
+        """Возвращает позиции начала и конца диапазона значений."""
+        return _bounds(self.keys, low, high, include_low, include_high)
+
+
+def _bounds(keys: List[Any], low: Any, high: Any, include_low: bool, include_high: bool) -> Tuple[int, int]:
+    try:
+        if low is None:
+            start = 0
+        else:
+            start = bisect_left(keys, low) if include_low else bisect_right(keys, low)
+        if high is None:
+            end = len(keys)
+        else:
+            end = bisect_right(keys, high) if include_high else bisect_left(keys, high)
+    except TypeError:
+        return 0, 0
+    return start, max(start, end)
+
+
+class TableIndexes:
+    """Набор индексов одной таблицы.
+
+    Первичный индекс по ID строится всегда и отображает ID на запись.
+    Вторичные индексы отображают значение столбца на множество ID.
+    Вместе с индексами поддерживается статистика столбцов (stats) и
+    зональные карты блоков ID (zones), по которым просмотр без индекса
+    пропускает блоки.
+    """
+
+    def __init__(self, columns: Iterable[str] = ()):
+        self.primary: Dict[int, Dict] = {}
+        self.id_order: List[int] = []
+        self.columns: Dict[str, Dict[Any, Set[int]]] = {}
+        self.sorted: Dict[str, SortedIndex] = {}
+        self.stats = TableStats()
+        self.zones = ZoneMaps()
+        # Статистику и зоны строит первое обращение, в том числе из параллельных чтений сервера
+        self._build_lock = threading.Lock()
+        for entry in columns:
+            if entry.endswith(SORTED_SUFFIX):
+                self.sorted[entry[:-len(SORTED_SUFFIX)]] = SortedIndex()
+            elif entry != 'ID':
+                self.columns[entry] = {}
+
+    def build(self, table_data: List[Dict]) -> 'TableIndexes':
+        """Строит все индексы за один проход по данным."""
+        self.primary = {}
+        self.id_order = []
+        for index in self.columns.values():
+            index.clear()
+        sorted_columns = list(self.sorted)
+        self.sorted = {}
+        self.stats.reset()
+        self.zones.reset()
+        for record in table_data:
+            self.on_insert(record)
+        for column in sorted_columns:
+            self.add_column(column, table_data, 'sorted')
+        return self
+
+    def add_column(self, column: str, table_data: List[Dict], kind: str = 'hash') -> None:
+        """Добавляет индекс по столбцу и заполняет его."""
+        if kind == 'sorted':
+            self.sorted[column] = SortedIndex().build(
+                (record.get(column), record['ID']) for record in table_data
+            )
+            return
+        index: Dict[Any, Set[int]] = {}
+        for record in table_data:
+            index.setdefault(record.get(column), set()).add(record['ID'])
+        self.columns[column] = index
+
+    def has_column(self, column: str, kind: str = 'hash') -> bool:
+        """Проверяет, есть ли индекс заданного вида по столбцу."""
+        if kind == 'sorted':
+            return column == 'ID' or column in self.sorted
+        return column == 'ID' or column in self.columns
+
+    def indexed_columns(self) -> List[str]:
+        """Возвращает список столбцов с индексами, включая ID."""
+        return ['ID'] + list(self.columns) + [col for col in self.sorted if col not in self.columns]
+
+    def to_list(self) -> List[str]:
+        """Возвращает описание индексов для файла индексов таблицы."""
+        return list(self.columns) + [f'{col}{SORTED_SUFFIX}' for col in self.sorted]
+
+    def on_insert(self, record: Dict) -> None:
+        """Добавляет новую запись во все индексы."""
+        record_id = record['ID']
+        self.primary[record_id] = record
+        if not self.id_order or self.id_order[-1] < record_id:
+            self.id_order.append(record_id)
+        else:
+            insort(self.id_order, record_id)
+        for col, index in self.columns.items():
+            index.setdefault(record.get(col), set()).add(record_id)
+        for col, index in self.sorted.items():
+            index.insert(record.get(col), record_id)
+        self.stats.on_insert(record)
+        self.zones.on_insert(record)
+
+    def on_update(self, record: Dict, old_values: Dict[str, Any]) -> None:
+        """Переносит запись в индексах после изменения столбцов.
+
+        ID записи не меняется: update с ID в set отклоняется при разборе.
+        """
+        record_id = record['ID']
+        self.stats.on_update(record, old_values)
+        self.zones.on_update(record)
+        for col, old_value in old_values.items():
+            if old_value == record.get(col):
+                continue
+            index = self.columns.get(col)
+            if index is not None:
+                self._discard(index, old_value, record_id)
+                index.setdefault(record.get(col), set()).add(record_id)
+            ordered = self.sorted.get(col)
+            if ordered is not None:
+                ordered.remove(old_value, record_id)
+                ordered.insert(record.get(col), record_id)
+
+    def on_delete(self, record: Dict) -> None:
+        """Удаляет запись из всех индексов."""
+        record_id = record['ID']
+        if self.primary.pop(record_id, None) is not None:
+            position = bisect_left(self.id_order, record_id)
+            if position < len(self.id_order) and self.id_order[position] == record_id:
+                del self.id_order[position]
+        for col, index in self.columns.items():
+            self._discard(index, record.get(col), record_id)
+        for col, index in self.sorted.items():
+            index.remove(record.get(col), record_id)
+        self.stats.on_delete(record)
+
+    def table_stats(self) -> TableStats:
+        """Возвращает статистику таблицы, построив ее при первом обращении."""
+        if not self.stats.ready:
+            with self._build_lock:
+                if not self.stats.ready:
+                    self.stats.build(self.primary.values())
+        return self.stats
+
+    def table_zones(self) -> ZoneMaps:
+        """Возвращает зональные карты таблицы, построив их при первом обращении."""
+        if not self.zones.ready:
+            with self._build_lock:
+                if not self.zones.ready:
+                    self.zones.build(self.primary.values())
+        return self.zones
+
+    def lookup(self, where_clause: Where) -> Optional[List[Dict]]:
+        """Находит записи по условию с помощью индексов.
+
+        Возвращает None, если для условия нет пути доступа по индексу,
+        иначе список подходящих записей в порядке возрастания ID.
+        """
+        if isinstance(where_clause, dict):
+            candidate_ids = self._lookup_equal(where_clause)
+        else:
+            access = self._access(where_clause)
+            candidate_ids = None if access is None else set(access[1]())
+        if candidate_ids is None:
+            return None
+
+        registry.inc('rows_scanned', len(candidate_ids))
+        check = compile_predicate(where_clause)
+        result = []
+        for record_id in sorted(candidate_ids):
+            record = self.primary[record_id]
+            if check(record):
+                result.append(record)
+        return result
+
+    def _lookup_equal(self, where_clause: Dict[str, Any]) -> Optional[Set[int]]:
+        """Пересекает множества ID по всем индексированным равенствам."""
+        candidate_ids: Optional[Set[int]] = None
+        for col, value in where_clause.items():
+            if col == 'ID':
+                ids = {value} if value in self.primary else set()
+            elif col in self.columns:
+                ids = self.columns[col].get(value, set())
+            elif col in self.sorted:
+                access = self._sorted_access(col, value, value)
+                ids = set(access[1]())
+            else:
+                continue
+            candidate_ids = set(ids) if candidate_ids is None else candidate_ids & ids
+            if not candidate_ids:
+                return set()
+        return candidate_ids
+
+    def access_path(self, where_clause: Where) -> Optional[Tuple[str, int]]:
+        """Описывает путь доступа по индексу для условия: (описание, оценка числа строк) или None."""
+        access = self._access(where_clause)
+        if access is None:
+            return None
+        return access[2], access[0]
+
+    def _access(self, predicate) -> Optional[Tuple[int, Callable[[], Iterable[int]], str]]:
+        """Выбирает путь доступа по индексу для условия.
+
+        Возвращает тройку (оценка числа строк, функция получения ID,
+        описание пути) или None, если условие нельзя ответить индексом. Для цепочки AND
+        выбирается член с наименьшей оценкой, остальные проверяются при
+        фильтрации найденных записей. OR отвечается индексом, только если
+        индексом отвечается каждая его ветвь.
+        """
+        if isinstance(predicate, dict):
+            ids = self._lookup_equal(predicate)
+            if ids is None:
+                return None
+            used = [col for col in predicate if self.has_column(col) or col in self.sorted]
+            return len(ids), lambda: ids, ' и '.join(self._describe(col, col not in self.columns) for col in used)
+        if isinstance(predicate, Compare):
+            return self._compare_access(predicate)
+        if isinstance(predicate, Between):
+            return self._sorted_access(predicate.column, predicate.low, predicate.high)
+        branches = [self._access(item) for item in predicate.items]
+        if isinstance(predicate, And):
+            branches = [branch for branch in branches if branch is not None]
+            return min(branches, key=lambda branch: branch[0]) if branches else None
+        if isinstance(predicate, Or) and all(branch is not None for branch in branches):
+            def union() -> Set[int]:
+                ids: Set[int] = set()
+                for _, fetch, _ in branches:
+                    ids.update(fetch())
+                return ids
+            return sum(branch[0] for branch in branches), union, ' или '.join(branch[2] for branch in branches)
+        return None
+
+    def _compare_access(self, predicate: Compare):
+        column, op, value = predicate.column, predicate.op, predicate.value
+        if op == '!=':
+            return None
+        if op == '=':
+            if column == 'ID':
+                ids = [value] if value in self.primary else []
+                return len(ids), lambda: ids, self._describe(column)
+            if column in self.columns:
+                ids = self.columns[column].get(value, set())
+                return len(ids), lambda: ids, self._describe(column)
+        if op in ('<', '<='):
+            return self._sorted_access(column, None, value, include_high=op == '<=')
+        if op in ('>', '>='):
+            return self._sorted_access(column, value, None, include_low=op == '>=')
+        return self._sorted_access(column, value, value)
+
+    def _sorted_access(self, column: str, low: Any, high: Any,
+                       include_low: bool = True, include_high: bool = True):
+        """Путь доступа через упорядоченный индекс; для ID — по порядку ID."""
+        if column == 'ID':
+            keys, ids = self.id_order, self.id_order
+        elif column in self.sorted:
+            keys, ids = self.sorted[column].keys, self.sorted[column].ids
+        else:
+            return None
+        start, end = _bounds(keys, low, high, include_low, include_high)
+        return end - start, lambda: ids[start:end], self._describe(column, True)
+
+    @staticmethod
+    def _describe(column: str, ordered: bool = False) -> str:
+        """Описывает индекс по столбцу для плана запроса."""
+        if column == 'ID':
+            return 'первичный ключ ID'
+        return f'упорядоченный индекс {column}' if ordered else f'хэш-индекс {column}'
+
+    @staticmethod
+    def _discard(index: Dict[Any, Set[int]], value: Any, record_id: int) -> None:
+        ids = index.get(value)
+        if ids is None:
+            return
+        ids.discard(record_id)
+        if not ids:
+            del index[value]
@@ -0,0 +1,192 @@
+"""Соединение двух таблиц по равенству столбцов (select from a join b on a.x = b.y).
+
+Условие where соединения делится на члены цепочки AND: члены, которые
+касаются только одной таблицы, передаются в select этой таблицы (и
+используют ее индексы и кэш запросов), остальные проверяются на
+соединенных строках.
+
+Способ соединения выбирается по входам:
+
+- слияние (merge) — если обе стороны можно прочитать в порядке ключа:
+  ключ ID у таблиц, которые хранят записи по возрастанию ID, или ключ
+  с упорядоченным индексом (create_index ... sorted). Обе стороны
+  читаются по одному разу без промежуточных структур;
+- хэш-соединение (hash) — в остальных случаях: по меньшей стороне
+  строится словарь ключ -> записи, а большая просматривается потоком.
+
+Результат — ленивый итератор записей с ключами "таблица.столбец", так
+что вывод начинается до окончания соединения и прекращается после limit.
+"""
+
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .binfmt import BinaryTable
+from .core import select
+from .indexes import TableIndexes
+from .metrics import registry
+from .partitions import PartitionedTable
+from .predicates import And, Where, columns, compile_predicate, conjuncts, rename, simplify
+from .rowtable import RowTable
+from .segments import SegmentTable
+from .sqlite_store import SqliteTable
+
+# Таблицы, которые перебирают записи в порядке возрастания ID
+_ID_ORDERED = (BinaryTable, PartitionedTable, SegmentTable, SqliteTable)
+
+
+class JoinInput:
+    """Одна сторона соединения: таблица, ее индексы, схема и столбец ключа."""
+
+    def __init__(self, table_name: str, table_data, table_indexes: Optional[TableIndexes],
+                 names: List[str], column: str):
+        self.table_name = table_name
+        self.table_data = table_data
+        self.table_indexes = table_indexes
+        self.names = names
+        self.column = column
+        self.where: Optional[Where] = None
+
+    @property
+    def qualified(self) -> List[str]:
+        """Имена столбцов стороны в результате соединения."""
+        return [f'{self.table_name}.{name}' for name in self.names]
+
+    def id_ordered(self) -> bool:
+        """Проверяет, перебирает ли таблица записи в порядке ID."""
+        if isinstance(self.table_data, RowTable):
+            return self.table_data.ordered
+        return isinstance(self.table_data, _ID_ORDERED)
+
+    def sorted_index(self):
+        """Возвращает упорядоченный индекс по столбцу ключа или None."""
+        if self.table_indexes is None:
+            return None
+        return self.table_indexes.sorted.get(self.column)
+
+    def ordered(self) -> bool:
+        """Проверяет, можно ли прочитать сторону в порядке ключа без сортировки."""
+        if self.column == 'ID':
+            return self.id_ordered()
+        return self.sorted_index() is not None
+
+    def rows(self) -> Iterable[Dict]:
+        """Возвращает записи стороны, удовлетворяющие ее части условия."""
+        return select(self.table_data, self.where, self.table_indexes, self.table_name)
+
+    def ordered_rows(self) -> Iterator[Dict]:
+        """Перебирает записи стороны в порядке ключа (см. ordered)."""
+        if self.column == 'ID':
+            return iter(self.rows())
+        index = self.sorted_index()
+        return self._index_rows(index.ids)
+
+    def _index_rows(self, ids: List[int]) -> Iterator[Dict]:
+        registry.inc('rows_scanned', len(ids))
+        primary = self.table_indexes.primary
+        if self.where is None:
+            return (primary[record_id] for record_id in ids)
+        check = compile_predicate(self.where)
+        return (record for record in (primary[record_id] for record_id in ids) if check(record))
+
+
+def split_where(where: Optional[Where], left: JoinInput, right: JoinInput) -> Optional[Where]:
+    """Раздает сторонам члены условия, касающиеся одной таблицы; возвращает остаток."""
+    if where is None:
+        return None
+    parts = {left.table_name: [], right.table_name: []}
+    residual = []
+    for item in conjuncts(where):
+        tables = {column.partition('.')[0] for column in columns(item)}
+        if len(tables) == 1:
+            parts[tables.pop()].append(item)
+        else:
+            residual.append(item)
+    for side in (left, right):
+        items = parts[side.table_name]
+        if items:
+            mapping = {name: name.partition('.')[2] for name in side.qualified}
+            side.where = rename(simplify(And(tuple(items)) if len(items) > 1 else items[0]), mapping)
+    if not residual:
+        return None
+    return simplify(And(tuple(residual)) if len(residual) > 1 else residual[0])
+
+
+def choose_strategy(left: JoinInput, right: JoinInput) -> str:
+    """Выбирает способ соединения: 'merge', если обе стороны упорядочены по ключу, иначе 'hash'."""
+    return 'merge' if left.ordered() and right.ordered() else 'hash'
+
+
+def _groups(rows: Iterable[Dict], column: str) -> Iterator[Tuple[Any, List[Dict]]]:
+    """Группирует упорядоченные по column записи с равным ключом; None пропускается."""
+    group: List[Dict] = []
+    current = None
+    for record in rows:
+        value = record.get(column)
+        if value is None:
+            continue
+        if group and value != current:
+            yield current, group
+            group = []
+        current = value
+        group.append(record)
+    if group:
+        yield current, group
+
+
+def merge_join(left: JoinInput, right: JoinInput) -> Iterator[Tuple[Dict, Dict]]:
+    """Соединяет слиянием две стороны, упорядоченные по ключу."""
+    left_groups = _groups(left.ordered_rows(), left.column)
+    right_groups = _groups(right.ordered_rows(), right.column)
+    left_group = next(left_groups, None)
+    right_group = next(right_groups, None)
+    while left_group is not None and right_group is not None:
+        if left_group[0] < right_group[0]:
+            left_group = next(left_groups, None)
+        elif left_group[0] > right_group[0]:
+            right_group = next(right_groups, None)
+        else:
+            for left_record in left_group[1]:
+                for right_record in right_group[1]:
+                    yield left_record, right_record
+            left_group = next(left_groups, None)
+            right_group = next(right_groups, None)
+
+
+def hash_join(left: JoinInput, right: JoinInput) -> Iterator[Tuple[Dict, Dict]]:
+    """Соединяет хэшированием: словарь строится по меньшей стороне."""
+    left_rows, right_rows = left.rows(), right.rows()
+    build_left = len(left_rows) <= len(right_rows)
+    build, build_column = (left_rows, left.column) if build_left else (right_rows, right.column)
+    probe, probe_column = (right_rows, right.column) if build_left else (left_rows, left.column)
+    table: Dict[Any, List[Dict]] = {}
+    for record in build:
+        value = record.get(build_column)
+        if value is not None:
+            table.setdefault(value, []).append(record)
+    for record in probe:
+        matches = table.get(record.get(probe_column))
+        if not matches:
+            continue
+        for match in matches:
+            yield (match, record) if build_left else (record, match)
+
+
+def join(left: JoinInput, right: JoinInput, where: Optional[Where] = None,
+         limit: Optional[int] = None, offset: int = 0) -> Iterator[Dict]:
+    """Лениво соединяет две таблицы и возвращает записи с ключами "таблица.столбец"."""
+    residual = split_where(where, left, right)
+    strategy = choose_strategy(left, right)
+    registry.inc('joins', strategy=strategy)
+    pairs = merge_join(left, right) if strategy == 'merge' else hash_join(left, right)
+    names = left.qualified + right.qualified
+    left_names, right_names = left.names, right.names
+    rows = (
+        dict(zip(names, [*(a.get(col) for col in left_names), *(b.get(col) for col in right_names)]))
+        for a, b in pairs
+    )
+    if residual is not None:
+        rows = filter(compile_predicate(residual), rows)
+    if limit is not None or offset:
+        rows = islice(rows, offset, None if limit is None else offset + limit)
+    return rows
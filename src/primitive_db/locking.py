@@ -0,0 +1,143 @@
+"""Блокировка писателя для общего каталога базы.
+
+Процессы, изменяющие базу, по очереди берут рекомендательную блокировку
+fcntl.flock на файл DB_LOCK_FILE рядом с метаданными. Читатели блокировку
+не берут: файлы подменяются атомарно, а таблица читается согласованным
+снимком (см. utils.load_table_data), поэтому читатели никогда не ждут
+писателей.
+
+Без модуля fcntl (не POSIX) блокировка ничего не делает.
+
+ReadWriteLock разделяет потоки одного процесса, работающие с общим
+сеансом (см. server): чтения идут одновременно, запись — одна и без чтений.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from .constants import DB_LOCK_FILE, LOCK_TIMEOUT
+from .metrics import registry
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Пауза между попытками взять занятую блокировку
+_POLL_INTERVAL = 0.01
+
+
+class LockTimeout(OSError):
+    """Блокировку не удалось получить за отведенное время."""
+
+
+class WriterLock:
+    """Повторно входимая блокировка писателя на весь каталог базы.
+
+    Файл блокируется при первом acquire и освобождается, когда число
+    release сравняется с числом acquire.
+    """
+
+    def __init__(self, path: str = DB_LOCK_FILE, timeout: float = LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._file = None
+        self._depth = 0
+
+    @property
+    def held(self) -> bool:
+        return self._depth > 0
+
+    def acquire(self) -> None:
+        """Берет блокировку, ожидая не дольше timeout секунд."""
+        if self._depth:
+            self._depth += 1
+            return
+        if fcntl is not None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a+b')
+            start = time.monotonic()
+            while True:
+                try:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() - start >= self.timeout:
+                        self._file.close()
+                        self._file = None
+                        raise LockTimeout(f'База занята другим процессом дольше {self.timeout:g} с.') from None
+                    time.sleep(_POLL_INTERVAL)
+            registry.observe('lock_wait_seconds', time.monotonic() - start)
+        self._depth = 1
+
+    def release(self) -> None:
+        """Освобождает блокировку (для вложенных acquire — после последнего release)."""
+        if not self._depth:
+            return
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'WriterLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+def lock_path(meta_file: str) -> str:
+    """Возвращает путь к файлу блокировки для файла метаданных."""
+    return os.path.join(os.path.dirname(meta_file), DB_LOCK_FILE)
+
+
+class ReadWriteLock:
+    """Блокировка потоков: много читателей или один писатель.
+
+    Ожидающий писатель не пропускает вперед новых читателей, поэтому
+    непрерывный поток чтений не откладывает запись бесконечно.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """Удерживает блокировку на чтение, пока выполняется блок."""
+        with self._condition:
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """Удерживает блокировку на запись, дождавшись завершения начатых чтений."""
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
@@ -1,11 +1,79 @@
 #!/usr/bin/env python3
 #
 
-from .engine import run
+import argparse
+import json
+import sys
+
+from .constants import GROUP_COMMIT_SIZE, STORAGE_BACKEND, SERVER_HOST, SERVER_PORT
+from .decorators import CONFIRM_POLICIES, set_confirm_policy
+from .engine import Session, run, run_script
+from .storage import BACKENDS
 
 
 def main():
-    run()
+    parser = argparse.ArgumentParser(prog='database', description='Примитивная база данных.')
+    parser.add_argument('--script', metavar='FILE',
+                        help='выполнить команды из файла без интерактивного ввода ("-" — из stdin)')
+    parser.add_argument('--confirm', choices=CONFIRM_POLICIES,
+                        help='ответ на подтверждение delete/drop_table: ask, yes или no '
+                             '(по умолчанию ask, в режиме --script — yes)')
+    parser.add_argument('--group-commit', type=int, default=GROUP_COMMIT_SIZE, metavar='N',
+                        help='в режиме --script фиксировать изменения одной записью на диск '
+                             'каждые N команд (0 — после каждой команды)')
+    parser.add_argument('--backend', choices=tuple(BACKENDS),
+                        help='хранилище новой базы: json или sqlite (по умолчанию '
+                             f'{STORAGE_BACKEND}); у существующей базы берется из метаданных')
+    subparsers = parser.add_subparsers(dest='mode')
+    for name, help_text in (('serve', 'запустить сетевой сервер'),
+                            ('client', 'подключиться к серверу'),
+                            ('load', 'нагрузить сервер одновременными клиентами')):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument('--host', default=SERVER_HOST)
+        subparser.add_argument('--port', type=int, default=SERVER_PORT)
+        if name == 'load':
+            subparser.add_argument('--clients', type=int, default=8, help='число одновременных соединений')
+            subparser.add_argument('--requests', type=int, default=1000, help='команд на соединение')
+            subparser.add_argument('--write-ratio', type=float, default=0.1, help='доля команд insert')
+            subparser.add_argument('--table', default='load', help='таблица для нагрузки')
+    args = parser.parse_args()
+
+    if args.mode == 'serve':
+        # Подтверждение delete/drop_table спросить у удаленного клиента нельзя.
+        set_confirm_policy(args.confirm or 'yes')
+        from .server import serve
+        serve(args.host, args.port, args.backend)
+        return
+    if args.mode == 'client':
+        from .client import run_client
+        run_client(args.host, args.port)
+        return
+    if args.mode == 'load':
+        from .client import run_load
+        try:
+            summary = run_load(args.host, args.port, args.clients, args.requests, args.write_ratio, args.table)
+        except OSError as e:
+            print(f'Ошибка: Не удалось подключиться к {args.host}:{args.port}: {e}')
+            sys.exit(1)
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+
+    if args.script is None:
+        set_confirm_policy(args.confirm or 'ask')
+        run(args.backend)
+        return
+
+    set_confirm_policy(args.confirm or 'yes')
+    session = Session(group_commit=args.group_commit, backend=args.backend)
+    if args.script == '-':
+        run_script(sys.stdin, session)
+        return
+    try:
+        with open(args.script, 'r', encoding='utf-8') as f:
+            run_script(f, session)
+    except FileNotFoundError:
+        print(f'Ошибка: Файл "{args.script}" не найден.')
+        sys.exit(1)
 
 
 if __name__ == "__main__":
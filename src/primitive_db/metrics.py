@@ -0,0 +1,246 @@
+"""Реестр метрик: счетчики, гистограммы задержек и время фаз команды.
+
+Фазы (parse, load, execute, persist, render) измеряются без вложенного
+времени: если внутри execute началась фаза persist, ее время не входит в
+execute. Время фаз суммируется за команду и по ее завершении попадает в
+гистограммы, поэтому сумма фаз равна времени команды, и видно, куда
+уходит задержка. Гистограммы имеют фиксированные логарифмические границы,
+и наблюдение стоит одного двоичного поиска.
+
+Счетчики и гистограммы общие для процесса, а фазы и время текущей команды
+ведутся для каждого потока отдельно: сервер выполняет чтения параллельно.
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# Границы корзин гистограмм в секундах: от 10 мкс до ~84 с с шагом x2
+BUCKETS: Tuple[float, ...] = tuple(round(0.00001 * 2 ** i, 8) for i in range(24))
+PHASES = ('parse', 'load', 'execute', 'persist', 'render')
+PROMETHEUS_PREFIX = 'primitive_db_'
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+
+    def __init__(self, bounds: Tuple[float, ...] = BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценивает квантиль верхней границей корзины, в которую он попадает."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return self.bounds[i] if i < len(self.bounds) else float('inf')
+        return float('inf')
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': {str(bound): count for bound, count in zip(self.bounds, self.counts) if count},
+            'overflow': self.counts[-1],
+        }
+
+
+class StatementTiming:
+    """Замер одной команды; kind заполняется после разбора."""
+
+    def __init__(self):
+        self.kind = None
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    if len(labels) == 1:
+        return tuple(labels.items())
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Счетчики и гистограммы процесса с метками."""
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._collectors: Dict[str, Callable[[], Dict]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def _phases(self) -> List[list]:
+        """Стек активных фаз потока: [имя, начало, время вложенных фаз]."""
+        local = self._local
+        if not hasattr(local, 'phases'):
+            local.phases = []
+        return local.phases
+
+    @property
+    def _pending(self) -> Dict[str, float]:
+        """Собственное время фаз текущей команды потока."""
+        local = self._local
+        if not hasattr(local, 'pending'):
+            local.pending = {}
+        return local.pending
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """Увеличивает счетчик."""
+        key = (name, _labels(labels)) if labels else (name, ())
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Добавляет наблюдение в гистограмму."""
+        key = (name, _labels(labels)) if labels else (name, ())
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Измеряет собственное время фазы (без вложенных фаз)."""
+        frame = [name, time.perf_counter(), 0.0]
+        self._phases.append(frame)
+        try:
+            yield
+        finally:
+            self._phases.pop()
+            elapsed = time.perf_counter() - frame[1]
+            if self._phases:
+                self._phases[-1][2] += elapsed
+            self._pending[name] = self._pending.get(name, 0.0) + elapsed - frame[2]
+
+    def charge(self, name: str, elapsed: float) -> None:
+        """Относит уже измеренное время к фазе, вычитая его из объемлющей фазы.
+
+        Нужен там, где фаза прерывается многократно (ленивый перебор строк
+        во время вывода), и контекстный менеджер на каждую строку слишком дорог.
+        """
+        if self._phases:
+            self._phases[-1][2] += elapsed
+        self._pending[name] = self._pending.get(name, 0.0) + elapsed
+
+    def pending(self) -> Dict[str, float]:
+        """Возвращает собственное время фаз текущей команды, накопленное к этому моменту."""
+        return dict(self._pending)
+
+    @contextmanager
+    def statement(self) -> Iterator['StatementTiming']:
+        """Измеряет команду целиком и фиксирует накопленное время ее фаз.
+
+        Вид команды задается внутри блока через timing.kind; если он
+        остался None (пустая строка, ошибка разбора), замер не сохраняется.
+        """
+        self._pending.clear()
+        timing = StatementTiming()
+        start = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            elapsed = time.perf_counter() - start
+            if timing.kind is not None:
+                for name, seconds in self._pending.items():
+                    self.observe('phase_seconds', seconds, phase=name)
+                self.observe('statement_seconds', elapsed, statement=timing.kind)
+            self._pending.clear()
+
+    def add_collector(self, name: str, collect: Callable[[], Dict]) -> None:
+        """Регистрирует источник значений, вычисляемых при снимке (например, счетчики кэша)."""
+        self._collectors[name] = collect
+
+    def reset(self) -> None:
+        """Обнуляет счетчики и гистограммы."""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> Dict:
+        """Возвращает все метрики в виде словаря."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = [(key, histogram.to_dict())
+                          for key, histogram in sorted(self.histograms.items(), key=lambda item: item[0])]
+        return {
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in counters
+            ],
+            'histograms': [
+                {'name': name, 'labels': dict(labels), **histogram}
+                for (name, labels), histogram in histograms
+            ],
+            'gauges': {name: collect() for name, collect in self._collectors.items()},
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Возвращает метрики в текстовом формате Prometheus."""
+        lines = []
+        typed = set()
+
+        def header(name: str, kind: str) -> None:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f'{PROMETHEUS_PREFIX}{name}_total'
+            header(metric, 'counter')
+            lines.append(f'{metric}{_format_labels(labels)} {value}')
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            metric = f'{PROMETHEUS_PREFIX}{name}'
+            header(metric, 'histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{_format_labels(labels + (("le", repr(bound)),))} {cumulative}')
+            lines.append(f'{metric}_bucket{_format_labels(labels + (("le", "+Inf"),))} {histogram.count}')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {histogram.sum}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {histogram.count}')
+        for source, values in self._collectors.items():
+            for key, value in values().items():
+                metric = f'{PROMETHEUS_PREFIX}{source}_{key}'
+                header(metric, 'gauge')
+                lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, filepath: str, fmt: str = None) -> str:
+        """Записывает метрики в файл: JSON для *.json, иначе формат Prometheus."""
+        fmt = fmt or ('json' if filepath.endswith('.json') else 'prometheus')
+        text = self.to_json() if fmt == 'json' else self.to_prometheus()
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return fmt
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+registry = Registry()
@@ -0,0 +1,142 @@
+"""Постраничное хранение базового файла построчной таблицы.
+
+Записи таблицы делятся на страницы по ID: страница k содержит ID от
+k*PAGE_ROWS до (k+1)*PAGE_ROWS-1, внутри страницы записи упорядочены по ID.
+Каждая страница хранится в отдельном файле
+data/<имя_таблицы>.page<k>.<версия>.<кодек> сжатым блоком (см. segments),
+а базовый файл таблицы data/<имя_таблицы>.json становится оглавлением:
+{"version":v,"page_rows":PAGE_ROWS,"codec":"zlib","pages":{"k":"<имя файла>"}}.
+Оглавление без кодека ссылается на страницы в виде JSON-списков записей.
+
+Файл страницы после записи не меняется. Контрольная точка пишет новые
+файлы только для страниц, в которых менялись записи (номера страниц
+берутся из ID в журнале, см. dirty_pages), атомарно подменяет оглавление
+и затем удаляет файлы замененных страниц. Читатель, который по старому
+оглавлению не нашел файл страницы, перечитывает таблицу (SNAPSHOT_RETRIES).
+"""
+
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from .constants import BLOCK_CODEC, DATA_DIR, PAGE_ROWS, PAGE_SUFFIX
+from .metrics import registry
+from .rowtable import RowTable
+from .segments import read_block, write_block
+
+
+def page_of(record_id: Optional[int]) -> int:
+    """Возвращает номер страницы записи с данным ID."""
+    return (record_id or 0) // PAGE_ROWS
+
+
+def get_page_name(table_name: str, key: int, version: int, codec: str = BLOCK_CODEC) -> str:
+    """Возвращает имя файла страницы таблицы (относительно DATA_DIR)."""
+    return f'{table_name}{PAGE_SUFFIX}{key}.{version}.{codec}'
+
+
+def list_pages(table_name: str) -> List[str]:
+    """Находит все файлы страниц таблицы, в том числе оставшиеся после сбоя."""
+    pattern = re.compile(re.escape(f'{table_name}{PAGE_SUFFIX}') + r'\d+\.\d+\.\w+')
+    try:
+        names = os.listdir(DATA_DIR)
+    except FileNotFoundError:
+        return []
+    return [f'{DATA_DIR}{name}' for name in names if pattern.fullmatch(name)]
+
+
+def remove_pages(table_name: str) -> None:
+    """Удаляет все файлы страниц таблицы."""
+    for filepath in list_pages(table_name):
+        os.remove(filepath)
+
+
+def iter_pages(pages: Dict[str, str], codec: Optional[str] = None) -> Iterator[List[Dict]]:
+    """Читает страницы оглавления в порядке номеров и возвращает записи каждой из них.
+
+    codec — кодек блоков страниц (None — страницы в виде JSON-списков).
+    Если файла страницы уже нет (его удалила контрольная точка другого
+    процесса), выбрасывается FileNotFoundError.
+    """
+    for key in sorted(pages, key=int):
+        filepath = f'{DATA_DIR}{pages[key]}'
+        if codec is not None:
+            yield read_block(filepath, codec)
+            continue
+        with open(filepath, 'r', encoding='utf-8') as f:
+            registry.inc('bytes_read', os.fstat(f.fileno()).st_size)
+            yield json.load(f)
+
+
+
+def dirty_pages(entries: Iterable[Dict]) -> Optional[Set[int]]:
+    """Возвращает номера страниц, затронутых записями журнала.
+
+    None означает, что страницы определить нельзя (запись update или
+    delete без списка ID) и таблицу нужно записать целиком.
+    """
+    keys = set()
+    for entry in entries:
+        op = entry.get('op')
+        if op == 'insert':
+            keys.add(page_of(entry['record'].get('ID')))
+        elif op == 'insert_many':
+            keys.update(page_of(record.get('ID')) for record in entry['records'])
+        elif 'ids' in entry:
+            keys.update(page_of(record_id) for record_id in entry['ids'])
+        else:
+            return None
+    return keys
+
+
+def _group(data: Iterable[Dict], keys: Optional[Set[int]]) -> Dict[int, List[Dict]]:
+    """Раскладывает записи по страницам (только страницы из keys, если они заданы)."""
+    if isinstance(data, RowTable) and data.ordered and keys is not None:
+        # Записи упорядочены по ID: страница находится двоичным поиском без полного прохода.
+        return {key: data.id_range(key * PAGE_ROWS, (key + 1) * PAGE_ROWS) for key in keys}
+    groups = defaultdict(list)
+    for record in data:
+        key = page_of(record.get('ID'))
+        if keys is None or key in keys:
+            groups[key].append(record)
+    for records in groups.values():
+        records.sort(key=lambda record: record.get('ID') or 0)
+    return groups
+
+
+def write_pages(table_name: str, data: Iterable[Dict], version: int, pages: Dict[str, str],
+                keys: Optional[Set[int]] = None) -> Dict[str, str]:
+    """Записывает страницы новой версии и возвращает новое оглавление.
+
+    pages — оглавление предыдущей версии, keys — номера измененных
+    страниц (None — переписать все). Остальные страницы переходят в новое
+    оглавление без записи, опустевшие страницы из него исключаются.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    groups = _group(data, keys)
+    result = {} if keys is None else dict(pages)
+    written = 0
+    for key in (groups if keys is None else keys):
+        records = groups.get(key)
+        if not records:
+            result.pop(str(key), None)
+            continue
+        name = get_page_name(table_name, key, version)
+        write_block(f'{DATA_DIR}{name}', records)
+        result[str(key)] = name
+        written += 1
+    registry.inc('pages_written', written)
+    return result
+
+
+def remove_replaced(pages: Dict[str, str], current: Dict[str, str]) -> None:
+    """Удаляет файлы страниц прежнего оглавления, которых нет в новом."""
+    kept = set(current.values())
+    for name in pages.values():
+        if name not in kept:
+            try:
+                os.remove(f'{DATA_DIR}{name}')
+            except FileNotFoundError:
+                pass
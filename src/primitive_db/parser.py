@@ -1,119 +1,835 @@
-"""Парсеры для разбора команд SQL-подобного синтаксиса"""
-
-from typing import Dict, Any, Optional
-
-
-def parse_where_clause(where_str: str, metadata: dict, table_name: str) -> Optional[Dict[str, Any]]:
-    """Парсит условие WHERE в словарь."""
-    if not where_str:
-        return None
-    
-    parts = where_str.split('=', 1)
-    if len(parts) != 2:
-        return None
-    
-    col_name = parts[0].strip()
-    value_str = parts[1].strip()
-    
-    if table_name not in metadata:
-        return None
-    
-    col_type = None
-    for col_def in metadata[table_name]:
-        if ':' in col_def:
-            name, col_type_str = col_def.split(':', 1)
-            if name.strip().lower() == col_name.lower():
-                col_type = col_type_str.strip().lower()
-                break
-    
-    if col_type is None:
-        return None
-    
-    try:
-        if col_type == 'int':
-            value = int(value_str)
-        elif col_type == 'bool':
-            value_lower = value_str.lower()
-            if value_lower in ('true', '1', 'yes'):
-                value = True
-            elif value_lower in ('false', '0', 'no'):
-                value = False
-            else:
-                return None
-        elif col_type == 'str':
-            if (value_str.startswith('"') and value_str.endswith('"')) or \
-               (value_str.startswith("'") and value_str.endswith("'")):
-                value = value_str[1:-1]
-            else:
-                value = value_str
-        else:
-            return None
-        
-        return {col_name: value}
-    except (ValueError, AttributeError):
-        return None
-
-
-def parse_set_clause(set_str: str, metadata: dict, table_name: str) -> Optional[Dict[str, Any]]:
-    """Парсит условие SET в словарь."""
-    if not set_str:
-        return None
-    
-    result = {}
-    assignments = set_str.split(',')
-    
-    for assignment in assignments:
-        parts = assignment.split('=', 1)
-        if len(parts) != 2:
-            return None
-        
-        col_name = parts[0].strip()
-        value_str = parts[1].strip()
-        
-        if table_name not in metadata:
-            return None
-        
-        col_type = None
-        for col_def in metadata[table_name]:
-            if ':' in col_def:
-                name, col_type_str = col_def.split(':', 1)
-                if name.strip().lower() == col_name.lower():
-                    col_type = col_type_str.strip().lower()
-                    break
-        
-        if col_type is None:
-            return None
-        
+"""Парсеры для разбора команд SQL-подобного синтаксиса
+
+Команда разбирается за один проход: лексер превращает строку в список
+токенов, а парсер строит по ним дерево оператора (AST). Столбцы в условиях
+where и set сопоставляются со скомпилированной схемой таблицы, а значения
+сразу приводятся к типу столбца.
+
+Разобранные команды кэшируются как планы по «форме» оператора — списку
+токенов, в котором строковые и числовые литералы заменены параметрами.
+Повторная команда той же формы (например, select по другому ID) только
+токенизируется и подставляет новые литералы в готовый план.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields, is_dataclass, replace
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .constants import AGGREGATE_FUNCTIONS, PLAN_CACHE_SIZE
+from .metrics import registry
+from .predicates import And, Between, Compare, Or, Where, simplify
+from .schema import JoinSchema, get_schema
+
+
+class ParseError(ValueError):
+    """Ошибка разбора команды."""
+
+
+class UnknownCommand(ParseError):
+    """Команда не поддерживается."""
+
+    def __init__(self, command: str):
+        super().__init__(command)
+        self.command = command
+
+
+@dataclass(frozen=True)
+class Token:
+    kind: str
+    text: str
+
+
+# Ключевые слова сравниваются без учета регистра и в форме плана приводятся
+# к нижнему регистру.
+_KEYWORDS = {
+    'select', 'from', 'where', 'limit', 'offset', 'insert', 'into', 'values',
+    'update', 'set', 'delete', 'import', 'exit', 'help', 'list_tables',
+    'checkpoint', 'create_table', 'drop_table', 'create_index', 'convert_table',
+    'info', 'output', 'and', 'or', 'between', 'begin', 'commit', 'rollback',
+    'transaction', 'stats', 'reset', 'dump', 'group', 'by', 'vacuum', 'join', 'on',
+    'explain', 'analyze',
+}
+
+# Команды, для которых доступен explain
+_EXPLAINABLE = ('select', 'insert', 'update', 'delete')
+
+# Операторы сравнения в where; "<>" — синоним "!="
+_COMPARISONS = {'=': '=', '!=': '!=', '<>': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+
+_TOKEN_RE = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<string>"[^"]*"|'[^']*')
+  | (?P<number>-?\d+(?![^\s=<>!(),;'"*]))
+  | (?P<op><=|>=|!=|<>|=|<|>|\(|\)|,|\*|;)
+  | (?P<word>[^\s=<>!(),;'"*]+)
+''', re.VERBOSE)
+
+
+def tokenize(text: str) -> List[Token]:
+    """Разбивает команду на токены за один проход регулярным выражением."""
+    tokens = []
+    pos = 0
+    length = len(text)
+    while pos < length:
+        match = _TOKEN_RE.match(text, pos)
+        if match is None:
+            raise ParseError(f'Незакрытая кавычка или неожиданный символ в позиции {pos}.')
+        kind = match.lastgroup
+        if kind != 'space':
+            tokens.append(Token(kind, match.group()))
+        pos = match.end()
+    return tokens
+
+
+# ---------------------------------------------------------------------------
+# Дерево операторов
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Exit:
+    pass
+
+
+@dataclass
+class Help:
+    pass
+
+
+@dataclass
+class ListTables:
+    pass
+
+
+@dataclass
+class Checkpoint:
+    pass
+
+
+@dataclass
+class Begin:
+    pass
+
+
+@dataclass
+class Commit:
+    pass
+
+
+@dataclass
+class Rollback:
+    pass
+
+
+@dataclass
+class Stats:
+    action: str = 'show'
+    path: Optional[str] = None
+    fmt: Optional[str] = None
+
+
+@dataclass
+class CreateTable:
+    table: str
+    columns: List[str]
+
+
+@dataclass
+class DropTable:
+    table: str
+
+
+@dataclass
+class CreateIndex:
+    table: str
+    column: str
+    kind: str = 'hash'
+
+
+@dataclass
+class ConvertTable:
+    table: str
+    storage_format: str
+    scheme: Optional[str] = None
+    size: Optional[int] = None
+
+
+@dataclass
+class Info:
+    table: str
+
+
+@dataclass
+class Vacuum:
+    table: str
+
+
+@dataclass
+class Output:
+    mode: str
+
+
+@dataclass
+class Insert:
+    table: str
+    rows: List[List[Any]]
+
+
+@dataclass
+class Import:
+    table: str
+    path: str
+
+
+@dataclass
+class Select:
+    table: str
+    where: Optional[Where] = None
+    limit: Optional[int] = None
+    offset: int = 0
+
+
+@dataclass
+class Join:
+    """select по двум таблицам, соединенным по равенству столбцов left_column и right_column.
+
+    Столбцы в where имеют вид "таблица.столбец" (см. schema.JoinSchema).
+    """
+    left: str
+    right: str
+    left_column: str
+    right_column: str
+    where: Optional[Where] = None
+    limit: Optional[int] = None
+    offset: int = 0
+
+
+@dataclass(frozen=True)
+class AggregateItem:
+    """Элемент списка select: функция над столбцом или столбец группировки (func=None).
+
+    Для count(*) column равен None.
+    """
+    func: Optional[str]
+    column: Optional[str]
+
+    @property
+    def label(self) -> str:
+        if self.func is None:
+            return self.column
+        return f'{self.func}({self.column or "*"})'
+
+
+@dataclass
+class Aggregate:
+    table: str
+    items: List[AggregateItem]
+    where: Optional[Where] = None
+    group_by: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Update:
+    table: str
+    set: Dict[str, Any] = field(default_factory=dict)
+    where: Where = field(default_factory=dict)
+
+
+@dataclass
+class Delete:
+    table: str
+    where: Where = field(default_factory=dict)
+
+
+@dataclass
+class Explain:
+    """explain [analyze] <команда>: план команды, а с analyze — еще и отчет о ее выполнении."""
+    statement: Any
+    analyze: bool = False
+
+
+def executed_statement(statement: Any) -> Any:
+    """Возвращает команду, которую выполняет оператор: для explain analyze — анализируемую.
+
+    По ней определяются блокировка писателя и допустимость команды в транзакции.
+    """
+    if isinstance(statement, Explain) and statement.analyze:
+        return statement.statement
+    return statement
+
+
+@dataclass(frozen=True)
+class Param:
+    """Место литерала в плане; заполняется при подстановке значений."""
+    index: int
+    col_type: Optional[str] = None
+    non_negative: bool = False
+
+
+# ---------------------------------------------------------------------------
+# Приведение значений
+# ---------------------------------------------------------------------------
+
+def _literal_text(token: Token) -> str:
+    if token.kind == 'string':
+        return token.text[1:-1]
+    return token.text
+
+
+def convert_literal(text: str, col_type: Optional[str]) -> Any:
+    """Приводит текст литерала к типу столбца."""
+    if col_type is None or col_type == 'str':
+        return text
+    if col_type == 'int':
         try:
-            if col_type == 'int':
-                value = int(value_str)
-            elif col_type == 'bool':
-                value_lower = value_str.lower()
-                if value_lower in ('true', '1', 'yes'):
-                    value = True
-                elif value_lower in ('false', '0', 'no'):
-                    value = False
-                else:
-                    return None
-            elif col_type == 'str':
-                if (value_str.startswith('"') and value_str.endswith('"')) or \
-                   (value_str.startswith("'") and value_str.endswith("'")):
-                    value = value_str[1:-1]
-                else:
-                    value = value_str
+            return int(text)
+        except ValueError:
+            raise ParseError(f'Некорректное значение: {text}. Ожидается int.') from None
+    if col_type == 'bool':
+        value_lower = text.lower()
+        if value_lower in ('true', '1', 'yes'):
+            return True
+        if value_lower in ('false', '0', 'no'):
+            return False
+        raise ParseError(f'Некорректное значение: {text}. Ожидается bool.')
+    raise ParseError(f'Неподдерживаемый тип: {col_type}')
+
+
+def _convert_param(param: Param, literals: List[str]) -> Any:
+    value = convert_literal(literals[param.index], param.col_type)
+    if param.non_negative and value < 0:
+        raise ParseError(f'Некорректное значение: {value}.')
+    return value
+
+
+def _bind(node: Any, literals: List[str]) -> Any:
+    if isinstance(node, Param):
+        return _convert_param(node, literals)
+    if isinstance(node, dict):
+        return {key: _bind(value, literals) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_bind(item, literals) for item in node]
+    if isinstance(node, tuple):
+        return tuple(_bind(item, literals) for item in node)
+    if is_dataclass(node) and not isinstance(node, type):
+        changes = {f.name: _bind(getattr(node, f.name), literals) for f in fields(node)}
+        return replace(node, **changes)
+    return node
+
+
+def _has_params(node: Any) -> bool:
+    if isinstance(node, Param):
+        return True
+    if isinstance(node, dict):
+        return any(_has_params(value) for value in node.values())
+    if isinstance(node, (list, tuple)):
+        return any(_has_params(item) for item in node)
+    if is_dataclass(node) and not isinstance(node, type):
+        return any(_has_params(getattr(node, f.name)) for f in fields(node))
+    return False
+
+
+# ---------------------------------------------------------------------------
+# Парсер
+# ---------------------------------------------------------------------------
+
+class _Parser:
+    """Рекурсивный парсер по списку токенов.
+
+    Строковые и числовые литералы превращаются в Param, поэтому
+    построенное дерево является планом, не зависящим от их значений.
+    """
+
+    def __init__(self, tokens: List[Token], metadata: dict):
+        self.tokens = tokens
+        self.metadata = metadata
+        self.pos = 0
+        self.param_index = {}
+        index = 0
+        for i, token in enumerate(tokens):
+            if token.kind in ('string', 'number'):
+                self.param_index[i] = index
+                index += 1
+        self.tables: List[str] = []
+
+    def peek(self, offset: int = 0) -> Optional[Token]:
+        pos = self.pos + offset
+        return self.tokens[pos] if pos < len(self.tokens) else None
+
+    def at_keyword(self, *words: str) -> bool:
+        token = self.peek()
+        return token is not None and token.kind == 'word' and token.text.lower() in words
+
+    def at_end(self) -> bool:
+        return self.pos >= len(self.tokens)
+
+    def advance(self) -> Token:
+        token = self.peek()
+        if token is None:
+            raise ParseError('Неожиданный конец команды.')
+        self.pos += 1
+        return token
+
+    def expect_keyword(self, word: str) -> None:
+        if not self.at_keyword(word):
+            raise ParseError(f'Ожидается "{word}".')
+        self.pos += 1
+
+    def expect_op(self, op: str) -> None:
+        token = self.advance()
+        if token.kind != 'op' or token.text != op:
+            raise ParseError(f'Ожидается "{op}".')
+
+    def at_op(self, op: str) -> bool:
+        token = self.peek()
+        return token is not None and token.kind == 'op' and token.text == op
+
+    def name(self) -> str:
+        token = self.advance()
+        if token.kind != 'word':
+            raise ParseError(f'Ожидается имя, получено: {token.text}')
+        return token.text
+
+    def table_name(self) -> str:
+        table = self.name()
+        self.tables.append(table)
+        return table
+
+    def literal(self, col_type: Optional[str] = None, non_negative: bool = False) -> Any:
+        """Читает литерал: строку/число как параметр, слово как константу."""
+        position = self.pos
+        token = self.advance()
+        if token.kind in ('string', 'number'):
+            return Param(self.param_index[position], col_type, non_negative)
+        if token.kind != 'word':
+            raise ParseError(f'Ожидается значение, получено: {token.text}')
+        value = convert_literal(token.text, col_type)
+        if non_negative and value < 0:
+            raise ParseError(f'Некорректное значение: {value}.')
+        return value
+
+    def end(self) -> None:
+        if self.at_op(';'):
+            self.pos += 1
+        if not self.at_end():
+            raise ParseError(f'Лишний текст: {self.peek().text}')
+
+    def schema(self, table: str):
+        schema = get_schema(self.metadata, table)
+        if schema is None:
+            raise ParseError(f'Таблица "{table}" не существует.')
+        return schema
+
+    def column(self, schema) -> Tuple[str, str]:
+        column = self.name()
+        resolved = schema.resolve(column)
+        if resolved is None:
+            raise ParseError(f'Столбец "{column}" не найден.')
+        return resolved
+
+    def assignment_list(self, schema) -> Dict[str, Any]:
+        result = {}
+        while True:
+            col_name, col_type = self.column(schema)
+            self.expect_op('=')
+            result[col_name] = self.literal(col_type)
+            if not self.at_op(','):
+                return result
+            self.pos += 1
+
+    def where_clause(self, schema):
+        """Разбирает условие: сравнения и BETWEEN, соединенные AND/OR, со скобками.
+
+        AND связывает сильнее OR. Цепочка равенств через AND возвращается
+        словарем {столбец: значение}, остальные условия — деревом predicates.
+        """
+        return simplify(self._or_expr(schema))
+
+    def _or_expr(self, schema):
+        items = [self._and_expr(schema)]
+        while self.at_keyword('or'):
+            self.pos += 1
+            items.append(self._and_expr(schema))
+        return items[0] if len(items) == 1 else Or(tuple(items))
+
+    def _and_expr(self, schema):
+        items = [self._condition(schema)]
+        while self.at_keyword('and'):
+            self.pos += 1
+            items.append(self._condition(schema))
+        return items[0] if len(items) == 1 else And(tuple(items))
+
+    def _condition(self, schema):
+        if self.at_op('('):
+            self.pos += 1
+            predicate = self._or_expr(schema)
+            self.expect_op(')')
+            return predicate
+        col_name, col_type = self.column(schema)
+        if self.at_keyword('between'):
+            self.pos += 1
+            low = self.literal(col_type)
+            self.expect_keyword('and')
+            return Between(col_name, low, self.literal(col_type))
+        token = self.advance()
+        if token.kind != 'op' or token.text not in _COMPARISONS:
+            raise ParseError(f'Ожидается оператор сравнения, получено: {token.text}')
+        return Compare(col_name, _COMPARISONS[token.text], self.literal(col_type))
+
+    def value_row(self) -> List[Any]:
+        row = [self.literal()]
+        while self.at_op(','):
+            self.pos += 1
+            row.append(self.literal())
+        return row
+
+    def parse(self):
+        command = self.name().lower()
+        handler = getattr(self, f'_parse_{command}', None)
+        if handler is None:
+            raise UnknownCommand(command)
+        statement = handler()
+        self.end()
+        return statement
+
+    def _parse_exit(self):
+        return Exit()
+
+    def _parse_help(self):
+        return Help()
+
+    def _parse_list_tables(self):
+        return ListTables()
+
+    def _parse_checkpoint(self):
+        return Checkpoint()
+
+    def _parse_begin(self):
+        if self.at_keyword('transaction'):
+            self.pos += 1
+        return Begin()
+
+    def _parse_commit(self):
+        return Commit()
+
+    def _parse_rollback(self):
+        return Rollback()
+
+    def _parse_stats(self):
+        if self.at_end() or self.at_op(';'):
+            return Stats()
+        action = self.name().lower()
+        if action == 'reset':
+            return Stats('reset')
+        if action != 'dump':
+            raise ParseError(f'Неизвестное действие stats: {action}')
+        statement = Stats('dump', self.literal())
+        if not self.at_end() and not self.at_op(';'):
+            statement.fmt = self.name().lower()
+        return statement
+
+    def _parse_create_table(self):
+        table = self.table_name()
+        columns = [self.name()]
+        while not self.at_end() and not self.at_op(';'):
+            columns.append(self.name())
+        return CreateTable(table, columns)
+
+    def _parse_drop_table(self):
+        return DropTable(self.table_name())
+
+    def _parse_create_index(self):
+        statement = CreateIndex(self.table_name(), self.name())
+        if not self.at_end() and not self.at_op(';'):
+            statement.kind = self.name().lower()
+        return statement
+
+    def _parse_convert_table(self):
+        statement = ConvertTable(self.table_name(), self.name().lower())
+        if not self.at_end() and not self.at_op(';'):
+            statement.scheme = self.name().lower()
+            if not self.at_end() and not self.at_op(';'):
+                statement.size = self.literal('int', non_negative=True)
+        return statement
+
+    def _parse_explain(self):
+        analyze = self.at_keyword('analyze')
+        if analyze:
+            self.pos += 1
+        command = self.name().lower()
+        if command not in _EXPLAINABLE:
+            raise ParseError('explain поддерживается для команд: ' + ', '.join(_EXPLAINABLE) + '.')
+        return Explain(getattr(self, f'_parse_{command}')(), analyze)
+
+    def _parse_info(self):
+        return Info(self.table_name())
+
+    def _parse_vacuum(self):
+        return Vacuum(self.table_name())
+
+    def _parse_output(self):
+        return Output(self.name().lower())
+
+    def _parse_insert(self):
+        self.expect_keyword('into')
+        table = self.table_name()
+        self.expect_keyword('values')
+        rows = []
+        if not self.at_op('('):
+            return Insert(table, [self.value_row()])
+        while True:
+            self.expect_op('(')
+            rows.append(self.value_row())
+            self.expect_op(')')
+            if not self.at_op(','):
+                return Insert(table, rows)
+            self.pos += 1
+
+    def _parse_import(self):
+        table = self.table_name()
+        self.expect_keyword('from')
+        return Import(table, self.literal())
+
+    def _select_item(self) -> Tuple[Optional[str], Optional[str]]:
+        """Читает элемент списка select как (функция, столбец) без проверки по схеме."""
+        name = self.name()
+        if not self.at_op('('):
+            return None, name
+        self.pos += 1
+        func = name.lower()
+        if func not in AGGREGATE_FUNCTIONS:
+            raise ParseError(f'Неизвестная функция: {name}')
+        if self.at_op('*'):
+            self.pos += 1
+            if func != 'count':
+                raise ParseError('"*" допускается только в count(*).')
+            column = None
+        else:
+            column = self.name()
+        self.expect_op(')')
+        return func, column
+
+    def _parse_aggregate(self, table: str, raw_items) -> Aggregate:
+        schema = self.schema(table)
+        statement = Aggregate(table, [])
+        if self.at_keyword('where'):
+            self.pos += 1
+            statement.where = self.where_clause(schema)
+        if self.at_keyword('group'):
+            self.pos += 1
+            self.expect_keyword('by')
+            statement.group_by.append(self.column(schema)[0])
+            while self.at_op(','):
+                self.pos += 1
+                statement.group_by.append(self.column(schema)[0])
+        for func, column in raw_items:
+            col_type = None
+            if column is not None:
+                resolved = schema.resolve(column)
+                if resolved is None:
+                    raise ParseError(f'Столбец "{column}" не найден.')
+                column, col_type = resolved
+            if func is None and column not in statement.group_by:
+                raise ParseError(f'Столбец "{column}" должен входить в group by или быть аргументом функции.')
+            if func in ('sum', 'avg') and col_type != 'int':
+                raise ParseError(f'Функция {func} применима только к столбцам int.')
+            statement.items.append(AggregateItem(func, column))
+        if all(item.func is None for item in statement.items):
+            raise ParseError('Ожидается хотя бы одна функция: ' + ', '.join(AGGREGATE_FUNCTIONS) + '.')
+        return statement
+
+    def _parse_select(self):
+        raw_items = []
+        while not self.at_keyword('from'):
+            if raw_items:
+                self.expect_op(',')
+            raw_items.append(self._select_item())
+        self.expect_keyword('from')
+        table = self.table_name()
+        if raw_items:
+            return self._parse_aggregate(table, raw_items)
+        if self.at_keyword('join'):
+            return self._parse_join(table)
+        statement = Select(table)
+        if self.at_keyword('where'):
+            self.pos += 1
+            statement.where = self.where_clause(self.schema(table))
+        self._limit_offset(statement)
+        return statement
+
+    def _limit_offset(self, statement) -> None:
+        while self.at_keyword('limit', 'offset'):
+            keyword = self.advance().text.lower()
+            value = self.literal('int', non_negative=True)
+            if keyword == 'limit':
+                statement.limit = value
             else:
-                return None
-            
-            result[col_name] = value
-        except (ValueError, AttributeError):
-            return None
-    
-    return result if result else None
+                statement.offset = value
+
+    def _parse_join(self, left: str) -> Join:
+        self.expect_keyword('join')
+        right = self.table_name()
+        if right == left:
+            raise ParseError('Соединение таблицы с самой собой не поддерживается.')
+        schema = JoinSchema(self.schema(left), self.schema(right))
+        self.expect_keyword('on')
+        first, first_type = self.column(schema)
+        self.expect_op('=')
+        second, second_type = self.column(schema)
+        if first_type != second_type:
+            raise ParseError('Столбцы соединения должны быть одного типа.')
+        first_table, _, first_column = first.partition('.')
+        second_table, _, second_column = second.partition('.')
+        if first_table == second_table:
+            raise ParseError('Условие on должно связывать столбцы двух таблиц.')
+        if first_table != left:
+            first_column, second_column = second_column, first_column
+        statement = Join(left, right, first_column, second_column)
+        if self.at_keyword('where'):
+            self.pos += 1
+            statement.where = self.where_clause(schema)
+        self._limit_offset(statement)
+        return statement
+
+    def _parse_update(self):
+        table = self.table_name()
+        schema = self.schema(table)
+        self.expect_keyword('set')
+        set_clause = self.assignment_list(schema)
+        if 'ID' in set_clause:
+            # По ID журнал, страницы, индексы и секции находят запись: ID не меняется.
+            raise ParseError('Столбец ID изменить нельзя.')
+        self.expect_keyword('where')
+        return Update(table, set_clause, self.where_clause(schema))
+
+    def _parse_delete(self):
+        self.expect_keyword('from')
+        table = self.table_name()
+        self.expect_keyword('where')
+        return Delete(table, self.where_clause(self.schema(table)))
+
+
+def split_statements(lines: Iterable[str]) -> Iterator[str]:
+    """Делит текст сценария на команды.
+
+    Команда заканчивается точкой с запятой вне кавычек или концом строки.
+    Пустые строки и комментарии, начинающиеся с "--" или "#", пропускаются.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith(('--', '#')):
+            continue
+        if ';' not in line:
+            yield line
+            continue
+        start = 0
+        quote = None
+        for i, char in enumerate(line):
+            if quote is not None:
+                if char == quote:
+                    quote = None
+            elif char in ('"', "'"):
+                quote = char
+            elif char == ';':
+                statement = line[start:i].strip()
+                if statement:
+                    yield statement
+                start = i + 1
+        statement = line[start:].strip()
+        if statement:
+            yield statement
+
+
+# ---------------------------------------------------------------------------
+# Кэш планов
+# ---------------------------------------------------------------------------
+
+class _Plan:
+    """Разобранный оператор с параметрами вместо литералов."""
 
+    def __init__(self, template, schema_key: tuple):
+        self.template = template
+        self.schema_key = schema_key
+        self.parametrized = _has_params(template)
 
+    def bind(self, literals: List[str]):
+        if not self.parametrized:
+            return self.template
+        return _bind(self.template, literals)
+
+
+def _schema_key(metadata: dict, tables: List[str]) -> tuple:
+    return tuple(tuple(metadata.get(table, ())) for table in tables)
+
+
+class PlanCache:
+    """LRU-кэш планов, ключ — форма оператора.
+
+    План действителен, пока не изменились схемы таблиц, на которые он
+    ссылается. Дополнительно запоминается разбиение точного текста команды
+    на форму и литералы, чтобы повторяющиеся команды не токенизировались.
+    """
+
+    def __init__(self, max_size: int = PLAN_CACHE_SIZE):
+        self.max_size = max_size
+        self._plans: 'OrderedDict[tuple, Tuple[_Plan, List[str]]]' = OrderedDict()
+        self._texts: 'OrderedDict[str, Tuple[tuple, List[str]]]' = OrderedDict()
+        # Кэш общий для потоков сервера
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _shape(self, text: str) -> Tuple[tuple, List[str], List[Token]]:
+        cached = self._texts.get(text)
+        if cached is not None:
+            self._texts.move_to_end(text)
+            return cached[0], cached[1], None
+        tokens = tokenize(text)
+        shape = tuple('?' if token.kind in ('string', 'number') else token.text.lower()
+                      if token.kind == 'word' and token.text.lower() in _KEYWORDS else token.text
+                      for token in tokens)
+        literals = [_literal_text(token) for token in tokens if token.kind in ('string', 'number')]
+        self._texts[text] = (shape, literals)
+        if len(self._texts) > self.max_size:
+            self._texts.popitem(last=False)
+        return shape, literals, tokens
+
+    def parse(self, text: str, metadata: dict):
+        """Возвращает оператор для текста команды, используя кэш планов."""
+        with self._lock:
+            shape, literals, tokens = self._shape(text)
+            if not shape:
+                return None
+            entry = self._plans.get(shape)
+            if entry is not None:
+                plan, tables = entry
+                if plan.schema_key == _schema_key(metadata, tables):
+                    self._plans.move_to_end(shape)
+                    self.hits += 1
+                    return plan.bind(literals)
+            self.misses += 1
 
+        if tokens is None:
+            tokens = tokenize(text)
+        parser = _Parser(tokens, metadata)
+        template = parser.parse()
+        plan = _Plan(template, _schema_key(metadata, parser.tables))
+        with self._lock:
+            self._plans[shape] = (plan, parser.tables)
+            if len(self._plans) > self.max_size:
+                self._plans.popitem(last=False)
+        return plan.bind(literals)
 
+    def stats(self) -> Dict[str, int]:
+        """Возвращает счетчики кэша планов."""
+        return {'plans': len(self._plans), 'hits': self.hits, 'misses': self.misses}
 
 
+plan_cache = PlanCache()
+registry.add_collector('plan_cache', plan_cache.stats)
 
 
+def parse_statement(text: str, metadata: dict):
+    """Разбирает команду в оператор AST (None для пустой строки)."""
+    return plan_cache.parse(text, metadata)
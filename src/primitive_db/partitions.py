@@ -0,0 +1,558 @@
+"""Секционированные таблицы и параллельный просмотр секций.
+
+Таблица делится на секции по ID, каждая секция хранится в отдельном
+файле data/<имя_таблицы>.part<k>.json. При схеме 'range' секция k содержит
+ID от k*size+1 до (k+1)*size, при схеме 'hash' — ID с остатком k от деления
+на size (число секций). Внутри секции записи упорядочены по ID.
+
+У каждой секции свой журнал изменений data/<имя_таблицы>.part<k>.log (см.
+wal): запись дописывает изменения только в журналы затронутых секций, а
+контрольная точка сворачивает журнал секции в ее файл. Файл секции и ее
+журнал имеют номер версии, как базовый файл и журнал обычной таблицы;
+файл секции хранит и число своих строк, поэтому длину таблицы можно узнать
+по началу файлов и журналам, не читая записи.
+
+Секции читаются лениво: при открытии таблицы находятся только их файлы,
+а записи секции загружаются при первом обращении к ней в этом процессе.
+Полный просмотр большой таблицы распределяется по процессам
+ProcessPoolExecutor: незагруженные секции без несохраненных изменений
+читает и держит разобранными сам рабочий процесс (пока не изменятся файлы
+секции), вычисляет условие и возвращает select подходящие записи, а update
+и delete — номера подходящих строк, так что основной процесс загружает
+только секции, где записи нашлись. Остальные секции просматриваются в
+основном процессе. Результаты объединяются в порядке ID.
+"""
+
+import heapq
+import json
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from . import wal
+from .constants import (
+    DATA_DIR, PARALLEL_SCAN_MIN_ROWS, PARTITION_RANGE_SIZE, PARTITION_SUFFIX, SCAN_WORKERS, SNAPSHOT_RETRIES,
+    WAL_SUFFIX
+)
+from .metrics import registry
+from .predicates import Between, Compare, Where, compile_predicate, conjuncts
+
+PARTITION_SCHEMES = ('range', 'hash')
+
+_HEADER_RE = re.compile(rb'\{"version":(\d+),"rows":(\d+),')
+
+
+def partition_name(table_name: str, key: int) -> str:
+    """Возвращает имя секции для журнала (см. wal): <имя_таблицы>.part<k>."""
+    return f'{table_name}{PARTITION_SUFFIX}{key}'
+
+
+def get_partition_path(table_name: str, key: int) -> str:
+    """Возвращает путь к файлу секции таблицы."""
+    return f'{DATA_DIR}{partition_name(table_name, key)}.json'
+
+
+def list_partitions(table_name: str) -> Dict[int, List[str]]:
+    """Находит файлы секций таблицы и их журналов: номер секции -> пути."""
+    pattern = re.compile(re.escape(f'{table_name}{PARTITION_SUFFIX}') + r'(\d+)(\.json|' + re.escape(WAL_SUFFIX) + ')')
+    try:
+        names = os.listdir(DATA_DIR)
+    except FileNotFoundError:
+        return {}
+    result: Dict[int, List[str]] = {}
+    for name in sorted(names):
+        match = pattern.fullmatch(name)
+        if match is not None:
+            result.setdefault(int(match.group(1)), []).append(f'{DATA_DIR}{name}')
+    return dict(sorted(result.items()))
+
+
+def remove_partitions(table_name: str) -> None:
+    """Удаляет все файлы секций таблицы и их журналы."""
+    for filepaths in list_partitions(table_name).values():
+        for filepath in filepaths:
+            os.remove(filepath)
+
+
+def _signature(filepath: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def partition_signature(table_name: str, key: int) -> tuple:
+    """Возвращает подпись файла секции и ее журнала."""
+    return (_signature(get_partition_path(table_name, key)),
+            _signature(wal.get_log_path(partition_name(table_name, key))))
+
+
+def _record_id(record: Dict) -> int:
+    return record['ID']
+
+
+def _read_header(filepath: str) -> Optional[Tuple[int, int]]:
+    """Возвращает версию и число строк файла секции по его началу.
+
+    None — файл старого формата (записи одним списком), у него версия 0, а
+    число строк без чтения записей неизвестно.
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            head = f.read(64)
+    except FileNotFoundError:
+        return 0, 0
+    match = _HEADER_RE.match(head)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def _read_base(filepath: str) -> Tuple[int, List[Dict]]:
+    """Читает файл секции: версию и записи (старый формат — список, версия 0)."""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            registry.inc('bytes_read', os.fstat(f.fileno()).st_size)
+            data = json.load(f)
+    except FileNotFoundError:
+        return 0, []
+    if isinstance(data, dict):
+        return data['version'], data['records']
+    return 0, data
+
+
+def read_partition(table_name: str, key: int) -> List[Dict]:
+    """Читает согласованный снимок секции: файл секции и журнал той же версии.
+
+    Как и для обычной таблицы (см. utils.load_table_data): журнал новее
+    файла означает, что другой процесс как раз выполнил контрольную точку,
+    и секция перечитывается; журнал старше файла уже свернут в него.
+    """
+    name = partition_name(table_name, key)
+    for _ in range(SNAPSHOT_RETRIES):
+        version, records = _read_base(get_partition_path(table_name, key))
+        log_version, entries = wal.read_log(name)
+        if log_version > version:
+            registry.inc('snapshot_retries')
+            continue
+        if log_version < version:
+            return records
+        return wal.replay(records, iter(entries))
+    raise OSError(f'Не удалось прочитать согласованный снимок секции "{name}".')
+
+
+def count_partition(table_name: str, key: int) -> int:
+    """Возвращает число строк секции по началу ее файла и журналу, не читая записи."""
+    name = partition_name(table_name, key)
+    for _ in range(SNAPSHOT_RETRIES):
+        header = _read_header(get_partition_path(table_name, key))
+        if header is None:
+            return len(read_partition(table_name, key))
+        version, rows = header
+        log_version, entries = wal.read_log(name)
+        if log_version > version:
+            registry.inc('snapshot_retries')
+            continue
+        if log_version < version:
+            return rows
+        for entry in entries:
+            op = entry.get('op')
+            if op == 'insert':
+                rows += 1
+            elif op == 'insert_many':
+                rows += len(entry['records'])
+            elif op == 'delete':
+                rows -= len(entry['ids'])
+        return rows
+    raise OSError(f'Не удалось прочитать согласованный снимок секции "{name}".')
+
+
+# ---------------------------------------------------------------------------
+# Рабочие процессы
+# ---------------------------------------------------------------------------
+
+# Разобранные секции в рабочем процессе: имя секции -> (подпись файлов, записи)
+_worker_partitions: Dict[str, Tuple[tuple, List[Dict]]] = {}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _scan_partition(directory: str, table_name: str, key: int, signature: tuple,
+                    where_clause: Where, positions: bool) -> List:
+    """Выполняется в рабочем процессе: возвращает записи секции по условию или их номера.
+
+    directory — рабочий каталог основного процесса, относительно которого
+    лежит DATA_DIR.
+    """
+    if os.getcwd() != directory:
+        os.chdir(directory)
+    name = partition_name(table_name, key)
+    cached = _worker_partitions.get(name)
+    if cached is None or cached[0] != signature:
+        cached = (signature, read_partition(table_name, key))
+        _worker_partitions[name] = cached
+    check = compile_predicate(where_clause)
+    if positions:
+        return [i for i, record in enumerate(cached[1]) if check(record)]
+    return [record for record in cached[1] if check(record)]
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if _executor is None:
+        workers = SCAN_WORKERS or os.cpu_count() or 1
+        if workers < 2:
+            return None
+        _executor = ProcessPoolExecutor(max_workers=workers)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Останавливает рабочие процессы параллельного просмотра."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+# ---------------------------------------------------------------------------
+# Таблица
+# ---------------------------------------------------------------------------
+
+class PartitionedTable:
+    """Таблица, разделенная на секции по ID.
+
+    Поддерживает протокол списка записей (len, итерация в порядке ID,
+    append, обращение к последней записи), поэтому ее можно передавать в
+    функции core. Изменения копятся в памяти до log_changes, который
+    дописывает их в журналы затронутых секций; checkpoint сворачивает
+    журналы в файлы секций.
+    """
+
+    def __init__(self, table_name: str, scheme: str = 'range', size: int = PARTITION_RANGE_SIZE):
+        if scheme not in PARTITION_SCHEMES:
+            raise ValueError(f'Неизвестная схема секционирования: {scheme}')
+        if size <= 0:
+            raise ValueError(f'Некорректный размер секции: {size}')
+        self.table_name = table_name
+        self.scheme = scheme
+        self.size = size
+        # Загруженные в этом процессе секции
+        self.partitions: Dict[int, List[Dict]] = {}
+        # Номера всех секций и подписи их файлов на момент открытия или своей записи
+        self.keys: Set[int] = set()
+        self.signatures: Dict[int, tuple] = {}
+        # Число строк незагруженных секций, прочитанное по началу файлов
+        self.counts: Dict[int, int] = {}
+        # Секции, измененные в памяти и еще не записанные в журнал (внутри транзакции)
+        self.changed: Set[int] = set()
+        # Секции, журнал которых еще не свернут контрольной точкой
+        self.dirty: Set[int] = set()
+        self._last: Optional[Dict] = None
+        # Секции могут загружаться из нескольких потоков чтения сервера.
+        self._load_lock = threading.Lock()
+        for key in list_partitions(table_name):
+            self.keys.add(key)
+            self.signatures[key] = partition_signature(table_name, key)
+
+    @classmethod
+    def create(cls, table_name: str, records: List[Dict], scheme: str = 'range',
+               size: int = PARTITION_RANGE_SIZE) -> 'PartitionedTable':
+        """Раскладывает записи по секциям и записывает файлы секций."""
+        remove_partitions(table_name)
+        table = cls(table_name, scheme, size)
+        for record in sorted(records, key=_record_id):
+            table.append(record)
+        table.dirty.update(table.changed)
+        table.changed.clear()
+        table.checkpoint()
+        return table
+
+    def key(self, record_id: int) -> int:
+        """Возвращает номер секции для ID."""
+        if self.scheme == 'hash':
+            return record_id % self.size
+        return max(record_id - 1, 0) // self.size
+
+    def partition(self, key: int) -> List[Dict]:
+        """Возвращает записи секции, загружая ее при первом обращении."""
+        partition = self.partitions.get(key)
+        if partition is None:
+            with self._load_lock:
+                partition = self.partitions.get(key)
+                if partition is None:
+                    partition = read_partition(self.table_name, key) if key in self.signatures else []
+                    self.partitions[key] = partition
+                    self.counts.pop(key, None)
+        return partition
+
+    def partition_len(self, key: int) -> int:
+        """Возвращает число строк секции; незагруженная секция для этого не читается."""
+        partition = self.partitions.get(key)
+        if partition is not None:
+            return len(partition)
+        if key not in self.counts:
+            self.counts[key] = count_partition(self.table_name, key)
+        return self.counts[key]
+
+    def __len__(self) -> int:
+        return sum(self.partition_len(key) for key in self.keys)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self._merge(self.partition(key) for key in sorted(self.keys))
+
+    def __getitem__(self, i: int) -> Dict:
+        if i != -1:
+            raise IndexError('Секционированная таблица поддерживает только обращение к последней записи.')
+        if self._last is not None:
+            return self._last
+        last = [partition[-1] for partition in map(self.partition, self.keys) if partition]
+        if not last:
+            raise IndexError('Таблица пуста.')
+        return max(last, key=_record_id)
+
+    def append(self, record: Dict) -> None:
+        """Добавляет запись в ее секцию (ID должен быть больше существующих)."""
+        key = self.key(record['ID'])
+        self.partition(key).append(record)
+        self.keys.add(key)
+        self.changed.add(key)
+        self._last = record
+
+    def _merge(self, parts) -> Iterator[Dict]:
+        """Объединяет упорядоченные по ID части секций в общий порядок ID."""
+        if self.scheme == 'range':
+            return chain.from_iterable(parts)
+        return heapq.merge(*parts, key=_record_id)
+
+    def candidate_keys(self, where_clause: Where) -> List[int]:
+        """Оставляет секции, которые могут содержать записи по ограничениям на ID в цепочке AND."""
+        keys = sorted(self.keys)
+        low = high = None
+        for item in conjuncts(where_clause):
+            if isinstance(item, Between) and item.column == 'ID':
+                bounds = ((item.low, '>='), (item.high, '<='))
+            elif isinstance(item, Compare) and item.column == 'ID' and item.op != '!=':
+                bounds = ((item.value, '>='), (item.value, '<=')) if item.op == '=' else ((item.value, item.op),)
+            else:
+                continue
+            for value, op in bounds:
+                if isinstance(value, bool) or not isinstance(value, int):
+                    return []
+                if op in ('>', '>='):
+                    value = value + 1 if op == '>' else value
+                    low = value if low is None else max(low, value)
+                else:
+                    value = value - 1 if op == '<' else value
+                    high = value if high is None else min(high, value)
+        if low is not None and high is not None and low > high:
+            return []
+        if self.scheme == 'hash':
+            if low is not None and low == high:
+                return [key for key in keys if key == self.key(low)]
+            return keys
+        first = self.key(low) if low is not None else None
+        last = self.key(high) if high is not None else None
+        return [key for key in keys if (first is None or key >= first) and (last is None or key <= last)]
+
+    def _scan(self, where_clause: Where, positions: bool) -> List[Tuple[int, List]]:
+        """Просматривает секции-кандидаты: (номер секции, подходящие записи или их номера).
+
+        Незагруженные секции без изменений в памяти большой таблицы
+        просматриваются параллельно в рабочих процессах, остальные
+        загружаются и просматриваются в основном процессе.
+        """
+        keys = self.candidate_keys(where_clause)
+        registry.inc('rows_scanned', sum(self.partition_len(key) for key in keys))
+        found: Dict[int, List] = {}
+        remote = [key for key in keys
+                  if key not in self.partitions and key not in self.changed and key in self.signatures]
+        if len(remote) > 1 and sum(self.partition_len(key) for key in remote) >= PARALLEL_SCAN_MIN_ROWS:
+            found.update(self._scan_parallel(remote, where_clause, positions))
+        check = None
+        for key in keys:
+            if key not in found:
+                check = check or compile_predicate(where_clause)
+                partition = self.partition(key)
+                if positions:
+                    found[key] = [i for i, record in enumerate(partition) if check(record)]
+                else:
+                    found[key] = [record for record in partition if check(record)]
+        return [(key, found[key]) for key in keys]
+
+    def _scan_parallel(self, keys: List[int], where_clause: Where, positions: bool) -> Dict[int, List]:
+        """Раздает секции рабочим процессам; при сбое пула возвращает пустой результат."""
+        executor = _get_executor()
+        if executor is None:
+            return {}
+        directory = os.getcwd()
+        try:
+            futures = {
+                key: executor.submit(_scan_partition, directory, self.table_name, key,
+                                     self.signatures[key], where_clause, positions)
+                for key in keys
+            }
+            found = {key: future.result() for key, future in futures.items()}
+        except (OSError, BrokenProcessPool):
+            # Процессы недоступны (ограничения окружения): секции просмотрит основной процесс.
+            shutdown_executor()
+            return {}
+        registry.inc('parallel_scans')
+        registry.inc('partitions_scanned_parallel', len(keys))
+        return found
+
+    def matches(self, where_clause: Where) -> List[Tuple[int, List[int]]]:
+        """Находит номера подходящих строк в каждой секции-кандидате (в порядке номеров секций)."""
+        return self._scan(where_clause, positions=True)
+
+    def select(self, where_clause: Optional[Where] = None) -> List[Dict]:
+        """Возвращает записи, удовлетворяющие условию, в порядке ID."""
+        if where_clause is None:
+            return list(self)
+        return list(self._merge(records for _, records in self._scan(where_clause, positions=False)))
+
+    def iter_select(self, where_clause: Optional[Where] = None) -> Iterator[Dict]:
+        """Лениво возвращает записи по условию.
+
+        Для схемы range секции уже идут в порядке ID, поэтому они
+        загружаются и просматриваются по одной, и перебор можно остановить
+        после limit строк. Для схемы hash нужны все секции сразу, и условие
+        вычисляется так же, как в select.
+        """
+        if where_clause is None:
+            return iter(self)
+        if self.scheme == 'hash':
+            return iter(self.select(where_clause))
+        return self._iter_range(where_clause)
+
+    def _iter_range(self, where_clause: Where) -> Iterator[Dict]:
+        check = compile_predicate(where_clause)
+        scanned = 0
+        try:
+            for key in self.candidate_keys(where_clause):
+                for record in self.partition(key):
+                    scanned += 1
+                    if check(record):
+                        yield record
+        finally:
+            registry.inc('rows_scanned', scanned)
+
+    def update(self, set_clause: Dict[str, Any], where_clause: Where) -> List[int]:
+        """Изменяет подходящие записи, отмечает их секции измененными и возвращает ID записей."""
+        updated = []
+        for key, positions in self.matches(where_clause):
+            if not positions:
+                continue
+            partition = self.partition(key)
+            for i in positions:
+                record = partition[i]
+                record.update((col, value) for col, value in set_clause.items() if col in record)
+                updated.append(record['ID'])
+            self.changed.add(key)
+        updated.sort()
+        return updated
+
+    def delete(self, where_clause: Where) -> List[int]:
+        """Удаляет подходящие записи, отмечает их секции измененными и возвращает ID записей."""
+        deleted = []
+        for key, positions in self.matches(where_clause):
+            if not positions:
+                continue
+            partition = self.partition(key)
+            deleted.extend(partition[i]['ID'] for i in positions)
+            dropped = set(positions)
+            self.partitions[key] = [record for i, record in enumerate(partition) if i not in dropped]
+            self.changed.add(key)
+        if deleted:
+            self._last = None
+        deleted.sort()
+        return deleted
+
+    def log_changes(self, entries: List[Dict]) -> None:
+        """Дописывает записи журнала таблицы в журналы затронутых секций.
+
+        Вставки раскладываются по секциям по ID записей, update и delete — по
+        списку ID затронутых строк; в каждый журнал пакет дописывается одной
+        записью на диск. Журнал секции, выросший до размера ее файла (см.
+        wal.needs_checkpoint), сразу сворачивается.
+        """
+        split: Dict[int, List[Dict]] = {}
+        for entry in entries:
+            op = entry.get('op')
+            if op == 'insert':
+                split.setdefault(self.key(entry['record']['ID']), []).append(entry)
+                continue
+            groups: Dict[int, list] = {}
+            if op == 'insert_many':
+                for record in entry['records']:
+                    groups.setdefault(self.key(record['ID']), []).append(record)
+                for key, records in groups.items():
+                    split.setdefault(key, []).append({'op': op, 'records': records})
+                continue
+            for record_id in entry['ids']:
+                groups.setdefault(self.key(record_id), []).append(record_id)
+            for key, ids in groups.items():
+                part = {'op': op, 'ids': ids}
+                if op == 'update':
+                    part['set'] = entry['set']
+                split.setdefault(key, []).append(part)
+        for key in sorted(split):
+            wal.append_entries(partition_name(self.table_name, key), split[key])
+            self.signatures[key] = partition_signature(self.table_name, key)
+            self.dirty.add(key)
+        self.changed.clear()
+        for key in sorted(split):
+            if wal.needs_checkpoint(partition_name(self.table_name, key)):
+                self._fold(key)
+
+    def has_pending(self) -> bool:
+        """Проверяет, есть ли у секций журналы, которые еще не свернуты."""
+        return bool(self.dirty)
+
+    def checkpoint(self) -> None:
+        """Сворачивает журналы секций в их файлы (контрольная точка).
+
+        Сворачиваются журналы, записанные этим процессом, и журналы,
+        оставшиеся на диске после сбоя.
+        """
+        pending = self.dirty | {key for key in self.keys if key not in self.dirty
+                                and wal.has_entries(partition_name(self.table_name, key))}
+        for key in sorted(pending):
+            self._fold(key)
+
+    def _fold(self, key: int) -> None:
+        """Записывает файл секции следующей версии и начинает ее журнал заново.
+
+        Файл секции пишется во временный файл и атомарно подменяется, затем
+        журнал заменяется пустым журналом той же версии. Опустевшая секция
+        удаляется: сначала журнал, потом файл.
+        """
+        name = partition_name(self.table_name, key)
+        filepath = get_partition_path(self.table_name, key)
+        partition = self.partition(key)
+        header = _read_header(filepath)
+        version = (header[0] if header is not None else 0) + 1
+        Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f'{filepath}.{os.getpid()}.tmp'
+        # Версия и число строк записываются первыми, чтобы их можно было прочитать по началу файла.
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'version': version, 'rows': len(partition), 'records': partition},
+                               ensure_ascii=False, separators=(',', ':')))
+            f.flush()
+            os.fsync(f.fileno())
+            registry.inc('bytes_written', os.fstat(f.fileno()).st_size)
+        os.replace(tmp_path, filepath)
+        wal.reset(name, version)
+        self.dirty.discard(key)
+        if partition:
+            self.signatures[key] = partition_signature(self.table_name, key)
+            return
+        wal.truncate(name)
+        os.remove(filepath)
+        self.keys.discard(key)
+        self.partitions.pop(key, None)
+        self.signatures.pop(key, None)
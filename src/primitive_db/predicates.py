@@ -0,0 +1,171 @@
+"""Составные условия where: сравнения, BETWEEN, AND и OR.
+
+Простое условие из одних равенств, соединенных AND, по-прежнему
+представляется словарем {столбец: значение}: на нем работают быстрые пути
+индексов и движков хранения, и в таком виде оно пишется в журнал. Все
+остальные условия строятся из неизменяемых узлов Compare, Between, And и
+Or, которые можно хэшировать (ключ кэша запросов) и сохранять в JSON.
+"""
+
+import operator
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+@dataclass(frozen=True)
+class Compare:
+    column: str
+    op: str
+    value: Any
+
+
+@dataclass(frozen=True)
+class Between:
+    column: str
+    low: Any
+    high: Any
+
+
+@dataclass(frozen=True)
+class And:
+    items: Tuple[Any, ...]
+
+
+@dataclass(frozen=True)
+class Or:
+    items: Tuple[Any, ...]
+
+
+Predicate = Union[Compare, Between, And, Or]
+Where = Union[Dict[str, Any], Predicate]
+
+
+def simplify(predicate: Predicate) -> Where:
+    """Сводит цепочку равенств через AND к словарю, если это возможно."""
+    items = predicate.items if isinstance(predicate, And) else (predicate,)
+    result = {}
+    for item in items:
+        if not isinstance(item, Compare) or item.op != '=' or item.column in result:
+            return predicate
+        result[item.column] = item.value
+    return result
+
+
+def conjuncts(where: Where) -> List[Predicate]:
+    """Возвращает члены цепочки AND (для словаря — равенства по столбцам)."""
+    if isinstance(where, dict):
+        return [Compare(col, '=', value) for col, value in where.items()]
+    if isinstance(where, And):
+        return list(where.items)
+    return [where]
+
+
+def compile_predicate(where: Where) -> Callable[[Dict], bool]:
+    """Компилирует условие в функцию проверки записи."""
+    if isinstance(where, dict):
+        items = list(where.items())
+
+        def match_dict(record: Dict) -> bool:
+            for col, value in items:
+                if col not in record or record[col] != value:
+                    return False
+            return True
+        return match_dict
+    if isinstance(where, Compare):
+        column, value, func = where.column, where.value, OPERATORS[where.op]
+
+        def match_compare(record: Dict) -> bool:
+            current = record.get(column)
+            if current is None:
+                return False
+            try:
+                return func(current, value)
+            except TypeError:
+                return False
+        return match_compare
+    if isinstance(where, Between):
+        column, low, high = where.column, where.low, where.high
+
+        def match_between(record: Dict) -> bool:
+            current = record.get(column)
+            if current is None:
+                return False
+            try:
+                return low <= current <= high
+            except TypeError:
+                return False
+        return match_between
+    checks = [compile_predicate(item) for item in where.items]
+    if isinstance(where, And):
+        return lambda record: all(check(record) for check in checks)
+    return lambda record: any(check(record) for check in checks)
+
+
+def matches(record: Dict, where: Where) -> bool:
+    """Проверяет, удовлетворяет ли запись условию."""
+    return compile_predicate(where)(record)
+
+
+def columns(where: Where) -> List[str]:
+    """Возвращает столбцы, упомянутые в условии."""
+    if isinstance(where, dict):
+        return list(where)
+    if isinstance(where, (Compare, Between)):
+        return [where.column]
+    result = []
+    for item in where.items:
+        result.extend(col for col in columns(item) if col not in result)
+    return result
+
+
+def rename(where: Where, mapping: Dict[str, str]) -> Where:
+    """Возвращает условие, в котором столбцы переименованы по mapping."""
+    if isinstance(where, dict):
+        return {mapping.get(col, col): value for col, value in where.items()}
+    if isinstance(where, Compare):
+        return Compare(mapping.get(where.column, where.column), where.op, where.value)
+    if isinstance(where, Between):
+        return Between(mapping.get(where.column, where.column), where.low, where.high)
+    items = tuple(rename(item, mapping) for item in where.items)
+    return And(items) if isinstance(where, And) else Or(items)
+
+
+def predicate_key(where: Optional[Where]):
+    """Возвращает хэшируемый ключ условия для кэша запросов."""
+    if isinstance(where, dict):
+        return tuple(sorted(where.items()))
+    return where
+
+
+def to_json(where: Where) -> Any:
+    """Переводит условие в JSON: словарь остается словарем, узлы — списками."""
+    if isinstance(where, dict):
+        return where
+    if isinstance(where, Compare):
+        return [where.op, where.column, where.value]
+    if isinstance(where, Between):
+        return ['between', where.column, where.low, where.high]
+    name = 'and' if isinstance(where, And) else 'or'
+    return [name] + [to_json(item) for item in where.items]
+
+
+def from_json(data: Any) -> Where:
+    """Восстанавливает условие из JSON (см. to_json)."""
+    if isinstance(data, dict):
+        return data
+    name = data[0]
+    if name == 'between':
+        return Between(data[1], data[2], data[3])
+    if name in ('and', 'or'):
+        items = tuple(from_json(item) for item in data[1:])
+        return And(items) if name == 'and' else Or(items)
+    return Compare(data[1], name, data[2])
@@ -0,0 +1,138 @@
+"""Построчная таблица с удалением через надгробия.
+
+Записи хранятся в списке в порядке ID, а рядом ведется bytearray признаков
+живых строк. delete не перестраивает список, а только сбрасывает признаки
+удаленных записей (позиция находится двоичным поиском по ID), поэтому
+удаление одной записи из большой таблицы стоит O(log n). Перебор
+пропускает удаленные записи.
+
+Место удаленных записей освобождает compact: живые записи копируются в
+новый список, который затем подменяет старый. Копирование идет без
+блокировки, поэтому compact можно выполнять в фоновом потоке: читатели
+продолжают перебирать прежний снимок, а вставки, сделанные во время
+копирования, переносятся в новый список.
+"""
+
+import threading
+from bisect import bisect_left
+from itertools import compress, islice
+from typing import Dict, Iterable, Iterator, List
+
+# Если удаляется больше 1/_SWEEP_FACTOR записей, позиции ищутся одним проходом
+_SWEEP_FACTOR = 16
+
+
+def _record_id(record: Dict) -> int:
+    return record.get('ID') or 0
+
+
+class RowTable:
+    """Список записей таблицы с надгробиями.
+
+    Поддерживает протокол списка записей (len, итерация, append,
+    обращение к последней записи), поэтому ее можно передавать в функции core.
+    """
+
+    def __init__(self, records: Iterable[Dict] = ()):
+        rows = list(records)
+        # Список записей и признаки живых строк подменяются вместе одним присваиванием.
+        self._state = (rows, bytearray(b'\x01') * len(rows))
+        self.tombstones = 0
+        self._deletes = 0
+        self._lock = threading.Lock()
+        # Упорядочены ли записи по ID (тогда id_range ищет границы двоичным поиском)
+        self.ordered = all(_record_id(a) < _record_id(b) for a, b in zip(rows, islice(rows, 1, None)))
+
+    def __len__(self) -> int:
+        return len(self._state[0]) - self.tombstones
+
+    def __iter__(self) -> Iterator[Dict]:
+        rows, alive = self._state
+        return compress(rows, alive)
+
+    def __getitem__(self, i: int) -> Dict:
+        if i != -1:
+            raise IndexError('Таблица поддерживает только обращение к последней записи.')
+        rows, alive = self._state
+        for position in range(len(rows) - 1, -1, -1):
+            if alive[position]:
+                return rows[position]
+        raise IndexError('Таблица пуста.')
+
+    @property
+    def tombstone_ratio(self) -> float:
+        """Доля удаленных записей среди всех хранимых."""
+        total = len(self._state[0])
+        return self.tombstones / total if total else 0.0
+
+    def append(self, record: Dict) -> None:
+        with self._lock:
+            rows, alive = self._state
+            if rows and _record_id(record) <= _record_id(rows[-1]):
+                self.ordered = False
+            rows.append(record)
+            alive.append(1)
+
+    def extend(self, records: Iterable[Dict]) -> None:
+        for record in records:
+            self.append(record)
+
+    def id_range(self, low: int, high: int) -> List[Dict]:
+        """Возвращает живые записи с low <= ID < high (записи должны быть упорядочены по ID)."""
+        rows, alive = self._state
+        start = bisect_left(rows, low, key=_record_id)
+        end = bisect_left(rows, high, lo=start, key=_record_id)
+        return list(compress(rows[start:end], alive[start:end]))
+
+    def _position(self, rows: List[Dict], record: Dict) -> int:
+        record_id = record.get('ID')
+        if record_id is not None:
+            position = bisect_left(rows, record_id, key=_record_id)
+            if position < len(rows) and rows[position] is record:
+                return position
+        # Записи без ID или не по порядку: ищем по идентичности объекта.
+        for position, row in enumerate(rows):
+            if row is record:
+                return position
+        return -1
+
+    def delete_records(self, records: Iterable[Dict]) -> int:
+        """Помечает записи удаленными и возвращает их число."""
+        records = list(records)
+        deleted = 0
+        with self._lock:
+            rows, alive = self._state
+            if len(records) * _SWEEP_FACTOR > len(rows):
+                # Удаляется заметная часть таблицы: один проход дешевле поиска каждой записи.
+                targets = {id(record) for record in records}
+                positions = (position for position, row in enumerate(rows) if id(row) in targets)
+            else:
+                positions = (self._position(rows, record) for record in records)
+            for position in positions:
+                if position >= 0 and alive[position]:
+                    alive[position] = 0
+                    deleted += 1
+            self.tombstones += deleted
+            self._deletes += 1
+        return deleted
+
+    def compact(self) -> int:
+        """Удаляет надгробия и возвращает число освобожденных записей.
+
+        Если во время копирования были удаления или другое сжатие, оно
+        отменяется (возвращается 0) и может быть выполнено позже.
+        """
+        with self._lock:
+            state = self._state
+            rows, alive = state
+            copied, deletes, tombstones = len(rows), self._deletes, self.tombstones
+        if not tombstones:
+            return 0
+        live = list(compress(rows[:copied], alive[:copied]))
+        with self._lock:
+            if self._state is not state or self._deletes != deletes:
+                return 0
+            live.extend(rows[copied:])
+            self._state = (live, bytearray(b'\x01') * len(live))
+            self.tombstones = 0
+        return tombstones
@@ -0,0 +1,75 @@
+"""Скомпилированные схемы таблиц."""
+
+from typing import Dict, List, Optional, Tuple
+
+from .constants import SYSTEM_META_KEY
+
+
+class TableSchema:
+    """Схема таблицы, разобранная один раз из строк вида "имя:тип".
+
+    Позволяет находить столбец по имени без учета регистра за O(1)
+    вместо повторного разбора описания таблицы в метаданных.
+    """
+
+    def __init__(self, table_name: str, column_defs: List[str]):
+        self.table_name = table_name
+        self.source = tuple(column_defs)
+        self.columns: List[Tuple[str, str]] = []
+        for col_def in column_defs:
+            name, col_type = col_def.split(':', 1)
+            self.columns.append((name.strip(), col_type.strip().lower()))
+        self.names = [name for name, _ in self.columns]
+        self._by_lower: Dict[str, Tuple[str, str]] = {name.lower(): (name, col_type) for name, col_type in self.columns}
+
+    def resolve(self, column: str) -> Optional[Tuple[str, str]]:
+        """Возвращает каноническое имя и тип столбца или None."""
+        return self._by_lower.get(column.lower())
+
+
+class JoinSchema:
+    """Схема результата соединения двух таблиц.
+
+    Столбцы называются "таблица.столбец". Имя без таблицы находится,
+    только если столбец с таким именем есть ровно в одной из таблиц.
+    """
+
+    def __init__(self, left: TableSchema, right: TableSchema):
+        self.tables = (left, right)
+        self.columns: List[Tuple[str, str]] = [
+            (f'{schema.table_name}.{name}', col_type) for schema in self.tables for name, col_type in schema.columns
+        ]
+        self.names = [name for name, _ in self.columns]
+
+    def resolve(self, column: str) -> Optional[Tuple[str, str]]:
+        """Возвращает полное имя ("таблица.столбец") и тип столбца или None."""
+        table, dot, name = column.partition('.')
+        if dot:
+            schemas = [schema for schema in self.tables if schema.table_name == table]
+        else:
+            schemas, name = self.tables, column
+        found = [(schema.table_name, schema.resolve(name)) for schema in schemas]
+        found = [(table_name, resolved) for table_name, resolved in found if resolved is not None]
+        if len(found) != 1:
+            return None
+        table_name, (name, col_type) = found[0]
+        return f'{table_name}.{name}', col_type
+
+
+_schemas: Dict[str, TableSchema] = {}
+
+
+def get_schema(metadata: dict, table_name: str) -> Optional[TableSchema]:
+    """Возвращает скомпилированную схему таблицы из кэша.
+
+    Схема компилируется заново, только если описание таблицы в
+    метаданных изменилось.
+    """
+    if table_name == SYSTEM_META_KEY or table_name not in metadata:
+        return None
+    column_defs = metadata[table_name]
+    schema = _schemas.get(table_name)
+    if schema is None or schema.source != tuple(column_defs):
+        schema = TableSchema(table_name, column_defs)
+        _schemas[table_name] = schema
+    return schema
@@ -0,0 +1,352 @@
+"""Сжатые блоки записей и таблицы из сжатых сегментов.
+
+Блок — упорядоченные по ID записи с общим списком столбцов: имена
+столбцов записываются один раз, а строки — списками значений
+(encode_block). Закодированный блок сжимается кодеком BLOCK_CODEC
+('zlib', 'lzma' или 'none'). Блоками хранятся страницы построчных таблиц
+(см. pages) и таблицы формата compressed.
+
+Таблица формата compressed состоит из каталога блоков
+data/<имя_таблицы>.seg.json и файлов блоков
+data/<имя_таблицы>.seg<k>.<версия>.<кодек>: блок k содержит ID от
+k*SEGMENT_BLOCK_ROWS до (k+1)*SEGMENT_BLOCK_ROWS-1. Каталог хранит для
+каждого блока имя файла, число строк, границы ID и зону — минимум,
+максимум и число None каждого столбца (см. zonemap), поэтому открытие
+таблицы читает только каталог, а просмотр распаковывает лишь блоки,
+которые по ID и зонам могут содержать подходящие записи, и держит последние
+SEGMENT_CACHE_BLOCKS распакованных блоков в памяти. Изменения копятся в
+распакованных блоках до flush, который пишет только измененные блоки под
+новой версией, атомарно подменяет каталог и удаляет замененные файлы.
+"""
+
+import json
+import lzma
+import os
+import re
+import threading
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .constants import BLOCK_CODEC, DATA_DIR, SEGMENT_BLOCK_ROWS, SEGMENT_CACHE_BLOCKS, SEGMENT_SUFFIX
+from .metrics import registry
+from .predicates import Between, Compare, Where, compile_predicate, conjuncts
+from .zonemap import may_match, summarize
+
+# Кодек: функции сжатия и распаковки байтов
+CODECS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    'none': (bytes, bytes),
+    'zlib': (zlib.compress, zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+
+def encode_block(records: List[Dict], codec: str = BLOCK_CODEC) -> bytes:
+    """Кодирует записи в сжатый блок.
+
+    Если у записей разный набор столбцов, они пишутся словарями как есть.
+    """
+    columns = list(records[0]) if records else []
+    if all(list(record) == columns for record in records):
+        payload = {'columns': columns, 'rows': [list(record.values()) for record in records]}
+    else:
+        payload = {'records': records}
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return CODECS[codec][0](data)
+
+
+def decode_block(data: bytes, codec: str) -> List[Dict]:
+    """Распаковывает блок в список записей."""
+    payload = json.loads(CODECS[codec][1](data))
+    registry.inc('blocks_decompressed')
+    if 'records' in payload:
+        return payload['records']
+    columns = payload['columns']
+    return [dict(zip(columns, row)) for row in payload['rows']]
+
+
+def write_block(filepath: str, records: List[Dict], codec: str = BLOCK_CODEC) -> None:
+    """Записывает блок в новый файл и сбрасывает его на диск."""
+    with open(filepath, 'wb') as f:
+        f.write(encode_block(records, codec))
+        f.flush()
+        os.fsync(f.fileno())
+        registry.inc('bytes_written', os.fstat(f.fileno()).st_size)
+
+
+def read_block(filepath: str, codec: str) -> List[Dict]:
+    """Читает и распаковывает файл блока."""
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    registry.inc('bytes_read', len(data))
+    return decode_block(data, codec)
+
+
+def get_directory_path(table_name: str) -> str:
+    """Возвращает путь к каталогу блоков таблицы."""
+    return f'{DATA_DIR}{table_name}{SEGMENT_SUFFIX}.json'
+
+
+def list_segment_files(table_name: str) -> List[str]:
+    """Находит каталог и все файлы блоков таблицы, в том числе оставшиеся после сбоя."""
+    pattern = re.compile(re.escape(f'{table_name}{SEGMENT_SUFFIX}') + r'(\d+\.\d+\.\w+|\.json)')
+    try:
+        names = os.listdir(DATA_DIR)
+    except FileNotFoundError:
+        return []
+    return [f'{DATA_DIR}{name}' for name in names if pattern.fullmatch(name)]
+
+
+def remove_segments(table_name: str) -> None:
+    """Удаляет каталог и файлы блоков таблицы."""
+    for filepath in list_segment_files(table_name):
+        os.remove(filepath)
+
+
+def _record_id(record: Dict) -> int:
+    return record.get('ID') or 0
+
+
+class SegmentTable:
+    """Таблица из сжатых блоков с ленивой распаковкой.
+
+    Поддерживает протокол списка записей (len, итерация в порядке ID,
+    append, обращение к последней записи), поэтому ее можно передавать в
+    функции core. Изменения копятся в памяти до flush, который
+    переписывает только измененные блоки.
+    """
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.path = get_directory_path(table_name)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            registry.inc('bytes_read', os.fstat(f.fileno()).st_size)
+            directory = json.load(f)
+        self.version = directory['version']
+        self.codec = directory['codec']
+        self.block_rows = directory['block_rows']
+        self.blocks: Dict[int, Dict[str, Any]] = {entry['key']: entry for entry in directory['blocks']}
+        # Распакованные чистые блоки (вытесняются по давности) и измененные блоки до flush
+        self._cache: 'OrderedDict[int, List[Dict]]' = OrderedDict()
+        # Кэш блоков пополняют и параллельные чтения сервера
+        self._cache_lock = threading.Lock()
+        self._pinned: Dict[int, List[Dict]] = {}
+        self.dirty: Set[int] = set()
+
+    @classmethod
+    def create(cls, table_name: str, records: List[Dict], codec: str = BLOCK_CODEC,
+               block_rows: int = SEGMENT_BLOCK_ROWS) -> 'SegmentTable':
+        """Раскладывает записи по блокам и записывает каталог и файлы блоков."""
+        remove_segments(table_name)
+        os.makedirs(DATA_DIR, exist_ok=True)
+        _write_directory(get_directory_path(table_name),
+                         {'version': 0, 'codec': codec, 'block_rows': block_rows, 'blocks': []})
+        table = cls(table_name)
+        for record in sorted(records, key=_record_id):
+            table.append(record)
+        table.flush()
+        return table
+
+    def key(self, record_id: int) -> int:
+        """Возвращает номер блока для ID."""
+        return (record_id or 0) // self.block_rows
+
+    def _block(self, key: int) -> List[Dict]:
+        """Возвращает записи блока, распаковывая его при первом обращении."""
+        block = self._pinned.get(key)
+        if block is not None:
+            return block
+        with self._cache_lock:
+            block = self._cache.get(key)
+            if block is not None:
+                self._cache.move_to_end(key)
+                return block
+        entry = self.blocks[key]
+        block = read_block(f'{DATA_DIR}{entry["file"]}', self.codec)
+        with self._cache_lock:
+            self._cache[key] = block
+            while len(self._cache) > SEGMENT_CACHE_BLOCKS:
+                self._cache.popitem(last=False)
+        return block
+
+    def _modify(self, key: int) -> List[Dict]:
+        """Возвращает записи блока для изменения и отмечает блок измененным."""
+        if key not in self.blocks:
+            self.blocks[key] = {'key': key, 'file': None, 'rows': 0}
+            self._pinned[key] = []
+        elif key not in self._pinned:
+            self._pinned[key] = self._block(key)
+            self._cache.pop(key, None)
+        self.dirty.add(key)
+        return self._pinned[key]
+
+    def block_len(self, key: int) -> int:
+        """Возвращает число записей блока, не распаковывая его."""
+        return len(self._pinned[key]) if key in self._pinned else self.blocks[key]['rows']
+
+    def __len__(self) -> int:
+        return sum(self.block_len(key) for key in self.blocks)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for key in sorted(self.blocks):
+            yield from self._block(key)
+
+    def __getitem__(self, i: int) -> Dict:
+        if i != -1:
+            raise IndexError('Сжатая таблица поддерживает только обращение к последней записи.')
+        for key in sorted(self.blocks, reverse=True):
+            block = self._block(key)
+            if block:
+                return block[-1]
+        raise IndexError('Таблица пуста.')
+
+    def get(self, record_id: int) -> Optional[Dict]:
+        """Читает одну запись по ID, распаковывая только ее блок."""
+        key = self.key(record_id)
+        if key not in self.blocks:
+            return None
+        block = self._block(key)
+        position = bisect_left(block, record_id, key=_record_id)
+        if position < len(block) and block[position].get('ID') == record_id:
+            return block[position]
+        return None
+
+    def candidate_keys(self, where_clause: Optional[Where]) -> List[int]:
+        """Оставляет блоки, которые могут содержать записи, по ограничениям на ID в цепочке AND и по зонам."""
+        keys = sorted(self.blocks)
+        if where_clause is None:
+            return keys
+        low = high = None
+        for item in conjuncts(where_clause):
+            if isinstance(item, Between) and item.column == 'ID':
+                bounds = ((item.low, '>='), (item.high, '<='))
+            elif isinstance(item, Compare) and item.column == 'ID' and item.op != '!=':
+                bounds = ((item.value, '>='), (item.value, '<=')) if item.op == '=' else ((item.value, item.op),)
+            else:
+                continue
+            for value, op in bounds:
+                if isinstance(value, bool) or not isinstance(value, int):
+                    return []
+                if op in ('>', '>='):
+                    value = value + 1 if op == '>' else value
+                    low = value if low is None else max(low, value)
+                else:
+                    value = value - 1 if op == '<' else value
+                    high = value if high is None else min(high, value)
+        first = self.key(low) if low is not None else None
+        last = self.key(high) if high is not None else None
+        keys = [key for key in keys if (first is None or key >= first) and (last is None or key <= last)]
+        # Зона измененного блока устарела до flush, такой блок просматривается всегда.
+        return [key for key in keys if key in self._pinned or 'zones' not in self.blocks[key]
+                or may_match(self.blocks[key]['zones'], where_clause)]
+
+    def _matches(self, where_clause: Optional[Where]) -> Iterator[Tuple[int, List[int]]]:
+        """Перебирает блоки-кандидаты и номера подходящих строк в них."""
+        check = compile_predicate(where_clause) if where_clause is not None else None
+        record_id = where_clause.get('ID') if isinstance(where_clause, dict) else None
+        if isinstance(record_id, int) and not isinstance(record_id, bool):
+            # Равенство по ID: запись находится двоичным поиском в одном блоке.
+            key = self.key(record_id)
+            if key in self.blocks:
+                block = self._block(key)
+                position = bisect_left(block, record_id, key=_record_id)
+                registry.inc('rows_scanned', 1)
+                if position < len(block) and check(block[position]):
+                    yield key, [position]
+            return
+        keys = self.candidate_keys(where_clause)
+        registry.inc('blocks_skipped', len(self.blocks) - len(keys))
+        for key in keys:
+            block = self._block(key)
+            registry.inc('rows_scanned', len(block))
+            positions = [i for i, record in enumerate(block) if check is None or check(record)]
+            if positions:
+                yield key, positions
+
+    def select(self, where_clause: Optional[Where] = None) -> List[Dict]:
+        """Возвращает записи, удовлетворяющие условию, в порядке ID."""
+        return list(self.iter_select(where_clause))
+
+    def iter_select(self, where_clause: Optional[Where] = None) -> Iterator[Dict]:
+        """Лениво возвращает записи по условию, распаковывая блоки по мере перебора."""
+        for key, positions in self._matches(where_clause):
+            block = self._block(key)
+            for i in positions:
+                yield block[i]
+
+    def update(self, set_clause: Dict[str, Any], where_clause: Where) -> List[int]:
+        """Изменяет подходящие записи, отмечает их блоки измененными и возвращает ID записей."""
+        updated = []
+        for key, positions in list(self._matches(where_clause)):
+            block = self._modify(key)
+            for i in positions:
+                record = block[i]
+                record.update((col, value) for col, value in set_clause.items() if col in record)
+                updated.append(record['ID'])
+        return updated
+
+    def delete(self, where_clause: Where) -> List[int]:
+        """Удаляет подходящие записи, отмечает их блоки измененными и возвращает ID записей."""
+        deleted = []
+        for key, positions in list(self._matches(where_clause)):
+            block = self._modify(key)
+            deleted.extend(block[i]['ID'] for i in positions)
+            dropped = set(positions)
+            self._pinned[key] = [record for i, record in enumerate(block) if i not in dropped]
+        return deleted
+
+    def append(self, record: Dict) -> None:
+        """Добавляет запись в ее блок (ID должен быть больше существующих)."""
+        self._modify(self.key(record['ID'])).append(record)
+
+    def flush(self) -> None:
+        """Записывает измененные блоки и каталог; опустевшие блоки удаляются."""
+        if not self.dirty:
+            return
+        version = self.version + 1
+        replaced = []
+        for key in sorted(self.dirty):
+            block = self._pinned.pop(key)
+            entry = self.blocks[key]
+            if entry['file'] is not None:
+                replaced.append(entry['file'])
+            if not block:
+                del self.blocks[key]
+                continue
+            entry['file'] = f'{self.table_name}{SEGMENT_SUFFIX}{key}.{version}.{self.codec}'
+            write_block(f'{DATA_DIR}{entry["file"]}', block, self.codec)
+            entry['rows'] = len(block)
+            entry['min_id'] = _record_id(block[0])
+            entry['max_id'] = _record_id(block[-1])
+            entry['zones'] = summarize(block)
+            self._cache[key] = block
+        registry.inc('blocks_written', len(self.dirty))
+        _write_directory(self.path, {
+            'version': version, 'codec': self.codec, 'block_rows': self.block_rows,
+            'blocks': [self.blocks[key] for key in sorted(self.blocks)],
+        })
+        self.version = version
+        self.dirty.clear()
+        while len(self._cache) > SEGMENT_CACHE_BLOCKS:
+            self._cache.popitem(last=False)
+        for name in replaced:
+            try:
+                os.remove(f'{DATA_DIR}{name}')
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        """Освобождает распакованные блоки."""
+        self._cache.clear()
+
+
+def _write_directory(filepath: str, directory: Dict) -> None:
+    """Записывает каталог блоков во временный файл и атомарно подменяет им прежний."""
+    tmp_path = f'{filepath}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(directory, ensure_ascii=False, separators=(',', ':')))
+        f.flush()
+        os.fsync(f.fileno())
+        registry.inc('bytes_written', os.fstat(f.fileno()).st_size)
+    os.replace(tmp_path, filepath)
@@ -0,0 +1,198 @@
+"""Сетевой режим: asyncio-сервер с общим движком для многих клиентов.
+
+Клиент отправляет команды того же языка, что и в интерактивном режиме, по
+одной в строке. Ответ — вывод команды в виде кадра: длина текста в байтах
+отдельной строкой, затем сам текст (см. read_frame и write_frame).
+
+Все соединения работают с одним пулом буферов (BufferPool), поэтому
+метаданные, таблицы, индексы и кэши разбираются один раз и общие для всех
+клиентов. Цикл событий только принимает команды и отправляет ответы, а
+сами команды выполняются в потоках:
+
+- чтения — в пуле из SERVER_READ_WORKERS потоков, каждый со своим
+  сеансом чтения поверх общего пула, одновременно друг с другом;
+- команды, изменяющие данные, — в очереди единственного писателя.
+  Писатель забирает из очереди все накопившиеся команды, выполняет их
+  одной неявной группой в своем потоке и фиксирует ее одной записью на
+  диск, и только после этого клиенты получают ответы.
+
+Чтения и группа писателя разделены блокировкой ReadWriteLock: чтение
+видит все изменения, подтвержденные до него, и никогда не видит группу
+наполовину. Долгий select не задерживает прием команд и другие чтения.
+"""
+
+import asyncio
+import contextlib
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from .constants import SERVER_HOST, SERVER_PORT, SERVER_READ_WORKERS, SERVER_WRITE_BATCH
+from .engine import Session, capture_output
+from .locking import ReadWriteLock
+from .metrics import registry
+from .parser import (
+    ParseError, parse_statement, executed_statement, Aggregate, Begin, Commit, Exit, Explain, Help, Info, Join, ListTables,
+    Output, Rollback, Select, Stats
+)
+
+# Команды, которые не изменяют данные и выполняются без очереди писателя
+_READS = (Select, Join, Aggregate, Info, ListTables, Help, Explain)
+# Явные транзакции принадлежат одному клиенту и в общем сеансе недоступны
+_UNSUPPORTED = (Begin, Commit, Rollback)
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[str]:
+    """Читает кадр ответа; None, если соединение закрыто."""
+    header = await reader.readline()
+    if not header:
+        return None
+    return (await reader.readexactly(int(header))).decode('utf-8')
+
+
+def write_frame(writer: asyncio.StreamWriter, text: str) -> None:
+    """Записывает кадр ответа: длина в байтах и текст."""
+    data = text.encode('utf-8')
+    writer.write(f'{len(data)}\n'.encode('ascii') + data)
+
+
+def _capture(func: Callable, *args) -> str:
+    """Выполняет функцию и возвращает все, что она напечатала в текущем потоке."""
+    with capture_output() as buffer:
+        try:
+            func(*args)
+        except Exception as e:
+            print(f'Произошла непредвиденная ошибка: {e}')
+    return buffer.getvalue()
+
+
+class Server:
+    """Сервер команд поверх одного общего пула буферов."""
+
+    def __init__(self, session: Optional[Session] = None, write_batch: int = SERVER_WRITE_BATCH,
+                 backend: Optional[str] = None, read_workers: int = SERVER_READ_WORKERS):
+        # Группа фиксируется писателем после каждой пачки, порог Session лишь ограничивает ее размер.
+        self.session = session or Session(group_commit=write_batch, backend=backend)
+        self.write_batch = write_batch
+        self.writes: 'asyncio.Queue[Tuple[str, str, asyncio.Future]]' = asyncio.Queue()
+        self.connections = 0
+        self.lock = ReadWriteLock()
+        self.readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='db-read')
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-write')
+        self._local = threading.local()
+        registry.add_collector('server', self.stats)
+
+    def stats(self) -> dict:
+        """Возвращает счетчики сервера для снимка метрик."""
+        return {'connections': self.connections, 'queued_writes': self.writes.qsize()}
+
+    def _classify(self, text: str):
+        """Разбирает команду, чтобы выбрать путь выполнения (None — пустая или с ошибкой)."""
+        try:
+            return parse_statement(text, self.session.pool.get_metadata())
+        except ParseError:
+            return None
+
+    def _reader(self) -> Session:
+        """Возвращает сеанс чтения потока: общий пул, свой формат вывода и замер команды."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = Session(pool=self.session.pool, auto_flush=False)
+        return session
+
+    def _read(self, text: str, mode: str) -> Tuple[str, str]:
+        """Выполняет чтение в потоке чтений; возвращает вывод и формат вывода соединения."""
+        session = self._reader()
+        session.output_mode = mode
+        with self.lock.read():
+            output = _capture(session.execute, text)
+        return output, session.output_mode
+
+    def _write(self, batch: List[Tuple[str, str, asyncio.Future]]) -> List[str]:
+        """Выполняет пачку изменений одной группой в потоке писателя; чтения в это время ждут."""
+        outputs = []
+        with self.lock.write():
+            for text, mode, _ in batch:
+                self.session.output_mode = mode
+                outputs.append(_capture(self.session.execute, text))
+            commit_output = _capture(self.session.commit_group)
+        return [output + commit_output for output in outputs]
+
+    async def _writer(self) -> None:
+        """Единственный писатель: выполняет накопленные изменения и фиксирует их вместе."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.writes.get()]
+            while len(batch) < self.write_batch and not self.writes.empty():
+                batch.append(self.writes.get_nowait())
+            outputs = await loop.run_in_executor(self.writer, self._write, batch)
+            registry.observe('write_batch_size', len(batch))
+            for (_, _, future), output in zip(batch, outputs):
+                if not future.cancelled():
+                    future.set_result(output)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Обслуживает одно соединение: команда за командой до exit или разрыва."""
+        self.connections += 1
+        mode = 'table'
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                text = line.decode('utf-8').strip()
+                statement = self._classify(text)
+                if isinstance(statement, Exit):
+                    break
+                if isinstance(statement, _UNSUPPORTED):
+                    output = 'Ошибка: Транзакции недоступны в сетевом режиме.\n'
+                elif statement is None or isinstance(executed_statement(statement), _READS + (Output,)) or (
+                        isinstance(statement, Stats) and statement.action == 'show'):
+                    output, mode = await loop.run_in_executor(self.readers, self._read, text, mode)
+                else:
+                    future = loop.create_future()
+                    await self.writes.put((text, mode, future))
+                    output = await future
+                write_frame(writer, output)
+                await writer.drain()
+        except (ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def serve(self, host: str = SERVER_HOST, port: int = SERVER_PORT,
+                    ready: Optional[asyncio.Event] = None) -> None:
+        """Принимает соединения, пока задача не будет отменена (в том числе по SIGTERM).
+
+        При остановке сохраняет таблицы.
+        """
+        with contextlib.suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        writer_task = asyncio.create_task(self._writer())
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f'Сервер запущен на {host}:{port}.')
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            writer_task.cancel()
+            self.readers.shutdown()
+            self.writer.shutdown()
+            self.session.close()
+            print('Сервер остановлен.')
+
+
+def serve(host: str = SERVER_HOST, port: int = SERVER_PORT, backend: Optional[str] = None) -> None:
+    """Запускает сервер до прерывания (Ctrl+C или SIGTERM)."""
+    async def main():
+        await Server(backend=backend).serve(host, port)
+
+    with contextlib.suppress(KeyboardInterrupt, asyncio.CancelledError):
+        asyncio.run(main())
@@ -0,0 +1,181 @@
+"""Таблицы во встроенной базе sqlite3.
+
+Каждая таблица базы хранится отдельной SQL-таблицей в одном файле
+(SQLITE_FILE в DATA_DIR), столбец ID служит первичным ключом. Условия
+where переводятся в SQL, поэтому выборка, изменение и удаление по ID или
+по проиндексированному столбцу читают и пишут только нужные строки, а не
+всю таблицу. create_index создает обычный индекс SQLite.
+
+Файл открывается в режиме журнала WAL: читатели других процессов не
+ждут писателя. Изменения копятся в транзакции соединения до commit.
+"""
+
+import sqlite3
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .metrics import registry
+from .predicates import And, Between, Compare, Or, Where
+
+_SQL_TYPES = {'int': 'INTEGER', 'str': 'TEXT', 'bool': 'INTEGER'}
+
+
+def quote(name: str) -> str:
+    """Экранирует имя таблицы или столбца для SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Открывает файл базы sqlite3 в режиме журнала WAL.
+
+    Соединение общее для потоков сервера (чтения и писатель); одновременно
+    его использует либо один писатель, либо только чтения.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
+
+
+def compile_sql(where: Optional[Where]) -> Tuple[str, List[Any]]:
+    """Переводит условие where в выражение SQL с параметрами."""
+    if where is None:
+        return '1', []
+    if isinstance(where, dict):
+        if not where:
+            return '1', []
+        return ' AND '.join(f'{quote(col)} = ?' for col in where), list(where.values())
+    if isinstance(where, Compare):
+        return f'{quote(where.column)} {where.op} ?', [where.value]
+    if isinstance(where, Between):
+        return f'{quote(where.column)} BETWEEN ? AND ?', [where.low, where.high]
+    if isinstance(where, (And, Or)):
+        parts, params = [], []
+        for item in where.items:
+            sql, item_params = compile_sql(item)
+            parts.append(f'({sql})')
+            params.extend(item_params)
+        return (' AND ' if isinstance(where, And) else ' OR ').join(parts), params
+    raise TypeError(f'Неподдерживаемое условие: {where!r}')
+
+
+class SqliteTable:
+    """Таблица в файле sqlite3.
+
+    Поддерживает протокол списка записей (len, итерация, append,
+    обращение к последней записи) и методы select/update/delete движков
+    хранения, поэтому ее можно передавать в функции core.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, table_name: str, schema: List[Tuple[str, str]]):
+        self.conn = conn
+        self.table_name = table_name
+        self.schema = schema
+        self._table = quote(table_name)
+        self._columns = ', '.join(quote(name) for name, _ in schema)
+        self._bool_columns = [i for i, (_, col_type) in enumerate(schema) if col_type == 'bool']
+        definitions = ', '.join(
+            f'{quote(name)} {"INTEGER PRIMARY KEY" if name == "ID" else _SQL_TYPES.get(col_type, "TEXT")}'
+            for name, col_type in schema
+        )
+        conn.execute(f'CREATE TABLE IF NOT EXISTS {self._table} ({definitions})')
+
+    @classmethod
+    def create(cls, conn: sqlite3.Connection, table_name: str, schema: List[Tuple[str, str]],
+               records) -> 'SqliteTable':
+        """Создает таблицу заново и записывает в нее записи."""
+        conn.execute(f'DROP TABLE IF EXISTS {quote(table_name)}')
+        table = cls(conn, table_name, schema)
+        table.extend(records)
+        return table
+
+    def _decode(self, values: tuple) -> Dict:
+        record = dict(zip((name for name, _ in self.schema), values))
+        for i in self._bool_columns:
+            name = self.schema[i][0]
+            if record[name] is not None:
+                record[name] = bool(record[name])
+        return record
+
+    def _query(self, where: Optional[Where], suffix: str = '') -> Iterator[Dict]:
+        condition, params = compile_sql(where)
+        cursor = self.conn.execute(
+            f'SELECT {self._columns} FROM {self._table} WHERE {condition} ORDER BY "ID"{suffix}', params
+        )
+        returned = 0
+        try:
+            for values in cursor:
+                returned += 1
+                yield self._decode(values)
+        finally:
+            registry.inc('rows_scanned', returned)
+
+    def __len__(self) -> int:
+        return self.conn.execute(f'SELECT COUNT(*) FROM {self._table}').fetchone()[0]
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self._query(None)
+
+    def __getitem__(self, i: int) -> Dict:
+        if i != -1:
+            raise IndexError('Таблица SQLite поддерживает только обращение к последней записи.')
+        for record in self._query(None, ' DESC LIMIT 1'):
+            return record
+        raise IndexError('Таблица пуста.')
+
+    def get(self, record_id: int) -> Optional[Dict]:
+        """Читает одну запись по ID."""
+        for record in self._query({'ID': record_id}):
+            return record
+        return None
+
+    def select(self, where_clause: Optional[Where] = None) -> List[Dict]:
+        return list(self._query(where_clause))
+
+    def iter_select(self, where_clause: Optional[Where] = None) -> Iterator[Dict]:
+        return self._query(where_clause)
+
+    def query_plan(self, where_clause: Optional[Where]) -> str:
+        """Возвращает план SQLite для выборки по условию (EXPLAIN QUERY PLAN)."""
+        condition, params = compile_sql(where_clause)
+        cursor = self.conn.execute(
+            f'EXPLAIN QUERY PLAN SELECT {self._columns} FROM {self._table} WHERE {condition} ORDER BY "ID"', params
+        )
+        return '; '.join(row[-1] for row in cursor)
+
+    def append(self, record: Dict) -> None:
+        self.extend([record])
+
+    def extend(self, records) -> None:
+        placeholders = ', '.join('?' for _ in self.schema)
+        self.conn.executemany(
+            f'INSERT INTO {self._table} ({self._columns}) VALUES ({placeholders})',
+            ([record.get(name) for name, _ in self.schema] for record in records)
+        )
+
+    def update(self, set_clause: Dict[str, Any], where_clause: Where) -> List[int]:
+        """Изменяет подходящие записи одним UPDATE и возвращает их ID."""
+        assignments = ', '.join(f'{quote(col)} = ?' for col in set_clause)
+        condition, params = compile_sql(where_clause)
+        cursor = self.conn.execute(f'UPDATE {self._table} SET {assignments} WHERE {condition} RETURNING "ID"',
+                                   [*set_clause.values(), *params])
+        return sorted(record_id for record_id, in cursor)
+
+    def delete(self, where_clause: Where) -> List[int]:
+        """Удаляет подходящие записи одним DELETE и возвращает их ID."""
+        condition, params = compile_sql(where_clause)
+        cursor = self.conn.execute(f'DELETE FROM {self._table} WHERE {condition} RETURNING "ID"', params)
+        return sorted(record_id for record_id, in cursor)
+
+    def create_index(self, column: str) -> None:
+        """Создает индекс SQLite по столбцу."""
+        index_name = quote(f'{self.table_name}__{column}')
+        self.conn.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {self._table} ({quote(column)})')
+        self.conn.commit()
+
+    def commit(self) -> None:
+        """Фиксирует изменения транзакции соединения."""
+        self.conn.commit()
+
+    def close(self) -> None:
+        """Отменяет незафиксированные изменения (таблица выбрасывается из пула)."""
+        if self.conn.in_transaction:
+            self.conn.rollback()
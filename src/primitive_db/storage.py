@@ -0,0 +1,218 @@
+"""Хранилища таблиц (storage backends).
+
+Хранилище определяет, где и как лежат данные таблиц. Буферный пул и
+движок обращаются к данным только через его методы: open открывает
+таблицу, commit фиксирует изменения, checkpoint сохраняет таблицу
+целиком, create/remove/drop создают и удаляют данные таблицы. Открытая
+таблица поддерживает протокол, с которым работают функции core: перебор
+записей, get по ID, append, а также select/update/delete у собственных
+таблиц хранилища (core._NATIVE_TABLES).
+
+Хранилище выбирается для всей базы при ее создании и записывается в
+метаданные (см. core.get_storage_backend):
+
+- json — файлы в DATA_DIR: базовый JSON-файл и журнал изменений, либо
+  форматы binary, partitioned, compressed и columnar, выбранные командой
+  convert_table;
+- sqlite — один файл sqlite3 (SQLITE_FILE), см. sqlite_store.
+"""
+
+import os
+from typing import Dict, List, Optional, Tuple, Type
+
+from . import wal
+from .binfmt import BinaryTable, get_paths as get_binary_paths
+from .cache import query_cache
+from .constants import DATA_DIR, INDEX_SUFFIX, SQLITE_FILE, STORAGE_FORMATS
+from .core import get_table_format, get_table_partitioning, get_table_schema
+from .indexes import TableIndexes
+from .partitions import PartitionedTable, list_partitions
+from .rowtable import RowTable
+from .segments import SegmentTable, get_directory_path
+from .sqlite_store import SqliteTable, connect, quote
+from .utils import (
+    checkpoint_table, load_columnar_data, load_table_data, load_table_indexes, log_table_changes, remove_table_data,
+    remove_table_storage, save_table_indexes, write_table_storage
+)
+
+
+def file_signature(filepath: str) -> Optional[Tuple[int, int, int]]:
+    """Возвращает подпись файла: inode, время изменения и размер (None, если файла нет)."""
+    # Номер inode меняется при атомарной подмене файла, даже если время и размер совпали.
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class StorageBackend:
+    """Интерфейс хранилища таблиц."""
+
+    name = ''
+    # Форматы хранения, между которыми переводит convert_table
+    formats = frozenset()
+
+    def open(self, metadata: dict, table_name: str) -> Tuple[object, Optional[TableIndexes]]:
+        """Открывает таблицу: возвращает ее данные и индексы (None, если хранилище индексирует само)."""
+        raise NotImplementedError
+
+    def signature(self, table_name: str) -> tuple:
+        """Возвращает подпись таблицы; она меняется, когда таблицу изменил другой процесс."""
+        raise NotImplementedError
+
+    def commit(self, table_name: str, entries: List[dict], table_data) -> None:
+        """Делает изменения таблицы (записи журнала entries) долговечными."""
+        raise NotImplementedError
+
+    def has_pending(self, table_name: str, table_data) -> bool:
+        """Проверяет, есть ли у таблицы изменения, которые checkpoint еще должен свернуть."""
+        return False
+
+    def checkpoint(self, table_name: str, table_data) -> None:
+        """Сохраняет таблицу целиком."""
+
+    def create(self, table_name: str, schema: list, records: list, storage_format: str,
+               partitioning: Optional[Tuple[str, int]] = None) -> None:
+        """Записывает данные таблицы в заданном формате хранения."""
+        raise NotImplementedError
+
+    def remove(self, table_name: str, storage_format: str) -> None:
+        """Удаляет данные таблицы в заданном формате (после перевода в другой формат)."""
+
+    def drop(self, table_name: str) -> None:
+        """Удаляет все данные таблицы."""
+        raise NotImplementedError
+
+    def save_indexes(self, table_name: str, table_indexes: TableIndexes) -> None:
+        """Сохраняет описание индексов таблицы."""
+
+    def close(self, table_data) -> None:
+        """Освобождает ресурсы таблицы, выбрасываемой из пула."""
+
+    def shutdown(self) -> None:
+        """Закрывает хранилище в конце сеанса."""
+
+
+class JsonBackend(StorageBackend):
+    """Файлы в DATA_DIR: страницы с журналом изменений, binary, partitioned, compressed или columnar."""
+
+    name = 'json'
+    formats = frozenset(STORAGE_FORMATS)
+
+    def open(self, metadata: dict, table_name: str):
+        storage_format = get_table_format(metadata, table_name)
+        if storage_format == 'binary':
+            return BinaryTable(table_name, get_table_schema(metadata, table_name)), None
+        if storage_format == 'partitioned':
+            scheme, size = get_table_partitioning(metadata, table_name)
+            return PartitionedTable(table_name, scheme, size), None
+        if storage_format == 'compressed':
+            return SegmentTable(table_name), None
+        if storage_format == 'columnar':
+            return load_columnar_data(table_name, get_table_schema(metadata, table_name)), None
+        table_data = RowTable(load_table_data(table_name))
+        return table_data, load_table_indexes(table_name, table_data)
+
+    def signature(self, table_name: str) -> tuple:
+        return (
+            file_signature(f'{DATA_DIR}{table_name}.json'),
+            file_signature(wal.get_log_path(table_name)),
+            file_signature(f'{DATA_DIR}{table_name}{INDEX_SUFFIX}'),
+            *(file_signature(path) for path in get_binary_paths(table_name)),
+            *(file_signature(path) for paths in list_partitions(table_name).values() for path in paths),
+            file_signature(get_directory_path(table_name)),
+        )
+
+    def commit(self, table_name: str, entries: List[dict], table_data) -> None:
+        log_table_changes(table_name, entries, table_data)
+
+    def has_pending(self, table_name: str, table_data) -> bool:
+        if isinstance(table_data, PartitionedTable):
+            return table_data.has_pending()
+        return wal.has_entries(table_name)
+
+    def checkpoint(self, table_name: str, table_data) -> None:
+        checkpoint_table(table_name, table_data)
+
+    def create(self, table_name: str, schema: list, records: list, storage_format: str,
+               partitioning: Optional[Tuple[str, int]] = None) -> None:
+        if partitioning is None:
+            write_table_storage(table_name, schema, records, storage_format)
+        else:
+            write_table_storage(table_name, schema, records, storage_format, partitioning)
+
+    def remove(self, table_name: str, storage_format: str) -> None:
+        remove_table_storage(table_name, storage_format)
+
+    def drop(self, table_name: str) -> None:
+        remove_table_data(table_name)
+
+    def save_indexes(self, table_name: str, table_indexes: TableIndexes) -> None:
+        save_table_indexes(table_name, table_indexes)
+
+    def close(self, table_data) -> None:
+        if isinstance(table_data, (BinaryTable, SegmentTable)):
+            table_data.close()
+
+
+class SqliteBackend(StorageBackend):
+    """Все таблицы базы в одном файле sqlite3 с построчным доступом по индексам."""
+
+    name = 'sqlite'
+    formats = frozenset()
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or f'{DATA_DIR}{SQLITE_FILE}'
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = connect(self.path)
+        return self._conn
+
+    def open(self, metadata: dict, table_name: str):
+        return SqliteTable(self.conn, table_name, get_table_schema(metadata, table_name)), None
+
+    def signature(self, table_name: str) -> tuple:
+        # data_version меняется, только когда изменения фиксирует другое соединение.
+        return (self.conn.execute('PRAGMA data_version').fetchone()[0],)
+
+    def commit(self, table_name: str, entries: List[dict], table_data) -> None:
+        self.conn.commit()
+        query_cache.invalidate(table_name)
+
+    def create(self, table_name: str, schema: list, records: list, storage_format: str,
+               partitioning: Optional[Tuple[str, int]] = None) -> None:
+        SqliteTable.create(self.conn, table_name, schema, records)
+        self.conn.commit()
+
+    def drop(self, table_name: str) -> None:
+        self.conn.execute(f'DROP TABLE IF EXISTS {quote(table_name)}')
+        self.conn.commit()
+        query_cache.invalidate(table_name)
+
+    def close(self, table_data) -> None:
+        if isinstance(table_data, SqliteTable):
+            table_data.close()
+
+    def shutdown(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+BACKENDS: Dict[str, Type[StorageBackend]] = {
+    JsonBackend.name: JsonBackend,
+    SqliteBackend.name: SqliteBackend,
+}
+
+
+def open_backend(name: str) -> StorageBackend:
+    """Создает хранилище по имени."""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f'Неизвестное хранилище: {name}') from None
@@ -0,0 +1,66 @@
+"""Транзакции и групповая фиксация изменений.
+
+Внутри транзакции команды изменяют таблицы в буферном пуле как обычно,
+но записи журнала и метаданные не пишутся на диск, а накапливаются.
+COMMIT записывает журнал каждой таблицы одним вызовом (один fsync на
+таблицу) и один раз сохраняет метаданные; ROLLBACK выбрасывает измененные
+таблицы из пула, и они перечитываются с диска.
+"""
+
+from typing import Dict, List, Optional
+
+from .buffer_pool import BufferPool
+from .cache import query_cache
+
+
+class Transaction:
+    """Изменения, накопленные в памяти до фиксации.
+
+    explicit=False означает неявную группу пакетного режима: она
+    фиксируется автоматически каждые GROUP_COMMIT_SIZE команд.
+    """
+
+    def __init__(self, explicit: bool = True):
+        self.explicit = explicit
+        self.entries: Dict[str, List[dict]] = {}
+        self.tables: Dict[str, object] = {}
+        self.metadata: Optional[dict] = None
+        self.statements = 0
+
+    def log(self, table_name: str, entry: dict, table_data) -> None:
+        """Запоминает запись журнала; результаты запросов по таблице сбрасываются сразу."""
+        self.entries.setdefault(table_name, []).append(entry)
+        self.tables[table_name] = table_data
+        query_cache.invalidate(table_name)
+
+    def save_metadata(self, metadata: dict) -> None:
+        """Откладывает сохранение метаданных до фиксации."""
+        self.metadata = metadata
+
+    def commit(self, pool: BufferPool) -> int:
+        """Записывает накопленные изменения на диск. Возвращает число записей журнала."""
+        if self.metadata is not None:
+            pool.save_metadata(self.metadata)
+        written = 0
+        for table_name, entries in self.entries.items():
+            table_data = self.tables[table_name]
+            pool.backend.commit(table_name, entries, table_data)
+            pool.mark_dirty(table_name, table_data)
+            written += len(entries)
+        self._reset()
+        return written
+
+    def rollback(self, pool: BufferPool) -> None:
+        """Отменяет изменения: таблицы и метаданные будут перечитаны с диска."""
+        for table_name in self.tables:
+            pool.evict(table_name)
+            query_cache.invalidate(table_name)
+        if self.metadata is not None or self.tables:
+            pool.reload_metadata()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.entries = {}
+        self.tables = {}
+        self.metadata = None
+        self.statements = 0
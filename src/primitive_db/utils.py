@@ -1,41 +1,345 @@
 """Вспомогательные функции для работы с файлами"""
 
+import csv
 import json
+import os
+import re
+from functools import partial
+from itertools import islice
 from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Set, Tuple
 
-from .constants import DATA_DIR
+from . import wal
+from .cache import query_cache
+from .binfmt import BinaryTable, get_paths as get_binary_paths
+from .columnar import ColumnarTable
+from .constants import (
+    BLOCK_CODEC, DATA_DIR, INDEX_SUFFIX, IMPORT_BATCH_SIZE, PAGE_ROWS, PARTITION_RANGE_SIZE, SNAPSHOT_RETRIES
+)
+from .decorators import measure_phase
+from .indexes import TableIndexes
+from .metrics import registry
+from .pages import dirty_pages, iter_pages, remove_pages, remove_replaced, write_pages
+from .partitions import PartitionedTable, remove_partitions
+from .segments import SegmentTable, remove_segments
 
 
 def load_metadata(filepath: str) -> dict:
     """Загружает метаданные из JSON-файла."""
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
+            registry.inc('bytes_read', os.fstat(f.fileno()).st_size)
             return json.load(f)
     except FileNotFoundError:
         return {}
 
 
-def save_metadata(filepath: str, data: dict) -> None:
-    """Сохраняет метаданные в JSON-файл."""
+def _write_atomic(filepath: str, text: str, sync: bool = True) -> None:
+    """Записывает файл во временный рядом и атомарно подменяет им исходный.
+
+    Читатели видят либо старое, либо новое содержимое целиком. Имя
+    временного файла содержит PID, поэтому процессы не мешают друг другу.
+    """
     Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    tmp_path = f'{filepath}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        if sync:
+            os.fsync(f.fileno())
+        registry.inc('bytes_written', os.fstat(f.fileno()).st_size)
+    os.replace(tmp_path, filepath)
 
 
-def load_table_data(table_name: str) -> list:
-    """Загружает данные таблицы из JSON-файла."""
+@measure_phase('persist')
+def save_metadata(filepath: str, data: dict) -> None:
+    """Сохраняет метаданные в JSON-файл.
+
+    Файл записывается во временный и затем атомарно подменяется, чтобы
+    счетчики последовательностей не терялись при сбое во время записи.
+    """
+    _write_atomic(filepath, json.dumps(data, ensure_ascii=False, indent=2))
+
+
+_VERSION_RE = re.compile(rb'\{"version":(\d+),')
+_PAGED_RE = re.compile(rb'\{"version":\d+,"page_rows":(\d+),')
+
+
+def read_table_version(table_name: str) -> int:
+    """Возвращает версию базового файла таблицы по его началу, не читая данные."""
+    try:
+        with open(f'{DATA_DIR}{table_name}.json', 'rb') as f:
+            head = f.read(32)
+    except FileNotFoundError:
+        return 0
+    match = _VERSION_RE.match(head)
+    return int(match.group(1)) if match else 0
+
+
+def _read_manifest(table_name: str) -> Tuple[int, Optional[dict]]:
+    """Возвращает версию базового файла и его оглавление страниц.
+
+    Для базового файла без страниц (записи одним списком) оглавление None,
+    а сами записи не читаются.
+    """
     filepath = f'{DATA_DIR}{table_name}.json'
+    try:
+        with open(filepath, 'rb') as f:
+            head = f.read(64)
+            if _PAGED_RE.match(head) is None:
+                return read_table_version(table_name), None
+            f.seek(0)
+            registry.inc('bytes_read', os.fstat(f.fileno()).st_size)
+            data = json.load(f)
+    except FileNotFoundError:
+        return 0, None
+    return data['version'], data
+
+
+def _read_base(table_name: str) -> Tuple[int, Iterator[list]]:
+    """Читает базовый файл таблицы: версию и записи пачками (старый формат — список, версия 0).
+
+    Записи постраничного базового файла читаются из файлов страниц по мере
+    перебора пачек, по одной странице (см. pages).
+    """
+    try:
+        with open(f'{DATA_DIR}{table_name}.json', 'r', encoding='utf-8') as f:
+            registry.inc('bytes_read', os.fstat(f.fileno()).st_size)
+            data = json.load(f)
+    except FileNotFoundError:
+        return 0, iter([])
+    if isinstance(data, dict):
+        if 'pages' in data:
+            return data['version'], iter_pages(data['pages'], data.get('codec'))
+        return data['version'], iter([data['records']])
+    return 0, iter([data])
+
+
+def _load_snapshot(table_name: str, build: Callable, replay: Callable):
+    """Загружает согласованный снимок таблицы: базовый файл и журнал той же версии.
+
+    build строит таблицу из пачек записей базового файла, replay применяет
+    к ней записи журнала. Если между чтением базового файла и журнала
+    другой процесс выполнил контрольную точку, журнал окажется новее
+    базового файла (или файл страницы уже удален), и таблица перечитывается.
+    Журнал старше базового файла уже свернут в него.
+    """
+    for _ in range(SNAPSHOT_RETRIES):
+        try:
+            version, batches = _read_base(table_name)
+            data = build(batches)
+        except FileNotFoundError:
+            registry.inc('snapshot_retries')
+            continue
+        log_version, entries = wal.read_log(table_name)
+        if log_version > version:
+            registry.inc('snapshot_retries')
+            continue
+        if log_version < version:
+            return data
+        return replay(data, iter(entries))
+    raise OSError(f'Не удалось прочитать согласованный снимок таблицы "{table_name}".')
+
+
+def load_table_data(table_name: str) -> list:
+    """Загружает согласованный снимок таблицы в виде списка записей."""
+    return _load_snapshot(table_name, lambda batches: [record for records in batches for record in records],
+                          wal.replay)
+
+
+def load_columnar_data(table_name: str, schema: list) -> ColumnarTable:
+    """Загружает согласованный снимок таблицы сразу в колоночное представление.
+
+    Столбцы заполняются по мере чтения страниц, список записей всей
+    таблицы не создается.
+    """
+    return _load_snapshot(table_name, partial(ColumnarTable.from_batches, schema), ColumnarTable.replay)
+
+
+@measure_phase('persist')
+def save_table_data(table_name: str, data: list, changed: Optional[Set[int]] = None) -> None:
+    """Сохраняет данные таблицы (контрольная точка) и начинает журнал заново.
+
+    Записи хранятся страницами (см. pages): changed — номера измененных
+    страниц, только они и записываются; None — таблица записывается
+    целиком. Оглавление получает следующую версию и подменяется атомарно,
+    затем журнал заменяется пустым журналом той же версии, и лишь после
+    этого удаляются файлы замененных страниц.
+    """
+    version, manifest = _read_manifest(table_name)
+    pages = manifest['pages'] if manifest is not None else {}
+    if manifest is None or manifest['page_rows'] != PAGE_ROWS or manifest.get('codec') != BLOCK_CODEC:
+        changed = None
+    version += 1
+    current = write_pages(table_name, data, version, pages, changed)
+    # Версия записывается первой, чтобы ее можно было прочитать по началу файла.
+    _write_atomic(f'{DATA_DIR}{table_name}.json', json.dumps(
+        {'version': version, 'page_rows': PAGE_ROWS, 'codec': BLOCK_CODEC, 'pages': current},
+        ensure_ascii=False, separators=(',', ':')
+    ))
+    wal.reset(table_name, version)
+    remove_replaced(pages, current)
+
+
+def checkpoint_table(table_name: str, data: list) -> None:
+    """Контрольная точка: переписывает только страницы, измененные записями журнала.
+
+    У секционированной таблицы журналы секций сворачиваются в файлы секций.
+    """
+    if isinstance(data, PartitionedTable):
+        data.checkpoint()
+        return
+    _, entries = wal.read_log(table_name)
+    save_table_data(table_name, data, dirty_pages(entries))
+
+
+def log_table_change(table_name: str, entry: dict, data: list) -> None:
+    """Дописывает изменение в журнал таблицы.
+
+    Когда журнал вырастает до порога WAL_CHECKPOINT_BYTES, измененные
+    страницы сохраняются и журнал начинается заново. Двоичные таблицы
+    уже изменены на месте, для них только сбрасываются страницы на диск,
+    у сжатых таблиц переписываются измененные блоки, а секционированные
+    таблицы дописывают изменения в журналы затронутых секций.
+    """
+    log_table_changes(table_name, [entry], data)
+
+
+@measure_phase('persist')
+def log_table_changes(table_name: str, entries: List[dict], data: list) -> None:
+    """Дописывает пакет изменений в журнал таблицы одной записью на диск."""
+    if isinstance(data, PartitionedTable):
+        data.log_changes(entries)
+        query_cache.invalidate(table_name)
+        return
+    if isinstance(data, (BinaryTable, SegmentTable)):
+        data.flush()
+        query_cache.invalidate(table_name)
+        return
+    wal.append_entries(table_name, entries)
+    query_cache.invalidate(table_name)
+    if wal.needs_checkpoint(table_name):
+        checkpoint_table(table_name, data)
+
+
+def load_table_indexes(table_name: str, data: list) -> TableIndexes:
+    """Загружает список индексируемых столбцов и строит индексы таблицы."""
+    filepath = f'{DATA_DIR}{table_name}{INDEX_SUFFIX}'
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            columns = json.load(f)
     except FileNotFoundError:
-        return []
+        columns = []
+    return TableIndexes(columns).build(data)
 
 
-def save_table_data(table_name: str, data: list) -> None:
-    """Сохраняет данные таблицы в JSON-файл."""
-    filepath = f'{DATA_DIR}{table_name}.json'
-    Path(filepath).parent.mkdir(parents=True, exist_ok=True)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def save_table_indexes(table_name: str, table_indexes: TableIndexes) -> None:
+    """Сохраняет список индексируемых столбцов рядом с данными таблицы.
+
+    Столбцы с упорядоченным индексом записываются с суффиксом ":sorted".
+    """
+    _write_atomic(f'{DATA_DIR}{table_name}{INDEX_SUFFIX}',
+                  json.dumps(table_indexes.to_list(), ensure_ascii=False, indent=2), sync=False)
+
+
+def write_table_storage(table_name: str, schema: list, records: list, storage_format: str,
+                        partitioning: Tuple[str, int] = ('range', PARTITION_RANGE_SIZE)) -> None:
+    """Записывает записи таблицы в заданном формате хранения.
+
+    partitioning — схема и размер секций для формата partitioned.
+    """
+    if storage_format == 'binary':
+        BinaryTable.create(table_name, schema, records).close()
+    elif storage_format == 'partitioned':
+        PartitionedTable.create(table_name, records, *partitioning)
+    elif storage_format == 'compressed':
+        SegmentTable.create(table_name, records)
+    else:
+        save_table_data(table_name, records)
+
+
+def remove_table_storage(table_name: str, storage_format: str) -> None:
+    """Удаляет файлы данных таблицы в заданном формате хранения."""
+    if storage_format == 'partitioned':
+        remove_partitions(table_name)
+        return
+    if storage_format == 'compressed':
+        remove_segments(table_name)
+        return
+    if storage_format == 'binary':
+        filepaths = get_binary_paths(table_name)
+    else:
+        filepaths = (f'{DATA_DIR}{table_name}.json', wal.get_log_path(table_name))
+        remove_pages(table_name)
+    for filepath in filepaths:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+def remove_table_data(table_name: str) -> None:
+    """Удаляет файлы данных, журнал и описание индексов таблицы."""
+    filepaths = (f'{DATA_DIR}{table_name}.json', f'{DATA_DIR}{table_name}{INDEX_SUFFIX}',
+                 *get_binary_paths(table_name))
+    for filepath in filepaths:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+    remove_pages(table_name)
+    remove_partitions(table_name)
+    remove_segments(table_name)
+    wal.truncate(table_name)
+    query_cache.invalidate(table_name)
+
+
+def _iter_csv_rows(f, columns: List[str]) -> Iterator[list]:
+    reader = csv.reader(f)
+    first = next(reader, None)
+    if first is None:
+        return
+    header = [name.strip() for name in first]
+    if {name.lower() for name in header} >= {col.lower() for col in columns}:
+        positions = {name.lower(): i for i, name in enumerate(header)}
+        order = [positions[col.lower()] for col in columns]
+        for row in reader:
+            if row:
+                yield [row[i] if i < len(row) else '' for i in order]
+    else:
+        yield first
+        for row in reader:
+            if row:
+                yield row
+
+
+def _iter_jsonl_rows(f, columns: List[str]) -> Iterator[list]:
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        item = json.loads(line)
+        if isinstance(item, dict):
+            missing = [col for col in columns if col not in item]
+            if missing:
+                raise ValueError(f'строка {line_number}: нет столбцов {", ".join(missing)}')
+            yield [item[col] for col in columns]
+        else:
+            yield item
+
+
+def iter_import_batches(filepath: str, columns: List[str],
+                        batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[List[list]]:
+    """Читает CSV или JSONL файл пакетами строк значений.
 
+    Файл читается потоково, в памяти находится только текущий пакет.
+    columns — имена столбцов таблицы без ID в порядке схемы; для CSV с
+    заголовком и для JSONL-объектов значения упорядочиваются по ним.
+    """
+    suffix = Path(filepath).suffix.lower()
+    if suffix not in ('.csv', '.jsonl'):
+        raise ValueError(f'Неподдерживаемый формат файла: {filepath}. Ожидается .csv или .jsonl.')
+    
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        rows = _iter_csv_rows(f, columns) if suffix == '.csv' else _iter_jsonl_rows(f, columns)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
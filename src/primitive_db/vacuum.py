@@ -0,0 +1,75 @@
+"""Сжатие таблиц: освобождение места удаленных записей.
+
+delete только помечает записи удаленными (надгробия, см. rowtable и
+binfmt). Когда доля удаленных записей достигает VACUUM_TOMBSTONE_RATIO
+(и их не меньше VACUUM_MIN_TOMBSTONES), таблица сжимается автоматически;
+команда vacuum сжимает таблицу сразу.
+
+Построчная таблица сжимается в фоновом потоке: живые записи копируются
+без блокировки, и читатели не ждут сжатия. Двоичная таблица переписывает
+файл строк с атомарной подменой.
+"""
+
+import threading
+from typing import Dict
+
+from .constants import VACUUM_MIN_TOMBSTONES, VACUUM_TOMBSTONE_RATIO
+from .metrics import registry
+from .rowtable import RowTable
+
+# Фоновые сжатия по id таблицы: одна таблица сжимается не более чем одним потоком
+_running: Dict[int, threading.Thread] = {}
+_running_lock = threading.Lock()
+
+
+def tombstones(table_data) -> int:
+    """Возвращает число удаленных записей, которые еще занимают место."""
+    return getattr(table_data, 'tombstones', 0)
+
+
+def needs_vacuum(table_data) -> bool:
+    """Проверяет, пора ли сжать таблицу по доле удаленных записей."""
+    dead = tombstones(table_data)
+    if dead < VACUUM_MIN_TOMBSTONES:
+        return False
+    return dead / (len(table_data) + dead) >= VACUUM_TOMBSTONE_RATIO
+
+
+def vacuum(table_data) -> int:
+    """Сжимает таблицу сразу и возвращает число освобожденных записей."""
+    if not tombstones(table_data):
+        return 0
+    reclaimed = table_data.compact()
+    registry.inc('vacuum_reclaimed_rows', reclaimed)
+    return reclaimed
+
+
+def _compact(table_data: RowTable) -> None:
+    try:
+        vacuum(table_data)
+    finally:
+        with _running_lock:
+            _running.pop(id(table_data), None)
+
+
+def compact_in_background(table_data: RowTable) -> bool:
+    """Запускает сжатие построчной таблицы в фоновом потоке.
+
+    Возвращает False, если эта таблица уже сжимается.
+    """
+    with _running_lock:
+        if id(table_data) in _running:
+            return False
+        thread = threading.Thread(target=_compact, args=(table_data,), name='vacuum', daemon=True)
+        _running[id(table_data)] = thread
+    registry.inc('vacuum_background')
+    thread.start()
+    return True
+
+
+def wait() -> None:
+    """Дожидается завершения фоновых сжатий (при закрытии сеанса)."""
+    with _running_lock:
+        threads = list(_running.values())
+    for thread in threads:
+        thread.join()
@@ -0,0 +1,183 @@
+"""Журнал изменений (write-ahead log) для таблиц.
+
+Каждая успешная операция insert/update/delete дописывается одной строкой
+JSON в файл data/<имя_таблицы>.log. При загрузке таблицы журнал
+проигрывается поверх базового файла, а при контрольной точке (checkpoint)
+измененные страницы таблицы сохраняются (см. pages) и журнал начинается
+заново. Записи update и delete хранят ID затронутых строк ("ids"): по ним
+контрольная точка находит измененные страницы, а проигрывание обходится
+без вычисления условия.
+
+Базовый файл и журнал имеют номер версии: контрольная точка записывает
+базовый файл версии v+1 и атомарно заменяет журнал пустым журналом той же
+версии, первая строка которого — {"op":"version","version":v+1}. Журнал
+без такой строки имеет версию 0. По версиям читатель понимает, относятся
+ли прочитанные базовый файл и журнал к одному снимку.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from .constants import DATA_DIR, WAL_CHECKPOINT_BYTES, WAL_SUFFIX
+from .metrics import registry
+from .predicates import compile_predicate, from_json
+
+
+def get_log_path(table_name: str) -> str:
+    """Возвращает путь к файлу журнала таблицы."""
+    return f'{DATA_DIR}{table_name}{WAL_SUFFIX}'
+
+
+def append_entry(table_name: str, entry: Dict) -> None:
+    """Дописывает одну запись в журнал таблицы."""
+    append_entries(table_name, [entry])
+
+
+def append_entries(table_name: str, entries: List[Dict]) -> None:
+    """Дописывает несколько записей в журнал одним вызовом write."""
+    if not entries:
+        return
+    filepath = get_log_path(table_name)
+    Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+    chunk = ''.join(
+        json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+        for entry in entries
+    ).encode('utf-8')
+    with open(filepath, 'ab') as f:
+        f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    registry.inc('bytes_written', len(chunk))
+
+
+def read_entries(table_name: str) -> Iterator[Dict]:
+    """Читает записи журнала, пропуская недописанный хвост."""
+    return iter(read_log(table_name)[1])
+
+
+def read_log(table_name: str) -> Tuple[int, List[Dict]]:
+    """Читает журнал целиком: возвращает его версию и записи изменений.
+
+    Строка без завершающего перевода строки еще дописывается другим
+    процессом (или оборвана сбоем) и не читается.
+    """
+    filepath = get_log_path(table_name)
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            registry.inc('bytes_read', os.fstat(f.fileno()).st_size)
+            lines = f.readlines()
+    except FileNotFoundError:
+        return 0, []
+    version = 0
+    entries = []
+    for line in lines:
+        if not line.endswith('\n'):
+            break
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            # Обрыв записи при аварийном завершении: дальше читать нечего.
+            break
+        if entry.get('op') == 'version':
+            version = entry['version']
+        else:
+            entries.append(entry)
+    return version, entries
+
+
+def replay(table_data: List[Dict], entries: Iterator[Dict]) -> List[Dict]:
+    """Применяет записи журнала к данным таблицы.
+
+    Проигрывание идемпотентно: вставка записи с уже существующим ID
+    пропускается, поэтому повтор журнала после незавершенной контрольной
+    точки не создает дубликатов.
+    """
+    existing_ids = {record.get('ID') for record in table_data}
+    for entry in entries:
+        op = entry.get('op')
+        if op == 'insert':
+            record = entry['record']
+            if record.get('ID') in existing_ids:
+                continue
+            table_data.append(record)
+            existing_ids.add(record.get('ID'))
+        elif op == 'insert_many':
+            for record in entry['records']:
+                if record.get('ID') in existing_ids:
+                    continue
+                table_data.append(record)
+                existing_ids.add(record.get('ID'))
+        elif op == 'update':
+            check = _entry_predicate(entry)
+            for record in table_data:
+                if check(record):
+                    record.update(entry['set'])
+        elif op == 'delete':
+            check = _entry_predicate(entry)
+            table_data = [record for record in table_data if not check(record)]
+            existing_ids = {record.get('ID') for record in table_data}
+    return table_data
+
+
+def _entry_predicate(entry: Dict):
+    """Условие записи update или delete: по списку ID затронутых строк, если он записан."""
+    if 'ids' in entry:
+        ids = set(entry['ids'])
+        return lambda record: record.get('ID') in ids
+    return compile_predicate(from_json(entry['where']))
+
+
+def needs_checkpoint(table_name: str) -> bool:
+    """Проверяет, пора ли выполнить контрольную точку.
+
+    Журнал сворачивается, когда он становится не меньше базового файла (но
+    не раньше WAL_CHECKPOINT_BYTES). Контрольная точка переписывает только
+    измененные страницы, поэтому ее стоимость пропорциональна объему
+    изменений; базовый файл старого формата (записи одним списком)
+    переписывается целиком не чаще, чем удваивается объем изменений.
+    """
+    try:
+        log_size = os.path.getsize(get_log_path(table_name))
+    except FileNotFoundError:
+        return False
+    try:
+        base_size = os.path.getsize(f'{DATA_DIR}{table_name}.json')
+    except FileNotFoundError:
+        base_size = 0
+    return log_size >= max(WAL_CHECKPOINT_BYTES, base_size)
+
+
+def has_entries(table_name: str) -> bool:
+    """Проверяет, есть ли в журнале записи изменений (кроме строки версии)."""
+    try:
+        with open(get_log_path(table_name), 'rb') as f:
+            first = f.readline()
+            if not first.startswith(b'{"op":"version"'):
+                return bool(first)
+            return bool(f.read(1))
+    except FileNotFoundError:
+        return False
+
+
+def reset(table_name: str, version: int) -> None:
+    """Атомарно заменяет журнал пустым журналом новой версии (после контрольной точки)."""
+    filepath = get_log_path(table_name)
+    Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f'{filepath}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(json.dumps({'op': 'version', 'version': version}, separators=(',', ':')).encode('utf-8') + b'\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
+
+
+def truncate(table_name: str) -> None:
+    """Удаляет журнал таблицы."""
+    filepath = get_log_path(table_name)
+    if os.path.exists(filepath):
+        os.remove(filepath)
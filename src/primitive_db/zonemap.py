@@ -0,0 +1,135 @@
+"""Зональные карты: сводки значений по блокам записей.
+
+Зона блока — словарь {столбец: [минимум, максимум, число None]} по его
+записям (столбцы int, str и bool). По зоне условие where проверяется
+консервативно (may_match): False означает, что ни одна запись блока
+условию точно не удовлетворяет и блок можно не просматривать. Столбец,
+значения которого нельзя сравнить между собой, в зону не попадает.
+
+Зоны только расширяются: insert и update добавляют новые значения, а
+delete и старые значения update границы не сужают. Точные границы
+восстанавливаются при перезаписи блока (сжатые блоки, см. segments) или
+при перестроении индексов таблицы (ZoneMaps.build).
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from .constants import PAGE_ROWS
+from .predicates import And, Between, Compare, Or, Where
+
+Zone = Dict[str, Optional[list]]
+
+
+def widen(zone: Zone, record: Dict) -> None:
+    """Расширяет зону значениями записи."""
+    for col, value in record.items():
+        if col not in zone:
+            zone[col] = [value, value, 0 if value is not None else 1]
+            continue
+        bounds = zone[col]
+        if bounds is None:
+            continue
+        if value is None:
+            bounds[2] += 1
+        elif bounds[0] is None:
+            bounds[0] = bounds[1] = value
+        else:
+            try:
+                if value < bounds[0]:
+                    bounds[0] = value
+                elif value > bounds[1]:
+                    bounds[1] = value
+            except TypeError:
+                # Значения разных типов: по столбцу блок не отсекается.
+                zone[col] = None
+
+
+def summarize(records: Iterable[Dict]) -> Zone:
+    """Строит зону по записям блока."""
+    zone: Zone = {}
+    for record in records:
+        widen(zone, record)
+    return zone
+
+
+def _may_compare(bounds: list, op: str, value: Any) -> bool:
+    low, high, _ = bounds
+    if value is None:
+        return True
+    if low is None:
+        return False
+    if op == '=':
+        return low <= value <= high
+    if op == '!=':
+        return not low == high == value
+    if op == '<':
+        return low < value
+    if op == '<=':
+        return low <= value
+    if op == '>':
+        return high > value
+    return high >= value
+
+
+def may_match(zone: Zone, where: Where) -> bool:
+    """Проверяет, могут ли в блоке с зоной zone быть записи, удовлетворяющие условию."""
+    try:
+        if isinstance(where, dict):
+            return all(zone.get(col) is None or _may_compare(zone[col], '=', value)
+                       for col, value in where.items())
+        if isinstance(where, Compare):
+            bounds = zone.get(where.column)
+            return bounds is None or _may_compare(bounds, where.op, where.value)
+        if isinstance(where, Between):
+            bounds = zone.get(where.column)
+            return bounds is None or (bounds[0] is not None and bounds[0] <= where.high and bounds[1] >= where.low)
+        if isinstance(where, And):
+            return all(may_match(zone, item) for item in where.items)
+        if isinstance(where, Or):
+            return any(may_match(zone, item) for item in where.items)
+    except TypeError:
+        return True
+    return True
+
+
+class ZoneMaps:
+    """Зоны построчной таблицы по блокам ID: блок k содержит ID от k*block_rows до (k+1)*block_rows-1.
+
+    Как и статистика столбцов, строятся одним проходом при первом
+    обращении (build); до этого изменения таблицы их не затрагивают.
+    """
+
+    def __init__(self, block_rows: int = PAGE_ROWS):
+        self.block_rows = block_rows
+        self.ready = False
+        self.zones: Dict[int, Zone] = {}
+
+    def build(self, records: Iterable[Dict]) -> 'ZoneMaps':
+        """Вычисляет зоны по всем записям; готовыми они отмечаются после прохода."""
+        zones: Dict[int, Zone] = {}
+        for record in records:
+            widen(zones.setdefault(self.key(record), {}), record)
+        self.zones = zones
+        self.ready = True
+        return self
+
+    def reset(self) -> None:
+        """Сбрасывает зоны; следующий запрос построит их заново."""
+        self.ready = False
+        self.zones = {}
+
+    def key(self, record: Dict) -> int:
+        """Возвращает номер блока записи."""
+        return (record.get('ID') or 0) // self.block_rows
+
+    def on_insert(self, record: Dict) -> None:
+        if self.ready:
+            widen(self.zones.setdefault(self.key(record), {}), record)
+
+    def on_update(self, record: Dict) -> None:
+        if self.ready:
+            widen(self.zones.setdefault(self.key(record), {}), record)
+
+    def candidate_keys(self, where: Where) -> List[int]:
+        """Возвращает номера блоков, которые могут содержать подходящие записи, по возрастанию."""
+        return [key for key in sorted(self.zones) if may_match(self.zones[key], where)]
@@ -0,0 +1,65 @@
+"""Общие фикстуры: каждая проверка работает с новой базой во временном каталоге."""
+
+import pytest
+
+from src.primitive_db.cache import query_cache
+from src.primitive_db.decorators import set_confirm_policy
+from src.primitive_db.engine import Session
+
+# Форматы хранения таблиц: (хранилище базы, формат convert_table или None для json)
+STORAGE_FORMATS = {
+    'json': ('json', None),
+    'columnar': ('json', 'columnar'),
+    'binary': ('json', 'binary'),
+    'partitioned': ('json', 'partitioned'),
+    'compressed': ('json', 'compressed'),
+    'sqlite': ('sqlite', None),
+}
+
+
+@pytest.fixture(autouse=True)
+def database_dir(tmp_path, monkeypatch):
+    """Переходит в пустой каталог базы и отключает вопросы подтверждения."""
+    monkeypatch.chdir(tmp_path)
+    set_confirm_policy('yes')
+    query_cache.clear()
+    yield tmp_path
+    query_cache.clear()
+    set_confirm_policy('ask')
+
+
+def run(session: Session, *commands: str) -> None:
+    """Выполняет команды сеанса по очереди."""
+    for command in commands:
+        session.execute(command)
+
+
+def rows(session: Session, table_name: str) -> list:
+    """Возвращает записи таблицы, упорядоченные по ID."""
+    metadata = session.pool.get_metadata()
+    table_data, _ = session.pool.get_table(metadata, table_name)
+    return sorted((dict(record) for record in table_data), key=lambda record: record['ID'])
+
+
+@pytest.fixture(params=sorted(STORAGE_FORMATS))
+def storage_format(request):
+    """Имя формата хранения, для которого выполняется проверка."""
+    return request.param
+
+
+@pytest.fixture
+def open_session(storage_format):
+    """Открывает сеансы базы в выбранном формате; первый вызов создает таблицу users."""
+    backend, table_format = STORAGE_FORMATS[storage_format]
+    sessions = []
+
+    def factory() -> Session:
+        session = Session(backend=backend)
+        if not sessions:
+            run(session, 'create_table users name:str age:int')
+            if table_format is not None:
+                run(session, f'convert_table users {table_format}')
+        sessions.append(session)
+        return session
+
+    return factory
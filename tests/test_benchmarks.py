@@ -0,0 +1,12 @@
+"""Сценарии замеров не меняют глобальное состояние базы."""
+
+from benchmarks.cases import case_delete
+from src.primitive_db.decorators import get_confirm_policy, set_confirm_policy
+
+
+def test_delete_case_restores_confirm_policy():
+    set_confirm_policy('no')
+    result = case_delete(100, 1)
+
+    assert result['rows'] > 0
+    assert get_confirm_policy() == 'no'
@@ -0,0 +1,75 @@
+"""Колоночный формат: перевод таблицы, загрузка по страницам, сравнения и отказ от индексов."""
+
+import os
+
+import pytest
+
+from conftest import rows, run
+from src.primitive_db import storage
+from src.primitive_db.columnar import ColumnarTable, StrColumn, _mask_positions
+from src.primitive_db.engine import Session
+from src.primitive_db.indexes import TableIndexes
+from src.primitive_db.predicates import OPERATORS
+
+
+@pytest.fixture
+def session():
+    session = Session()
+    run(session,
+        'create_table users name:str age:int',
+        'insert into users values ("ann", 30), ("bob", 25)',
+        'convert_table users columnar')
+    return session
+
+
+def test_convert_keeps_files_and_records(session):
+    metadata = session.pool.get_metadata()
+    assert isinstance(session.pool.get_table(metadata, 'users')[0], ColumnarTable)
+    assert os.path.exists('data/users.json')
+    run(session, 'insert into users values ("cid", 40)', 'convert_table users json')
+    session.close()
+
+    reopened = Session()
+    assert rows(reopened, 'users') == [
+        {'ID': 1, 'name': 'ann', 'age': 30},
+        {'ID': 2, 'name': 'bob', 'age': 25},
+        {'ID': 3, 'name': 'cid', 'age': 40},
+    ]
+    reopened.close()
+
+
+def test_reopen_builds_columns_from_pages_and_log(session, monkeypatch):
+    run(session,
+        'update users set age = 31 where name = "ann"',
+        'delete from users where name = "bob"',
+        'insert into users values ("cid", 40)')
+
+    # Сеанс не закрыт: столбцы строятся из страниц и журнала, минуя список записей.
+    monkeypatch.setattr(storage, 'load_table_data', pytest.fail)
+    reopened = Session()
+    metadata = reopened.pool.get_metadata()
+    table = reopened.pool.get_table(metadata, 'users')[0]
+    assert isinstance(table, ColumnarTable)
+    assert table.to_records() == [
+        {'ID': 1, 'name': 'ann', 'age': 31},
+        {'ID': 3, 'name': 'cid', 'age': 40},
+    ]
+    reopened.close()
+    session.close()
+
+
+@pytest.mark.parametrize('size', [10, 300])
+@pytest.mark.parametrize('op', ['<', '>=', '!='])
+def test_str_compare_matches_row_by_row(size, op):
+    values = [f'v{i % size:04d}' for i in range(1000)]
+    column = StrColumn(values)
+    expected = [i for i, value in enumerate(values) if OPERATORS[op](value, 'v0005')]
+    assert list(_mask_positions(column.compare_mask(op, 'v0005'))) == expected
+
+
+def test_create_index_is_refused(session, capsys, monkeypatch):
+    monkeypatch.setattr(TableIndexes, 'add_column', pytest.fail)
+    run(session, 'create_index users age')
+    assert 'Ошибка: Таблица "users" в формате columnar не поддерживает индексы.' in capsys.readouterr().out
+    assert not os.path.exists('data/users.idx.json')
+    session.close()
@@ -0,0 +1,37 @@
+"""Несколько процессов пишут в одну базу: ID не повторяются и не теряются."""
+
+import multiprocessing
+
+import pytest
+
+from conftest import rows, run
+from src.primitive_db.engine import Session
+
+
+def _insert_worker(backend: str, worker: int, count: int) -> None:
+    session = Session(backend=backend)
+    for i in range(count):
+        session.execute(f'insert into users values ("w{worker}-{i}", {i})')
+    session.close()
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_concurrent_writers_get_unique_ids(backend):
+    session = Session(backend=backend)
+    run(session, 'create_table users name:str age:int')
+    session.close()
+
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_insert_worker, args=(backend, worker, 30)) for worker in range(3)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+
+    reopened = Session(backend=backend)
+    records = rows(reopened, 'users')
+    ids = [record['ID'] for record in records]
+    assert len(records) == 90
+    assert sorted(set(ids)) == list(range(1, 91))
+    reopened.close()
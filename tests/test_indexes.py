@@ -0,0 +1,40 @@
+"""Индексы таблицы следуют за изменениями записей."""
+
+import os
+
+import pytest
+
+from conftest import run
+from src.primitive_db.engine import Session
+from src.primitive_db.indexes import TableIndexes
+
+
+def _indexes(records):
+    return TableIndexes(['name', 'age:sorted']).build(records)
+
+
+def test_update_moves_record_between_keys():
+    records = [{'ID': 1, 'name': 'ann', 'age': 30}, {'ID': 2, 'name': 'bob', 'age': 25}]
+    indexes = _indexes(records)
+    records[0]['name'], records[0]['age'] = 'cid', 20
+    indexes.on_update(records[0], {'name': 'ann', 'age': 30})
+
+    assert indexes.lookup({'name': 'ann'}) == []
+    assert indexes.lookup({'name': 'cid'}) == [records[0]]
+    assert indexes.sorted['age'].ids == [1, 2]
+
+
+@pytest.mark.parametrize('storage_format', ['binary', 'partitioned', 'compressed'])
+def test_create_index_is_refused_for_native_formats(storage_format, capsys):
+    session = Session()
+    run(session,
+        'create_table users name:str age:int',
+        'insert into users values ("ann", 30)',
+        f'convert_table users {storage_format}')
+    capsys.readouterr()
+    run(session, 'create_index users age')
+
+    assert (f'Ошибка: Таблица "users" в формате {storage_format} не поддерживает индексы.'
+            in capsys.readouterr().out)
+    assert not os.path.exists('data/users.idx.json')
+    session.close()
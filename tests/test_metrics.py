@@ -0,0 +1,19 @@
+"""Время функций с log_time попадает в метрики, а не в вывод."""
+
+from src.primitive_db.decorators import log_time
+from src.primitive_db.metrics import registry
+
+
+def test_log_time_reports_only_through_registry(capsys):
+    @log_time
+    def work():
+        return 42
+
+    before = registry.snapshot()
+    assert work() == 42
+    assert capsys.readouterr().out == ''
+    count = [item['count'] for item in registry.snapshot()['histograms']
+             if item['name'] == 'function_seconds' and item['labels'] == {'function': 'work'}]
+    previous = [item['count'] for item in before['histograms']
+                if item['name'] == 'function_seconds' and item['labels'] == {'function': 'work'}]
+    assert count[0] == (previous[0] if previous else 0) + 1
@@ -0,0 +1,64 @@
+"""Секционированные таблицы: журналы секций, контрольная точка и ленивая загрузка."""
+
+import os
+
+import pytest
+
+from conftest import rows, run
+from src.primitive_db import wal
+from src.primitive_db.engine import Session
+from src.primitive_db.partitions import PartitionedTable, get_partition_path, partition_name
+from src.primitive_db.predicates import Compare
+
+
+@pytest.fixture
+def session():
+    session = Session()
+    run(session,
+        'create_table t a:int',
+        'insert into t values (1), (2), (3), (4), (5)',
+        'convert_table t partitioned range 2')
+    return session
+
+
+def test_write_appends_to_partition_log(session):
+    bases = {key: os.stat(get_partition_path('t', key)).st_mtime_ns for key in (0, 1, 2)}
+    run(session, 'update t set a = 30 where a = 3', 'insert into t values (6)')
+
+    # Файлы секций не переписаны, изменения дописаны в журналы секций 1 и 2.
+    assert {key: os.stat(get_partition_path('t', key)).st_mtime_ns for key in (0, 1, 2)} == bases
+    assert [wal.has_entries(partition_name('t', key)) for key in (0, 1, 2)] == [False, True, True]
+
+    # Сеанс не закрыт: секции читаются из файлов и журналов.
+    reopened = Session()
+    assert [record['a'] for record in rows(reopened, 't')] == [1, 2, 30, 4, 5, 6]
+    reopened.close()
+
+
+def test_checkpoint_folds_partition_logs(session):
+    run(session, 'delete from t where a = 5', 'insert into t values (6)', 'checkpoint')
+    assert not wal.has_entries(partition_name('t', 1))
+    assert not wal.has_entries(partition_name('t', 2))
+    session.close()
+
+    table = PartitionedTable('t', 'range', 2)
+    assert len(table) == 5
+    assert [record['a'] for record in table] == [1, 2, 3, 4, 6]
+
+
+def test_emptied_partition_is_removed(session):
+    run(session, 'delete from t where ID < 3', 'checkpoint')
+    assert not os.path.exists(get_partition_path('t', 0))
+    assert not os.path.exists(wal.get_log_path(partition_name('t', 0)))
+    session.close()
+
+
+def test_partitions_load_lazily(session):
+    run(session, 'insert into t values (6)')
+    session.close()
+
+    table = PartitionedTable('t', 'range', 2)
+    assert len(table) == 6
+    assert table.partitions == {}
+    assert [record['a'] for record in table.select(Compare('ID', '=', 3))] == [3]
+    assert sorted(table.partitions) == [1]
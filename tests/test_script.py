@@ -0,0 +1,56 @@
+"""Пакетный режим: сценарий с двоичной таблицей не применяется наполовину."""
+
+from conftest import rows, run
+from src.primitive_db.engine import Session, run_script
+
+SCRIPT = [
+    'insert into users values ("cid", 40)',
+    'insert into logs values ("started")',
+    'delete from users where name = "ann"',
+]
+
+
+def _prepare() -> None:
+    session = Session()
+    run(session,
+        'create_table users name:str age:int',
+        'create_table logs message:str',
+        'insert into users values ("ann", 30)',
+        'convert_table logs binary')
+    session.close()
+
+
+def test_binary_write_in_group_commit_rejects_whole_script(capsys):
+    _prepare()
+    capsys.readouterr()
+    run_script(SCRIPT, Session(group_commit=100))
+
+    output = capsys.readouterr().out
+    assert 'Ошибка: Таблица "logs" в формате binary не поддерживает транзакции' in output
+    assert '(команда 2: insert into logs values ("started"))' in output
+    reopened = Session()
+    assert [record['name'] for record in rows(reopened, 'users')] == ['ann']
+    assert rows(reopened, 'logs') == []
+    reopened.close()
+
+
+def test_binary_table_converted_by_script_is_checked(capsys):
+    _prepare()
+    capsys.readouterr()
+    run_script(['create_table events kind:str', 'convert_table events binary',
+                'begin', 'insert into events values ("x")', 'commit'], Session())
+
+    assert 'Ошибка: Таблица "events" в формате binary' in capsys.readouterr().out
+    reopened = Session()
+    assert 'events' not in reopened.pool.get_metadata()
+    reopened.close()
+
+
+def test_binary_write_without_group_commit_runs(capsys):
+    _prepare()
+    run_script(SCRIPT, Session(group_commit=0))
+
+    reopened = Session()
+    assert [record['name'] for record in rows(reopened, 'users')] == ['cid']
+    assert [record['message'] for record in rows(reopened, 'logs')] == ['started']
+    reopened.close()
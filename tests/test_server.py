@@ -0,0 +1,56 @@
+"""Сервер выполняет чтения вне цикла событий и параллельно друг другу."""
+
+import asyncio
+import threading
+
+from src.primitive_db.engine import Session
+from src.primitive_db.server import Server, read_frame
+
+
+def test_slow_read_does_not_block_other_clients(monkeypatch):
+    release = threading.Event()
+    info = Session._info
+
+    def slow_info(self, statement, metadata):
+        release.wait(10)
+        info(self, statement, metadata)
+
+    monkeypatch.setattr(Session, '_info', slow_info)
+
+    async def scenario():
+        server = Server()
+        server.session.execute('create_table users name:str age:int')
+        server.session.execute('insert into users values ("ann", 30)')
+        writer_task = asyncio.create_task(server._writer())
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        slow_reader, slow_writer = await asyncio.open_connection('127.0.0.1', port)
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            slow_writer.write(b'info users\n')
+            await asyncio.sleep(0.05)
+            writer.write(b'select from users\n')
+            assert 'ann' in await asyncio.wait_for(read_frame(reader), 5)
+
+            # Изменение ждет завершения начатого чтения, но цикл событий свободен.
+            writer.write(b'insert into users values ("bob", 25)\n')
+            inserted = asyncio.ensure_future(read_frame(reader))
+            await asyncio.sleep(0.1)
+            assert not inserted.done()
+            release.set()
+            assert 'users' in await asyncio.wait_for(read_frame(slow_reader), 5)
+            assert 'успешно добавлена' in await asyncio.wait_for(inserted, 5)
+
+            writer.write(b'select from users where name = "bob"\n')
+            assert 'bob' in await asyncio.wait_for(read_frame(reader), 5)
+        finally:
+            release.set()
+            for stream in (slow_writer, writer):
+                stream.close()
+            listener.close()
+            writer_task.cancel()
+            server.readers.shutdown()
+            server.writer.shutdown()
+            server.session.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,48 @@
+"""Изменения таблиц во всех форматах хранения переживают перезапуск и сбой."""
+
+import pytest
+
+from conftest import rows, run
+from src.primitive_db.engine import Session
+
+EXPECTED = [
+    {'ID': 1, 'name': 'ann', 'age': 31},
+    {'ID': 3, 'name': 'cid', 'age': 40},
+    {'ID': 4, 'name': 'dan', 'age': 50},
+]
+
+
+def _fill(session: Session, checkpoint: bool) -> None:
+    run(session,
+        'insert into users values ("ann", 30)',
+        'insert into users values ("bob", 25), ("cid", 40)')
+    if checkpoint:
+        run(session, 'checkpoint')
+    run(session,
+        'update users set age = 31 where name = "ann"',
+        'delete from users where name = "bob"',
+        'insert into users values ("dan", 50)')
+
+
+@pytest.mark.parametrize('checkpoint', [False, True], ids=['wal', 'checkpoint'])
+def test_changes_survive_close(open_session, checkpoint):
+    session = open_session()
+    _fill(session, checkpoint)
+    assert rows(session, 'users') == EXPECTED
+    session.close()
+
+    reopened = open_session()
+    assert rows(reopened, 'users') == EXPECTED
+    reopened.close()
+
+
+@pytest.mark.parametrize('checkpoint', [False, True], ids=['wal', 'checkpoint'])
+def test_changes_survive_crash(open_session, checkpoint):
+    # Сеанс не закрывается: таблицы не сворачиваются, данные восстанавливаются из журнала.
+    _fill(open_session(), checkpoint)
+
+    reopened = open_session()
+    assert rows(reopened, 'users') == EXPECTED
+    run(reopened, 'insert into users values ("eve", 20)')
+    assert [record['ID'] for record in rows(reopened, 'users')] == [1, 3, 4, 5]
+    reopened.close()
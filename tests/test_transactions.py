@@ -0,0 +1,28 @@
+"""Откат транзакции возвращает таблицу к состоянию на диске."""
+
+from conftest import rows, run
+
+
+def test_rollback_restores_table(open_session, storage_format, capsys):
+    session = open_session()
+    run(session, 'insert into users values ("ann", 30), ("bob", 25)', 'checkpoint')
+    before = rows(session, 'users')
+    run(session,
+        'begin',
+        'insert into users values ("cid", 40)',
+        'update users set age = 99 where name = "ann"',
+        'delete from users where name = "bob"',
+        'rollback')
+    output = capsys.readouterr().out
+    if storage_format == 'binary':
+        assert 'не поддерживает транзакции' in output
+    else:
+        assert 'Транзакция отменена.' in output
+    assert rows(session, 'users') == before
+    session.close()
+
+    reopened = open_session()
+    assert rows(reopened, 'users') == before
+    run(reopened, 'insert into users values ("cid", 40)')
+    assert rows(reopened, 'users')[-1]['ID'] == 3
+    reopened.close()
@@ -0,0 +1,36 @@
+"""update не меняет ID записи: ID связывает запись с журналом, страницами и индексами."""
+
+import pytest
+
+from conftest import rows, run
+from src.primitive_db.engine import Session
+
+
+@pytest.fixture
+def session():
+    session = Session()
+    run(session, 'create_table t a:int', 'insert into t values (1), (2)', 'checkpoint')
+    return session
+
+
+def test_update_of_id_is_rejected_before_crash(session, capsys):
+    run(session, 'update t set a = 9 where a = 1')
+    capsys.readouterr()
+    run(session, 'update t set ID = 7 where a = 9')
+    assert 'Некорректное значение: update t set ID = 7 where a = 9. Попробуйте снова.' in capsys.readouterr().out
+
+    # Сеанс не закрыт: состояние восстанавливается из журнала.
+    reopened = Session()
+    assert rows(reopened, 't') == [{'ID': 1, 'a': 9}, {'ID': 2, 'a': 2}]
+    reopened.close()
+
+
+def test_update_of_id_is_rejected_before_close(session, capsys):
+    run(session, 'update t set ID = 5000 where a = 1')
+    assert 'Попробуйте снова.' in capsys.readouterr().out
+    run(session, 'update t set a = 5 where a = 1')
+    session.close()
+
+    reopened = Session()
+    assert rows(reopened, 't') == [{'ID': 1, 'a': 5}, {'ID': 2, 'a': 2}]
+    reopened.close()